@@ -0,0 +1,163 @@
+import os
+import math
+import time
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# Controle de admissão das avaliações: limita as avaliações simultâneas e a fila de espera
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("MONAI_ADMISSION_MAX_IN_FLIGHT", 16))  # Avaliações simultâneas (0 desativa)
+ADMISSION_MAX_QUEUE = int(os.getenv("MONAI_ADMISSION_MAX_QUEUE", 64))  # Requisições aguardando na fila
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("MONAI_ADMISSION_QUEUE_TIMEOUT", 10))  # Espera máxima (s) na fila
+# Avaliações simultâneas de um mesmo job (padrão: o limite de chamadas ao LLM por job); outras tantas podem aguardar na fila
+ADMISSION_JOB_MAX_IN_FLIGHT = int(os.getenv("MONAI_ADMISSION_JOB_MAX_IN_FLIGHT", os.getenv("MONAI_JOB_MAX_CONCURRENCY", 4)))
+# Quando a requisição é rejeitada, grava a entrega sem avaliação (result="deferred") em vez de retornar 429/503
+ADMISSION_DEFER = os.getenv("MONAI_ADMISSION_DEFER", "false").lower() == "true"
+
+class AdmissionRejected(Exception):
+    """
+    Requisição rejeitada pelo controle de admissão.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Limita o número de avaliações em andamento, com uma fila de espera limitada e prazo.
+
+    Requisições além da capacidade aguardam na fila até ADMISSION_QUEUE_TIMEOUT segundos;
+    com a fila cheia, são rejeitadas imediatamente (429) e, vencido o prazo de espera,
+    são rejeitadas com 503. Ambas as respostas indicam um Retry-After estimado a partir
+    do tempo médio das avaliações.
+
+    Cada job ocupa no máximo job_max_in_flight vagas e outras tantas posições na fila:
+    as requisições excedentes de um job aguardam sem reservar vagas globais e, além desse
+    limite, são rejeitadas com 429. Assim, um job ruidoso não esgota as vagas admitidas
+    (que ficariam retidas aguardando o escalonamento das chamadas ao LLM) nem a fila.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float, job_max_in_flight: int = ADMISSION_JOB_MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.job_max_in_flight = max(job_max_in_flight, 1)
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.deferred = 0
+        self._avg_service_s = None
+        self._semaphore = asyncio.Semaphore(max(max_in_flight, 1))
+        self._job_semaphores = {}
+        self._job_requests = defaultdict(int)  # Requisições admitidas ou na fila, por job
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    def retry_after(self) -> int:
+        """
+        Estima, em segundos, quando a fila atual terá sido atendida.
+        """
+        service_s = self._avg_service_s or 1.0
+        return max(1, math.ceil(service_s * (self.queued + 1) / max(self.max_in_flight, 1)))
+
+    async def _acquire_slots(self, job_semaphore: Optional[asyncio.Semaphore]):
+        if job_semaphore is not None:
+            await job_semaphore.acquire()
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            if job_semaphore is not None:
+                job_semaphore.release()
+            raise
+
+    async def _acquire(self, job_key: Optional[str]):
+        if job_key is not None and self._job_requests[job_key] >= 2 * self.job_max_in_flight:
+            self.rejected += 1
+            raise AdmissionRejected(429, "Limite de avaliações simultâneas do job atingido. Tente novamente mais tarde.", self.retry_after())
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(429, "Capacidade de avaliação esgotada. Tente novamente mais tarde.", self.retry_after())
+
+        job_semaphore = None
+        if job_key is not None:
+            self._job_requests[job_key] += 1
+            job_semaphore = self._job_semaphores.setdefault(job_key, asyncio.Semaphore(self.job_max_in_flight))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._acquire_slots(job_semaphore), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._forget_job(job_key)
+            raise AdmissionRejected(503, "Tempo de espera na fila de avaliação esgotado.", self.retry_after())
+        except BaseException:
+            self._forget_job(job_key)
+            raise
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    def _forget_job(self, job_key: Optional[str]):
+        if job_key is None:
+            return
+        self._job_requests[job_key] -= 1
+        if not self._job_requests[job_key]:
+            del self._job_requests[job_key]
+            self._job_semaphores.pop(job_key, None)
+
+    def _release(self, job_key: Optional[str], elapsed_s: float):
+        self.in_flight -= 1
+        self._semaphore.release()
+        if job_key is not None:
+            self._job_semaphores[job_key].release()
+            self._forget_job(job_key)
+        # Média móvel exponencial do tempo de atendimento
+        self._avg_service_s = elapsed_s if self._avg_service_s is None else 0.8 * self._avg_service_s + 0.2 * elapsed_s
+
+    @asynccontextmanager
+    async def slot(self, job_key: Optional[str] = None):
+        """
+        Reserva uma vaga de avaliação pelo tempo do bloco.
+
+        Args:
+            job_key (str, optional): Identificação do job, para o limite de vagas por job
+
+        Raises:
+            AdmissionRejected: Se a fila (do job ou global) estiver cheia ou o prazo de espera se esgotar.
+        """
+        if not self.enabled:
+            yield
+            return
+        await self._acquire(job_key)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(job_key, time.perf_counter() - started)
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "job_max_in_flight": self.job_max_in_flight,
+            "jobs": len(self._job_requests),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "deferred": self.deferred,
+            "avg_service_ms": self._avg_service_s * 1000 if self._avg_service_s is not None else None,
+        }
+
+admission = AdmissionController(ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
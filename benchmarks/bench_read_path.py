@@ -0,0 +1,133 @@
+"""
+Microbenchmark das leituras de POST /api/v1/jobs/data/ (histórico e regras do job):
+caminho ORM (objetos JobData, Job, RuleGroup e Rule no identity map) contra projeções
+de colunas do SQLAlchemy Core, com a latência e as alocações (tracemalloc) por requisição.
+
+Roda em um SQLite em memória, sem serviços externos:
+    python -m benchmarks.bench_read_path --history 30 --requests 200
+"""
+import time
+import uuid
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+from database import create_database_engine
+from models import Base, Job, JobData, Rule, RuleGroup
+from history import select_history, serialize_history, HISTORY_STRATEGY_RECENT
+from job_rules import get_job_rules, get_job_expression_rules
+
+def populate(session, jobs: int, deliveries: int, groups_per_job: int, rules_per_group: int) -> list:
+    now = datetime.now()
+    job_ids = []
+    for j in range(jobs):
+        job = Job(id=uuid.uuid4().hex, job_name=f"Job {j}", job_filename=f"arquivo_{j}.csv", created_at=now, updated_at=now)
+        job.rule_groups = [
+            RuleGroup(
+                id=uuid.uuid4(), name=f"Grupo {j}-{g}", created_at=now, updated_at=now,
+                rules=[
+                    Rule(id=uuid.uuid4(), name=f"Regra {g}-{r}", created_at=now, updated_at=now,
+                         rule_text=f"O valor de 'campo_{r}' deve ser compatível com o histórico.",
+                         rule_expression=f"campo_{r} > 0" if r % 2 else None)
+                    for r in range(rules_per_group)
+                ]
+            )
+            for g in range(groups_per_job)
+        ]
+        session.add(job)
+        for d in range(deliveries):
+            received_at = now - timedelta(days=d)
+            session.add(JobData(
+                id=uuid.uuid4(), job_id=job.id, job_name=job.job_name, job_filename=job.job_filename,
+                attributes={f"campo_{k}": d * k for k in range(10)}, received_at=received_at,
+                weekday=received_at.strftime("%A"), month=received_at.strftime("%B"),
+                is_holiday=False, outlier_data=False
+            ))
+        job_ids.append(job.id)
+    session.commit()
+    return job_ids
+
+def legacy_path(session, job_id: str, size: int):
+    # Leituras anteriores: entidades completas e navegação pelos relacionamentos
+    rows = session.query(JobData).filter(
+        JobData.job_id == job_id, JobData.outlier_data == False
+    ).order_by(JobData.received_at.desc()).limit(size).all()
+    history = serialize_history([(row, "recente") for row in rows])
+    job = session.query(Job).filter(Job.id == job_id).first()
+    expressions, rules = {}, set()
+    for group in job.rule_groups:
+        if group.is_active:
+            for rule in group.rules:
+                if rule.is_active and rule.rule_expression:
+                    expressions[rule.id] = (rule.name, rule.rule_expression, rule.rule_text)
+    job = session.query(Job).filter(Job.id == job_id).first()
+    for group in job.rule_groups:
+        if group.is_active:
+            for rule in group.rules:
+                if rule.is_active and not rule.rule_expression:
+                    rules.add(rule.rule_text)
+    return history, list(expressions.values()), list(rules)
+
+def projection_path(session, job_id: str, size: int):
+    selection = select_history(session, job_id, size, include_outliers=False, strategy=HISTORY_STRATEGY_RECENT, now=datetime.now())
+    return serialize_history(selection), get_job_expression_rules(session, job_id), get_job_rules(session, job_id)
+
+def measure(function, Session, job_ids: list, size: int, requests: int):
+    timings = []
+    allocated = []
+    blocks = []
+    for i in range(requests):
+        job_id = job_ids[i % len(job_ids)]
+        session = Session()
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            function(session, job_id, size)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            session.close()
+        stats = snapshot.statistics("filename")
+        timings.append(elapsed)
+        allocated.append(peak)
+        blocks.append(sum(stat.count for stat in stats))
+    timings.sort()
+    return {
+        "p50": timings[len(timings) // 2],
+        "p95": timings[int(len(timings) * 0.95) - 1],
+        "peak_kib": sum(allocated) / len(allocated) / 1024,
+        "blocks": sum(blocks) / len(blocks),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark das leituras de histórico e regras por requisição.")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--history", type=int, default=30, help="Tamanho da janela de histórico")
+    parser.add_argument("--deliveries", type=int, default=200, help="Entregas gravadas por job")
+    parser.add_argument("--groups-per-job", type=int, default=3)
+    parser.add_argument("--rules-per-group", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_database_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    session = Session()
+    job_ids = populate(session, args.jobs, args.deliveries, args.groups_per_job, args.rules_per_group)
+    session.close()
+
+    # Aquecimento (compilação e cache das consultas)
+    for function in (legacy_path, projection_path):
+        measure(function, Session, job_ids, args.history, len(job_ids))
+
+    for name, function in (("ORM (entidades)", legacy_path), ("projeção (Core)", projection_path)):
+        result = measure(function, Session, job_ids, args.history, args.requests)
+        print(
+            f"{name:<18} p50 {result['p50']:7.2f} ms | p95 {result['p95']:7.2f} ms | "
+            f"pico {result['peak_kib']:8.1f} KiB/req | {result['blocks']:8.0f} blocos retidos/req"
+        )
+
+if __name__ == "__main__":
+    main()
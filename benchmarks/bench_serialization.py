@@ -0,0 +1,92 @@
+"""
+Microbenchmark da serialização de GET /api/v1/jobs/: caminho ORM + Pydantic + json
+(padrão do FastAPI com response_model) contra projeções de colunas + orjson.
+
+Roda em um SQLite em memória, sem serviços externos:
+    python -m benchmarks.bench_serialization --jobs 1000 --repeat 5
+"""
+import json
+import gzip
+import time
+import uuid
+import argparse
+from datetime import datetime
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import sessionmaker
+from database import create_database_engine
+from models import Base, Job, Rule, RuleGroup
+from schemas import Job as JobSchema
+from fast_responses import jobs_payload
+
+def populate(session, jobs: int, groups: int, rules_per_group: int, groups_per_job: int):
+    now = datetime.now()
+    rule_groups = []
+    for g in range(groups):
+        group = RuleGroup(id=uuid.uuid4(), name=f"Grupo {g}", description="Grupo de benchmark", created_at=now, updated_at=now)
+        group.rules = [
+            Rule(id=uuid.uuid4(), name=f"Regra {g}-{r}", description="Regra de benchmark",
+                 rule_text=f"O valor de 'campo_{r}' deve ser maior que zero.", rule_expression=f"campo_{r} > 0",
+                 created_at=now, updated_at=now)
+            for r in range(rules_per_group)
+        ]
+        rule_groups.append(group)
+        session.add(group)
+    for j in range(jobs):
+        job = Job(id=uuid.uuid4().hex, job_name=f"Job {j}", job_filename=f"arquivo_{j}.csv",
+                  description="Job de benchmark", created_at=now, updated_at=now)
+        job.rule_groups = [rule_groups[(j + k) % groups] for k in range(groups_per_job)]
+        session.add(job)
+    session.commit()
+
+def legacy_path(Session) -> bytes:
+    session = Session()
+    try:
+        jobs = session.query(Job).all()
+        validated = [JobSchema.model_validate(job) for job in jobs]
+        return json.dumps(jsonable_encoder(validated)).encode()
+    finally:
+        session.close()
+
+def fast_path(Session) -> bytes:
+    session = Session()
+    try:
+        return orjson.dumps(jobs_payload(session))
+    finally:
+        session.close()
+
+def measure(function, Session, repeat: int):
+    timings = []
+    body = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function(Session)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), sum(timings) / len(timings), body
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark da serialização dos endpoints de leitura.")
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--rules-per-group", type=int, default=5)
+    parser.add_argument("--groups-per-job", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_database_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    populate(session, args.jobs, args.groups, args.rules_per_group, args.groups_per_job)
+    session.close()
+
+    scale = 1000 / args.jobs
+    for name, function in (("ORM + Pydantic + json", legacy_path), ("projeção + orjson", fast_path)):
+        best, mean, body = measure(function, Session, args.repeat)
+        print(
+            f"{name:<24} melhor {best * scale:8.2f} ms/1k jobs | média {mean * scale:8.2f} ms/1k jobs | "
+            f"{len(body) / 1024:8.1f} KiB | gzip {len(gzip.compress(body, compresslevel=5)) / 1024:8.1f} KiB"
+        )
+
+if __name__ == "__main__":
+    main()
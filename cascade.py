@@ -0,0 +1,168 @@
+import os
+import time
+import threading
+from collections import deque
+from typing import Optional
+from llm_client import initialize_llm_client, request_evaluation
+from shadow import PRIMARY_PRICE_INPUT, PRIMARY_PRICE_OUTPUT
+
+# Cascata de modelos: um modelo rápido e barato avalia primeiro e o modelo principal
+# (MONAI_LLM_MODEL) só é consultado quando o veredicto é "false" ou a confiança é baixa
+CASCADE_LLM = os.getenv("MONAI_CASCADE_LLM")  # Provedor do modelo rápido (padrão: MONAI_LLM)
+CASCADE_LLM_MODEL = os.getenv("MONAI_CASCADE_LLM_MODEL")  # Modelo rápido; a cascata fica desativada se vazio
+CASCADE_LLM_KEY = os.getenv("MONAI_CASCADE_LLM_KEY")  # Chave do provedor do modelo rápido (padrão: MONAI_LLM_KEY)
+CASCADE_CONFIDENCE_THRESHOLD = float(os.getenv("MONAI_CASCADE_CONFIDENCE_THRESHOLD", 0.8))  # Confiança mínima para aceitar o veredicto
+CASCADE_PRICE_INPUT = float(os.getenv("MONAI_CASCADE_LLM_PRICE_INPUT", 0))  # Preço por milhão de tokens de entrada
+CASCADE_PRICE_OUTPUT = float(os.getenv("MONAI_CASCADE_LLM_PRICE_OUTPUT", 0))  # Preço por milhão de tokens de saída
+
+TIER_FAST = "fast"
+TIER_STRONG = "strong"
+
+# Motivos de escalonamento para o modelo principal
+ESCALATION_FALSE = "false_verdict"
+ESCALATION_LOW_CONFIDENCE = "low_confidence"
+ESCALATION_ERROR = "error"
+
+LATENCY_WINDOW = 1000  # Latências recentes mantidas por camada para os percentis
+
+def _percentile(values, percent: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class _TierStats:
+    __slots__ = ("calls", "latencies", "prompt_tokens", "completion_tokens", "price_input", "price_output")
+
+    def __init__(self, price_input: float, price_output: float):
+        self.calls = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.price_input = price_input
+        self.price_output = price_output
+
+    def snapshot(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "calls": self.calls,
+            "latency_ms": {
+                "avg": sum(latencies) / len(latencies) if latencies else None,
+                "p50": _percentile(latencies, 50),
+                "p95": _percentile(latencies, 95),
+            },
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": (self.prompt_tokens * self.price_input + self.completion_tokens * self.price_output) / 1_000_000,
+        }
+
+class ModelCascade:
+    """
+    Avaliação em cascata: o modelo rápido responde com veredicto e confiança; veredictos
+    "true" com confiança a partir de CASCADE_CONFIDENCE_THRESHOLD são aceitos e os demais
+    (anomalias, baixa confiança ou erro) são escalonados para o modelo principal.
+
+    As métricas (taxa de escalonamento, latência, tokens e custo por camada) são mantidas
+    em memória, por worker.
+    """
+
+    def __init__(self, provider: Optional[str], model: Optional[str], key: Optional[str], threshold: float):
+        self.provider = (provider or os.getenv("MONAI_LLM", "OPENAI")).upper()
+        self.model = model
+        self.key = key or os.getenv("MONAI_LLM_KEY")
+        self.threshold = threshold
+        self._client = None
+        self._lock = threading.Lock()
+        self.tiers = {
+            TIER_FAST: _TierStats(CASCADE_PRICE_INPUT, CASCADE_PRICE_OUTPUT),
+            TIER_STRONG: _TierStats(PRIMARY_PRICE_INPUT, PRIMARY_PRICE_OUTPUT),
+        }
+        self.accepted = 0
+        self.escalations = {ESCALATION_FALSE: 0, ESCALATION_LOW_CONFIDENCE: 0, ESCALATION_ERROR: 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.model)
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client, self.model, self.provider = initialize_llm_client(self.provider, self.model, self.key)
+            return self._client
+
+    def record(self, tier: str, latency_ms: Optional[float] = None, usage: Optional[dict] = None):
+        """
+        Registra uma chamada da camada (latência até o veredicto) e/ou os tokens consumidos.
+        """
+        with self._lock:
+            stats = self.tiers[tier]
+            if latency_ms is not None:
+                stats.calls += 1
+                stats.latencies.append(latency_ms)
+            if usage:
+                stats.prompt_tokens += usage.get("prompt_tokens", 0) or 0
+                stats.completion_tokens += usage.get("completion_tokens", 0) or 0
+
+    def _escalate(self, reason: str):
+        with self._lock:
+            self.escalations[reason] += 1
+
+    def evaluate(self, prompt: str, max_tokens: int, structured: bool, max_retries: int, usage: Optional[dict] = None) -> Optional[dict]:
+        """
+        Avalia o prompt com o modelo rápido.
+
+        Returns:
+            Optional[dict]: A avaliação {result, explain, confidence}, se aceita; None se a
+            avaliação deve ser escalonada para o modelo principal.
+        """
+        tier_usage = {}
+        started = time.perf_counter()
+        try:
+            evaluation = request_evaluation(
+                self._get_client(), self.model, self.provider, prompt,
+                max_tokens=max_tokens,
+                structured=structured,
+                max_retries=max_retries,
+                usage=tier_usage,
+                confidence=True
+            )
+        except Exception as e:
+            self.record(TIER_FAST, (time.perf_counter() - started) * 1000, tier_usage)
+            self._escalate(ESCALATION_ERROR)
+            print(f"Erro no modelo rápido da cascata, escalonando: {getattr(e, 'detail', None) or str(e)}")
+            return None
+        finally:
+            if usage is not None:
+                for key, value in tier_usage.items():
+                    usage[key] = usage.get(key, 0) + value
+        self.record(TIER_FAST, (time.perf_counter() - started) * 1000, tier_usage)
+
+        if evaluation["result"] != "true":
+            self._escalate(ESCALATION_FALSE)
+            return None
+        if evaluation["confidence"] is None or evaluation["confidence"] < self.threshold:
+            self._escalate(ESCALATION_LOW_CONFIDENCE)
+            return None
+        with self._lock:
+            self.accepted += 1
+        return evaluation
+
+    def metrics(self) -> dict:
+        with self._lock:
+            fast_calls = self.tiers[TIER_FAST].calls
+            escalated = sum(self.escalations.values())
+            return {
+                "enabled": self.enabled,
+                "fast_model": self.model,
+                "confidence_threshold": self.threshold,
+                "accepted": self.accepted,
+                "escalated": escalated,
+                "escalation_rate": escalated / fast_calls if fast_calls else None,
+                "escalations": dict(self.escalations),
+                "tiers": {tier: stats.snapshot() for tier, stats in self.tiers.items()},
+            }
+
+model_cascade = ModelCascade(CASCADE_LLM, CASCADE_LLM_MODEL, CASCADE_LLM_KEY, CASCADE_CONFIDENCE_THRESHOLD)
@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from models import CatalogRevision, Job, Rule, RuleGroup
+
+# Contador de revisão do catálogo (regras, grupos de regras e jobs). É incrementado na
+# mesma transação de qualquer alteração do catálogo, inclusive das associações, e
+# permite responder GETs condicionais sem consultar nem serializar o catálogo.
+CATALOG = "catalog"
+_CATALOG_MODELS = (Rule, RuleGroup, Job)
+
+def _touches_catalog(session: Session) -> bool:
+    for obj in session.new:
+        if isinstance(obj, _CATALOG_MODELS):
+            return True
+    for obj in session.deleted:
+        if isinstance(obj, _CATALOG_MODELS):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, _CATALOG_MODELS) and session.is_modified(obj):
+            return True
+    return False
+
+@event.listens_for(Session, "before_flush")
+def _mark_catalog_change(session: Session, flush_context, instances):
+    if _touches_catalog(session):
+        session.info["catalog_changed"] = True
+
+@event.listens_for(Session, "after_flush")
+def _bump_catalog_revision(session: Session, flush_context):
+    if not session.info.pop("catalog_changed", False):
+        return
+    connection = session.connection()
+    now = datetime.now()
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        upsert = None
+
+    if upsert is not None:
+        # INSERT ... ON CONFLICT: a primeira alteração de transações simultâneas não viola a chave do contador
+        connection.execute(
+            upsert(CatalogRevision)
+            .values(name=CATALOG, revision=1, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=[CatalogRevision.name],
+                set_={"revision": CatalogRevision.revision + 1, "updated_at": now}
+            )
+        )
+        return
+
+    result = connection.execute(
+        update(CatalogRevision)
+        .where(CatalogRevision.name == CATALOG)
+        .values(revision=CatalogRevision.revision + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(CatalogRevision).values(name=CATALOG, revision=1, updated_at=now))
+
+def catalog_version(db: Session) -> Tuple[str, Optional[datetime]]:
+    """
+    Retorna a versão atual do catálogo (ETag) e a data da última alteração.
+    """
+    row = db.execute(
+        select(CatalogRevision.epoch, CatalogRevision.revision, CatalogRevision.updated_at)
+        .where(CatalogRevision.name == CATALOG)
+    ).first()
+    if row is None:
+        return 'W/"catalog-0"', None
+    return f'W/"catalog-{row.epoch}-{row.revision}"', row.updated_at
+
+def cache_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.astimezone()
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Avalia os cabeçalhos If-None-Match e If-Modified-Since da requisição.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Comparação fraca: ignora o prefixo W/
+        return "*" in tags or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in tags]
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.astimezone()
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def not_modified_response(request: Request, db: Session) -> Tuple[Optional[Response], dict]:
+    """
+    Retorna uma resposta 304 quando o cliente já possui a versão atual do catálogo,
+    junto com os cabeçalhos de cache a serem enviados na resposta completa.
+    """
+    etag, last_modified = catalog_version(db)
+    headers = cache_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
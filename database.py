@@ -1,12 +1,127 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+import threading
+from typing import Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
+
+# Modo embarcado: sem MONAI_DATABASE_URL, a aplicação usa um arquivo SQLite local
+SQLITE_PATH = os.getenv("MONAI_SQLITE_PATH", "monai.db")  # Arquivo do SQLite (":memory:" para um banco em memória)
+SQLITE_BUSY_TIMEOUT = int(os.getenv("MONAI_SQLITE_BUSY_TIMEOUT", 5000))  # Espera (ms) por locks de escrita
+SQLITE_CACHE_SIZE_KB = int(os.getenv("MONAI_SQLITE_CACHE_SIZE_KB", 65536))  # Cache de páginas por conexão
+SQLITE_MMAP_SIZE = int(os.getenv("MONAI_SQLITE_MMAP_SIZE", 268435456))  # Bytes do arquivo mapeados em memória
 
 # Obtém a URL do banco de dados a partir da variável de ambiente
 DATABASE_URL = os.getenv("MONAI_DATABASE_URL")
 
 if not DATABASE_URL:
-    raise ValueError("A variável de ambiente DATABASE_URL não está configurada.")
+    print(f"MONAI_DATABASE_URL não configurada; usando o SQLite embarcado em {SQLITE_PATH}")
+    DATABASE_URL = f"sqlite:///{SQLITE_PATH}"
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Ajusta cada conexão SQLite: WAL permite leituras concorrentes com uma escrita,
+    synchronous=NORMAL é seguro com WAL e reduz os fsyncs, e as chaves estrangeiras
+    passam a ser verificadas como no PostgreSQL.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_database_engine(url: str, **kwargs) -> Engine:
+    """
+    Cria o engine do banco de dados. Para SQLite, libera o uso da conexão entre as threads
+    do pool, mantém uma única conexão nos bancos em memória e aplica os pragmas de desempenho.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, **kwargs)
+
+    connect_args = {"check_same_thread": False}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        kwargs.setdefault("poolclass", StaticPool)
+    sqlite_engine = create_engine(url, connect_args=connect_args, **kwargs)
+    event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+    return sqlite_engine
+
+engine = create_database_engine(DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Réplica de leitura opcional: endpoints GET e leituras de regras são direcionados a ela
+DATABASE_REPLICA_URL = os.getenv("MONAI_DATABASE_REPLICA_URL")
+REPLICA_MAX_LAG = float(os.getenv("MONAI_REPLICA_MAX_LAG", 5))  # Atraso máximo (s) tolerado na réplica
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("MONAI_REPLICA_LAG_CHECK_INTERVAL", 5))  # Intervalo (s) entre as verificações do atraso
+
+replica_engine = create_database_engine(DATABASE_REPLICA_URL, pool_pre_ping=True) if DATABASE_REPLICA_URL else None
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+
+# Atraso de replicação no PostgreSQL: zero quando todo o WAL recebido já foi aplicado
+_REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+_replica_state = {"checked_at": 0.0, "healthy": False, "lag": None}
+_replica_lock = threading.Lock()
+
+def replica_lag() -> Optional[float]:
+    """
+    Mede o atraso de replicação da réplica, em segundos (None se a réplica estiver indisponível).
+    """
+    try:
+        with replica_engine.connect() as connection:
+            if replica_engine.dialect.name != "postgresql":
+                return 0.0
+            return float(connection.execute(_REPLICA_LAG_QUERY).scalar() or 0)
+    except Exception as e:
+        print(f"Réplica de leitura indisponível: {str(e)}")
+        return None
+
+def _probe_replica():
+    try:
+        lag = replica_lag()
+        _replica_state.update(
+            checked_at=time.monotonic(),
+            lag=lag,
+            healthy=lag is not None and lag <= REPLICA_MAX_LAG
+        )
+    finally:
+        _replica_lock.release()
+
+def replica_healthy() -> bool:
+    """
+    Indica se a réplica pode atender leituras: disponível e com atraso dentro do limite.
+
+    Retorna sempre o último estado conhecido, sem bloquear a requisição: a cada
+    REPLICA_LAG_CHECK_INTERVAL segundos, uma única verificação é disparada em segundo plano.
+    Até a primeira verificação terminar, as leituras vão para o banco principal.
+    """
+    if replica_engine is None:
+        return False
+    if time.monotonic() - _replica_state["checked_at"] >= REPLICA_LAG_CHECK_INTERVAL:
+        # O lock é liberado pela thread da verificação; se já houver uma em andamento, segue com o estado atual
+        if _replica_lock.acquire(blocking=False):
+            try:
+                threading.Thread(target=_probe_replica, name="monai-replica-probe", daemon=True).start()
+            except Exception:
+                _replica_lock.release()
+                raise
+    return _replica_state["healthy"]
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+def ReadSessionLocal() -> Session:
+    """
+    Cria uma sessão somente leitura: na réplica, se configurada e dentro do limite de atraso,
+    ou no banco principal.
+    """
+    if replica_healthy():
+        return ReplicaSessionLocal()
+    return SessionLocal()
@@ -0,0 +1,179 @@
+import os
+import gzip
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models import Rule, RuleGroup, Job, rule_group_rules, job_rule_groups
+
+# Compressão das respostas grandes dos endpoints de leitura
+RESPONSE_COMPRESSION = os.getenv("MONAI_RESPONSE_COMPRESSION", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("MONAI_COMPRESSION_MIN_SIZE", 1024))  # Tamanho mínimo (bytes) para comprimir
+GZIP_LEVEL = int(os.getenv("MONAI_GZIP_LEVEL", 5))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def fast_json_response(request: Request, content, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """
+    Serializa o conteúdo com orjson (UUID e datetime são tratados nativamente) e, para
+    respostas grandes, aplica compressão br (se o pacote brotli estiver instalado) ou
+    gzip conforme o Accept-Encoding do cliente.
+    """
+    body = orjson.dumps(content)
+    headers = dict(headers or {})
+
+    if RESPONSE_COMPRESSION and len(body) >= COMPRESSION_MIN_SIZE:
+        accepted = request.headers.get("accept-encoding", "").lower()
+        headers["Vary"] = "Accept-Encoding"
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=4)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+# As funções abaixo montam os dicionários de resposta diretamente a partir de projeções
+# de colunas, no mesmo formato dos schemas (RuleWithGroups, RuleGroup e Job), sem
+# hidratar objetos ORM nem revalidar os modelos Pydantic aninhados.
+
+_RULE_COLUMNS = (
+    Rule.id, Rule.name, Rule.description, Rule.rule_text, Rule.rule_expression,
+    Rule.is_active, Rule.created_at, Rule.updated_at
+)
+_GROUP_COLUMNS = (
+    RuleGroup.id, RuleGroup.name, RuleGroup.description,
+    RuleGroup.is_active, RuleGroup.created_at, RuleGroup.updated_at
+)
+_JOB_COLUMNS = (
+    Job.id, Job.job_name, Job.job_filename, Job.description,
+    Job.is_active, Job.priority_weight, Job.max_concurrency, Job.created_at, Job.updated_at
+)
+
+def _rule_payloads(db: Session, rule_ids: Optional[Iterable] = None) -> Dict[object, dict]:
+    query = select(*_RULE_COLUMNS)
+    if rule_ids is not None:
+        query = query.where(Rule.id.in_(list(rule_ids)))
+    return {
+        row.id: {
+            "name": row.name,
+            "description": row.description,
+            "rule_text": row.rule_text,
+            "rule_expression": row.rule_expression,
+            "is_active": row.is_active,
+            "id": row.id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+        }
+        for row in db.execute(query)
+    }
+
+def _group_payloads(db: Session, group_ids: Optional[Iterable] = None) -> Dict[object, dict]:
+    query = select(*_GROUP_COLUMNS)
+    links_query = select(rule_group_rules.c.rule_group_id, rule_group_rules.c.rule_id)
+    if group_ids is not None:
+        group_ids = list(group_ids)
+        query = query.where(RuleGroup.id.in_(group_ids))
+        links_query = links_query.where(rule_group_rules.c.rule_group_id.in_(group_ids))
+
+    rules_by_group = defaultdict(list)
+    for group_id, rule_id in db.execute(links_query):
+        rules_by_group[group_id].append(rule_id)
+    if not rules_by_group:
+        rules = {}
+    elif group_ids is None:
+        rules = _rule_payloads(db)
+    else:
+        rules = _rule_payloads(db, {rule_id for ids in rules_by_group.values() for rule_id in ids})
+
+    return {
+        row.id: {
+            "name": row.name,
+            "description": row.description,
+            "is_active": row.is_active,
+            "id": row.id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "rules": [rules[rule_id] for rule_id in rules_by_group.get(row.id, []) if rule_id in rules],
+        }
+        for row in db.execute(query)
+    }
+
+def rules_payload(db: Session, rule_id=None) -> List[dict]:
+    """
+    Regras com seus grupos (formato de RuleWithGroups).
+    """
+    rules = _rule_payloads(db, [rule_id] if rule_id is not None else None)
+    if not rules:
+        return []
+
+    links_query = select(rule_group_rules.c.rule_id, rule_group_rules.c.rule_group_id)
+    if rule_id is not None:
+        links_query = links_query.where(rule_group_rules.c.rule_id == rule_id)
+    groups_by_rule = defaultdict(list)
+    for link_rule_id, group_id in db.execute(links_query):
+        groups_by_rule[link_rule_id].append(group_id)
+    if not groups_by_rule:
+        groups = {}
+    elif rule_id is None:
+        groups = _group_payloads(db)
+    else:
+        groups = _group_payloads(db, {group_id for ids in groups_by_rule.values() for group_id in ids})
+
+    return [
+        {**rule, "rule_groups": [groups[group_id] for group_id in groups_by_rule.get(rule_id, []) if group_id in groups]}
+        for rule_id, rule in rules.items()
+    ]
+
+def rule_groups_payload(db: Session, group_id=None) -> List[dict]:
+    """
+    Grupos de regras com suas regras (formato de RuleGroup).
+    """
+    return list(_group_payloads(db, [group_id] if group_id is not None else None).values())
+
+def jobs_payload(db: Session, job_id: Optional[str] = None) -> List[dict]:
+    """
+    Jobs com seus grupos de regras (formato de Job).
+    """
+    query = select(*_JOB_COLUMNS)
+    links_query = select(job_rule_groups.c.job_id, job_rule_groups.c.rule_group_id)
+    if job_id is not None:
+        query = query.where(Job.id == job_id)
+        links_query = links_query.where(job_rule_groups.c.job_id == job_id)
+
+    jobs = db.execute(query).all()
+    if not jobs:
+        return []
+
+    groups_by_job = defaultdict(list)
+    for link_job_id, group_id in db.execute(links_query):
+        groups_by_job[link_job_id].append(group_id)
+    if not groups_by_job:
+        groups = {}
+    elif job_id is None:
+        groups = _group_payloads(db)
+    else:
+        groups = _group_payloads(db, {group_id for ids in groups_by_job.values() for group_id in ids})
+
+    return [
+        {
+            "job_name": row.job_name,
+            "job_filename": row.job_filename,
+            "description": row.description,
+            "is_active": row.is_active,
+            "priority_weight": row.priority_weight,
+            "max_concurrency": row.max_concurrency,
+            "id": row.id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "rule_groups": [groups[group_id] for group_id in groups_by_job.get(row.id, []) if group_id in groups],
+        }
+        for row in jobs
+    ]
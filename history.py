@@ -0,0 +1,211 @@
+import os
+import calendar
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from sqlalchemy import and_, or_, select, Row
+from sqlalchemy.orm import Session
+from models import JobData
+from vector_index import vector_indexes
+
+# Estratégias disponíveis para a seleção do histórico enviado ao LLM
+HISTORY_STRATEGY_RECENT = "recent"
+HISTORY_STRATEGY_STRATIFIED = "stratified"
+HISTORY_STRATEGY_SIMILAR = "similar"
+HISTORY_STRATEGY_SUMMARY = "summary"
+HISTORY_STRATEGIES = (HISTORY_STRATEGY_RECENT, HISTORY_STRATEGY_STRATIFIED, HISTORY_STRATEGY_SIMILAR, HISTORY_STRATEGY_SUMMARY)
+
+# Configuração dos estratos de calendário
+HISTORY_STRATEGY = os.getenv("MONAI_HISTORY_STRATEGY", HISTORY_STRATEGY_RECENT).lower()  # Padrão: últimas N execuções
+STRATA_WEEKS = int(os.getenv("MONAI_STRATA_WEEKS", 8))  # Mesmo dia da semana nas últimas M semanas
+STRATA_MONTHS = int(os.getenv("MONAI_STRATA_MONTHS", 6))  # Mesma posição em relação ao fim do mês nos últimos M meses
+STRATA_HOLIDAYS = int(os.getenv("MONAI_STRATA_HOLIDAYS", 3))  # Entregas recentes em feriados
+
+# Rótulos dos estratos incluídos no histórico do prompt
+STRATUM_RECENT = "recente"
+STRATUM_WEEKDAY = "mesmo_dia_da_semana"
+STRATUM_MONTH_END = "mesma_posicao_fim_do_mes"
+STRATUM_HOLIDAY = "feriado"
+STRATUM_SIMILAR = "semelhante"
+
+# Colunas usadas no prompt: o histórico é lido como tuplas (projeção de colunas), sem
+# hidratar objetos JobData nem registrá-los no identity map da sessão
+_HISTORY_COLUMNS = (
+    JobData.id, JobData.attributes, JobData.received_at,
+    JobData.weekday, JobData.month, JobData.is_holiday
+)
+
+def _base_query(job_id: str, include_outliers: bool, before: datetime = None):
+    query = select(*_HISTORY_COLUMNS).where(JobData.job_id == job_id)
+    if not include_outliers:
+        query = query.where(JobData.outlier_data == False)
+    if before is not None:
+        query = query.where(JobData.received_at < before)
+    return query
+
+def _month_end_ranges(now: datetime, months: int) -> List[Tuple[datetime, datetime]]:
+    """
+    Gera os intervalos de um dia que ocupam, nos meses anteriores, a mesma
+    posição em relação ao fim do mês que a data atual.
+    """
+    days_to_month_end = calendar.monthrange(now.year, now.month)[1] - now.day
+    ranges = []
+    year, month = now.year, now.month
+    for _ in range(months):
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+        last_day = calendar.monthrange(year, month)[1]
+        day = max(last_day - days_to_month_end, 1)
+        start = datetime(year, month, day)
+        ranges.append((start, start + timedelta(days=1)))
+    return ranges
+
+def select_history(
+    db: Session,
+    job_id: str,
+    size: int,
+    include_outliers: bool,
+    strategy: str,
+    now: datetime,
+    attributes: dict = None,
+    before: datetime = None
+) -> List[Tuple[Row, str]]:
+    """
+    Seleciona a janela de histórico de um job segundo a estratégia informada.
+
+    A estratégia "recent" retorna as últimas `size` entregas. A estratégia "stratified"
+    monta uma janela de tamanho fixo a partir de estratos de calendário (mesmo dia da
+    semana nas últimas semanas, mesma posição de fim de mês nos últimos meses e feriados
+    recentes), limitados à metade da janela, e completa o restante com as entregas mais
+    recentes. Todas as consultas filtram por job_id e ordenam por received_at, usando
+    os índices de job_data. A estratégia "similar" combina as entregas mais recentes
+    com as mais semelhantes aos atributos numéricos recebidos (índice vetorial do job).
+    A estratégia "summary" seleciona as entregas como "recent"; o prompt envia apenas as
+    mais recentes, acompanhadas dos resumos diários, semanais e mensais do job.
+
+    Args:
+        db (Session): Sessão do banco de dados
+        job_id (str): ID do job
+        size (int): Tamanho da janela de histórico
+        include_outliers (bool): Indica se entregas marcadas como outlier devem ser consideradas
+        strategy (str): Estratégia de seleção ("recent", "stratified", "similar" ou "summary")
+        now (datetime): Data e hora da entrega avaliada
+        attributes (dict, optional): Atributos da entrega avaliada (estratégia "similar")
+        before (datetime, optional): Considera apenas entregas anteriores a esta data (reconstrução do histórico)
+
+    Returns:
+        List[Tuple[Row, str]]: Registros selecionados (id, attributes, received_at, weekday, month e
+        is_holiday) e o estrato de origem, do mais recente ao mais antigo
+    """
+    if strategy not in HISTORY_STRATEGIES:
+        raise ValueError(f"Estratégia de histórico inválida: {strategy}. Opções: {', '.join(HISTORY_STRATEGIES)}.")
+
+    if strategy == HISTORY_STRATEGY_SUMMARY and before is not None:
+        raise ValueError("A estratégia 'summary' não suporta a reconstrução do histórico em uma data anterior.")
+
+    if strategy in (HISTORY_STRATEGY_RECENT, HISTORY_STRATEGY_SUMMARY):
+        rows = db.execute(_base_query(job_id, include_outliers, before).order_by(JobData.received_at.desc()).limit(size)).all()
+        return [(row, STRATUM_RECENT) for row in rows]
+
+    if strategy == HISTORY_STRATEGY_SIMILAR:
+        if before is not None:
+            raise ValueError("A estratégia 'similar' não suporta a reconstrução do histórico em uma data anterior.")
+        return _select_similar(db, job_id, size, include_outliers, attributes)
+
+    calendar_budget = size // 2
+    selected = {}
+
+    def add(rows, stratum):
+        for row in rows:
+            if len(selected) >= calendar_budget:
+                return
+            if row.id not in selected:
+                selected[row.id] = (row, stratum)
+
+    # Mesmo dia da semana nas últimas semanas
+    if STRATA_WEEKS > 0:
+        add(
+            db.execute(_base_query(job_id, include_outliers, before).where(
+                JobData.weekday == now.strftime("%A"),
+                JobData.received_at >= now - timedelta(weeks=STRATA_WEEKS)
+            ).order_by(JobData.received_at.desc()).limit(STRATA_WEEKS)).all(),
+            STRATUM_WEEKDAY
+        )
+
+    # Mesma posição em relação ao fim do mês nos meses anteriores
+    if STRATA_MONTHS > 0:
+        ranges = _month_end_ranges(now, STRATA_MONTHS)
+        add(
+            db.execute(_base_query(job_id, include_outliers, before).where(
+                or_(*[and_(JobData.received_at >= start, JobData.received_at < end) for start, end in ranges])
+            ).order_by(JobData.received_at.desc()).limit(STRATA_MONTHS)).all(),
+            STRATUM_MONTH_END
+        )
+
+    # Entregas recentes em feriados
+    if STRATA_HOLIDAYS > 0:
+        add(
+            db.execute(_base_query(job_id, include_outliers, before).where(
+                JobData.is_holiday == True
+            ).order_by(JobData.received_at.desc()).limit(STRATA_HOLIDAYS)).all(),
+            STRATUM_HOLIDAY
+        )
+
+    # Completar a janela com as entregas mais recentes
+    recent = db.execute(_base_query(job_id, include_outliers, before).order_by(
+        JobData.received_at.desc()
+    ).limit(size)).all()
+    for row in recent:
+        if len(selected) >= size:
+            break
+        if row.id not in selected:
+            selected[row.id] = (row, STRATUM_RECENT)
+
+    return sorted(selected.values(), key=lambda item: item[0].received_at, reverse=True)
+
+def _select_similar(db: Session, job_id: str, size: int, include_outliers: bool, attributes: dict) -> List[Tuple[Row, str]]:
+    """
+    Metade da janela com as entregas mais recentes e o restante com as mais semelhantes.
+    """
+    recent_size = size - size // 2
+    recent = db.execute(_base_query(job_id, include_outliers).order_by(
+        JobData.received_at.desc()
+    ).limit(recent_size)).all()
+    selected = {row.id: (row, STRATUM_RECENT) for row in recent}
+
+    similar_ids = vector_indexes.similar(
+        db, job_id, attributes, k=size - len(selected),
+        include_outliers=include_outliers, exclude=set(selected)
+    )
+    if similar_ids:
+        for row in db.execute(select(*_HISTORY_COLUMNS).where(JobData.id.in_(similar_ids))):
+            selected[row.id] = (row, STRATUM_SIMILAR)
+
+    # Sem atributos numéricos ou com poucas entregas indexadas, completar a janela com as
+    # entregas mais recentes ainda não selecionadas
+    if len(selected) < size:
+        filler = db.execute(_base_query(job_id, include_outliers).where(
+            JobData.id.not_in(list(selected))
+        ).order_by(JobData.received_at.desc()).limit(size - len(selected))).all()
+        for row in filler:
+            selected[row.id] = (row, STRATUM_RECENT)
+
+    return sorted(selected.values(), key=lambda item: item[0].received_at, reverse=True)
+
+def serialize_history(selection: List[Tuple[Row, str]], include_stratum: bool = False) -> List[dict]:
+    """
+    Converte a janela de histórico no formato enviado ao LLM.
+    """
+    history = []
+    for data, stratum in selection:
+        entry = {
+            "attributes": data.attributes,
+            "received_at": data.received_at,
+            "weekday": data.weekday,
+            "month": data.month,
+            "is_holiday": data.is_holiday
+        }
+        if include_stratum:
+            entry["stratum"] = stratum
+        history.append(entry)
+    return history
@@ -0,0 +1,244 @@
+"""
+Resumos hierárquicos (diário, semanal e mensal) dos atributos numéricos das entregas de
+cada job, mantidos de forma incremental a partir da gravação de job_data.
+
+Permitem enviar ao LLM meses de contexto em poucas centenas de tokens: estatísticas por
+período (contagem, média, desvio padrão, mínimo, percentis e máximo) mais as últimas
+entregas completas.
+
+Para reconstruir os resumos a partir do histórico já gravado:
+    python history_summaries.py --rebuild
+    python history_summaries.py --rebuild --job-id <job_id>
+"""
+import os
+import math
+import random
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from models import HistorySummary, JobData
+from vector_index import numeric_attributes
+
+# Mantém os resumos na gravação de job_data. Desativado por padrão: cada entrega atualiza (com lock)
+# três períodos por atributo numérico. Ao ativar, execute --rebuild para resumir o histórico já gravado.
+HISTORY_SUMMARIES = os.getenv("MONAI_HISTORY_SUMMARIES", "false").lower() == "true"
+SUMMARY_DAYS = int(os.getenv("MONAI_SUMMARY_DAYS", 14))  # Períodos diários enviados no prompt
+SUMMARY_WEEKS = int(os.getenv("MONAI_SUMMARY_WEEKS", 8))  # Períodos semanais enviados no prompt
+SUMMARY_MONTHS = int(os.getenv("MONAI_SUMMARY_MONTHS", 12))  # Períodos mensais enviados no prompt
+SUMMARY_RAW_EXECUTIONS = int(os.getenv("MONAI_SUMMARY_RAW_EXECUTIONS", 5))  # Entregas completas enviadas junto com os resumos
+SUMMARY_SAMPLE_SIZE = int(os.getenv("MONAI_SUMMARY_SAMPLE_SIZE", 64))  # Valores mantidos por período para os percentis
+
+GRANULARITY_DAY = "day"
+GRANULARITY_WEEK = "week"
+GRANULARITY_MONTH = "month"
+
+SUMMARY_COLUMNS = ["period_start", "attribute", "count", "mean", "std", "min", "p10", "p50", "p90", "max"]
+
+def bucket_starts(received_at: datetime) -> Dict[str, date]:
+    """
+    Retorna o primeiro dia do período diário, semanal (segunda-feira) e mensal da entrega.
+    """
+    day = received_at.date()
+    return {
+        GRANULARITY_DAY: day,
+        GRANULARITY_WEEK: day - timedelta(days=day.weekday()),
+        GRANULARITY_MONTH: day.replace(day=1),
+    }
+
+def _insert_missing_buckets(db: Session, job_id: str, buckets: Dict[str, date], attributes: List[str]):
+    """
+    Cria os períodos ainda inexistentes com INSERT ... ON CONFLICT DO NOTHING, para que
+    gravações simultâneas do mesmo job não violem a unicidade dos períodos.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    rows = [
+        {"job_id": job_id, "granularity": granularity, "bucket_start": start, "attribute": attribute,
+         "count": 0, "mean": 0.0, "m2": 0.0, "sample": []}
+        for granularity, start in buckets.items()
+        for attribute in attributes
+    ]
+    if insert is not None:
+        db.execute(insert(HistorySummary).on_conflict_do_nothing(
+            index_elements=["job_id", "granularity", "bucket_start", "attribute"]
+        ), rows)
+        return
+
+    existing = {
+        (row.granularity, row.bucket_start, row.attribute)
+        for row in _bucket_query(db, job_id, buckets, attributes)
+    }
+    for row in rows:
+        if (row["granularity"], row["bucket_start"], row["attribute"]) not in existing:
+            db.add(HistorySummary(**row))
+    db.flush()
+
+def _bucket_query(db: Session, job_id: str, buckets: Dict[str, date], attributes: List[str]):
+    return db.query(HistorySummary).filter(
+        HistorySummary.job_id == job_id,
+        or_(*[and_(HistorySummary.granularity == granularity, HistorySummary.bucket_start == start)
+              for granularity, start in buckets.items()]),
+        HistorySummary.attribute.in_(attributes)
+    ).order_by(HistorySummary.granularity, HistorySummary.bucket_start, HistorySummary.attribute)
+
+def _add_value(summary: HistorySummary, value: float):
+    # Média e variância incrementais (Welford)
+    summary.count += 1
+    delta = value - summary.mean
+    summary.mean += delta / summary.count
+    summary.m2 += delta * (value - summary.mean)
+    summary.min = value if summary.min is None else min(summary.min, value)
+    summary.max = value if summary.max is None else max(summary.max, value)
+
+    # Amostragem reservoir: cada valor do período tem a mesma chance de estar na amostra
+    sample = list(summary.sample or [])
+    if len(sample) < SUMMARY_SAMPLE_SIZE:
+        sample.append(value)
+    else:
+        position = random.randrange(summary.count)
+        if position < SUMMARY_SAMPLE_SIZE:
+            sample[position] = value
+    summary.sample = sample
+
+def update_history_summaries(db: Session, job_id: str, received_at: datetime, attributes: Optional[dict]):
+    """
+    Acrescenta a entrega aos resumos diário, semanal e mensal do job, na transação atual.
+
+    Deve ser chamada apenas para entregas que entram no histórico normal (não outliers),
+    antes do commit da gravação de job_data. Não faz nada se MONAI_HISTORY_SUMMARIES estiver desativado.
+    """
+    if HISTORY_SUMMARIES:
+        _summarize_delivery(db, job_id, received_at, attributes)
+
+def _summarize_delivery(db: Session, job_id: str, received_at: datetime, attributes: Optional[dict]):
+    numbers = numeric_attributes(attributes)
+    if not numbers:
+        return
+
+    buckets = bucket_starts(received_at)
+    _insert_missing_buckets(db, job_id, buckets, list(numbers))
+    # Bloqueia os períodos em ordem fixa, evitando deadlocks entre gravações simultâneas
+    for summary in _bucket_query(db, job_id, buckets, list(numbers)).with_for_update().populate_existing():
+        _add_value(summary, numbers[summary.attribute])
+    # A sessão não usa autoflush: grava os incrementos antes da próxima leitura dos períodos
+    db.flush()
+
+def _percentile(ordered: List[float], percent: float) -> Optional[float]:
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def _round(value: Optional[float]) -> Optional[float]:
+    # Quatro algarismos significativos bastam para o LLM e economizam tokens
+    if value is None or value == 0:
+        return value
+    return round(value, max(0, 3 - int(math.floor(math.log10(abs(value))))))
+
+def _months_before(month_start: date, months: int) -> date:
+    index = month_start.year * 12 + month_start.month - 1 - max(months, 0)
+    return date(index // 12, index % 12 + 1, 1)
+
+def summarize_history(db: Session, job_id: str, now: datetime) -> Dict[str, dict]:
+    """
+    Monta os resumos diários, semanais e mensais do job para o prompt, em formato tabular.
+
+    Returns:
+        Dict[str, dict]: Para cada granularidade, {"columns": [...], "rows": [...]}, com os
+        períodos do mais recente ao mais antigo.
+    """
+    today = now.date()
+    lookbacks = {
+        GRANULARITY_DAY: (SUMMARY_DAYS, today - timedelta(days=SUMMARY_DAYS - 1)),
+        GRANULARITY_WEEK: (SUMMARY_WEEKS, today - timedelta(days=today.weekday(), weeks=SUMMARY_WEEKS - 1)),
+        GRANULARITY_MONTH: (SUMMARY_MONTHS, _months_before(today.replace(day=1), SUMMARY_MONTHS - 1)),
+    }
+
+    summaries = {}
+    for granularity, (periods, since) in lookbacks.items():
+        if periods <= 0:
+            continue
+        rows = db.query(HistorySummary).filter(
+            HistorySummary.job_id == job_id,
+            HistorySummary.granularity == granularity,
+            HistorySummary.bucket_start >= since,
+            HistorySummary.count > 0
+        ).order_by(HistorySummary.bucket_start.desc(), HistorySummary.attribute).all()
+
+        table = []
+        for row in rows:
+            ordered = sorted(row.sample or [])
+            std = math.sqrt(row.m2 / (row.count - 1)) if row.count > 1 else 0.0
+            table.append([
+                row.bucket_start.isoformat(), row.attribute, row.count,
+                _round(row.mean), _round(std), _round(row.min),
+                _round(_percentile(ordered, 10)), _round(_percentile(ordered, 50)), _round(_percentile(ordered, 90)),
+                _round(row.max),
+            ])
+        if table:
+            summaries[granularity] = {"columns": SUMMARY_COLUMNS, "rows": table}
+    return summaries
+
+def rebuild_history_summaries(db: Session, job_id: Optional[str] = None, batch_size: int = 1000) -> int:
+    """
+    Recalcula os resumos a partir das entregas (não outliers) já gravadas em job_data.
+
+    Returns:
+        int: Número de entregas processadas.
+    """
+    summaries = db.query(HistorySummary)
+    deliveries = db.query(JobData.id, JobData.job_id, JobData.received_at, JobData.attributes).filter(JobData.outlier_data == False)
+    if job_id:
+        summaries = summaries.filter(HistorySummary.job_id == job_id)
+        deliveries = deliveries.filter(JobData.job_id == job_id)
+    summaries.delete(synchronize_session=False)
+    db.commit()
+
+    # Paginação por (received_at, id), com um commit por lote
+    processed = 0
+    last = None
+    while True:
+        page = deliveries
+        if last is not None:
+            page = page.filter(or_(
+                JobData.received_at > last.received_at,
+                and_(JobData.received_at == last.received_at, JobData.id > last.id)
+            ))
+        rows = page.order_by(JobData.received_at, JobData.id).limit(batch_size).all()
+        if not rows:
+            return processed
+        for row in rows:
+            _summarize_delivery(db, row.job_id, row.received_at, row.attributes)
+        db.commit()
+        processed += len(rows)
+        last = rows[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantém os resumos hierárquicos do histórico dos jobs.")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcula os resumos a partir de job_data.")
+    parser.add_argument("--job-id", help="Recalcula apenas os resumos de um job.")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        processed = rebuild_history_summaries(db, args.job_id)
+        print(f"Resumos recalculados a partir de {processed} entregas.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
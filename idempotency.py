@@ -0,0 +1,143 @@
+import os
+import time
+import json
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import IdempotencyKey
+
+IDEMPOTENCY_TTL = float(os.getenv("MONAI_IDEMPOTENCY_TTL_HOURS", 24))  # Validade (h) das chaves de idempotência
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("MONAI_IDEMPOTENCY_WAIT_TIMEOUT", 30))  # Espera (s) por uma requisição duplicada em andamento
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("MONAI_IDEMPOTENCY_LOCK_TIMEOUT", 300))  # Após este tempo (s), uma chave em andamento é considerada abandonada
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+# Respostas provisórias (entrega adiada, fila cheia, timeout): não são armazenadas, para que o cliente possa repetir a chave
+PROVISIONAL_STATUS_CODES = (202, 429, 503)
+IDEMPOTENCY_PURGE_INTERVAL = 60
+
+_last_purge = 0.0
+
+def request_fingerprint(content: dict) -> str:
+    """
+    Gera o hash do corpo da requisição, para detectar chaves reutilizadas com outro conteúdo.
+    """
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+def _purge_expired(db: Session, now: datetime):
+    global _last_purge
+    if time.monotonic() - _last_purge < IDEMPOTENCY_PURGE_INTERVAL:
+        return
+    _last_purge = time.monotonic()
+    db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+    db.commit()
+
+def claim_idempotency_key(db: Session, key: str, fingerprint: str) -> Tuple[str, Optional[IdempotencyKey]]:
+    """
+    Tenta reservar a chave de idempotência para esta requisição.
+
+    Returns:
+        Tuple[str, IdempotencyKey]: ("claimed", None) se a chave foi reservada e a requisição
+        deve ser processada; ("completed", registro) se já existe uma resposta armazenada;
+        ("processing", registro) se outra requisição com a mesma chave está em andamento.
+
+    Raises:
+        HTTPException: 422 se a chave já foi usada com outro conteúdo.
+    """
+    now = datetime.now()
+    _purge_expired(db, now)
+
+    record = db.get(IdempotencyKey, key, populate_existing=True)
+    if record is not None and (
+        record.expires_at.replace(tzinfo=None) <= now
+        or (record.status == "processing" and record.created_at.replace(tzinfo=None) <= now - timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT))
+    ):
+        # Chave expirada ou abandonada por uma requisição interrompida
+        db.delete(record)
+        db.commit()
+        record = None
+
+    if record is None:
+        db.add(IdempotencyKey(
+            key=key,
+            fingerprint=fingerprint,
+            status="processing",
+            created_at=now,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_TTL)
+        ))
+        try:
+            db.commit()
+            return "claimed", None
+        except IntegrityError:
+            # Outra requisição reservou a mesma chave ao mesmo tempo
+            db.rollback()
+            record = db.get(IdempotencyKey, key, populate_existing=True)
+            if record is None:
+                return "processing", None
+
+    if record.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="A chave de idempotência já foi usada com outro conteúdo.")
+    return record.status, record
+
+async def acquire_idempotency_key(db: Session, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+    """
+    Reserva a chave de idempotência, aguardando a conclusão de uma requisição duplicada em andamento.
+
+    Returns:
+        Optional[IdempotencyKey]: O registro com a resposta armazenada, ou None se a chave
+        foi reservada e a requisição deve ser processada.
+
+    Raises:
+        HTTPException: 409 se a requisição duplicada não terminar dentro do prazo de espera.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        state, record = await run_in_threadpool(claim_idempotency_key, db, key, fingerprint)
+        if state == "claimed":
+            return None
+        if state == "completed":
+            return record
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail="Uma requisição com a mesma chave de idempotência ainda está em andamento.")
+        await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+def complete_idempotency_key(db: Session, key: str, status_code: int, content):
+    """
+    Armazena a resposta final associada à chave de idempotência.
+
+    A transação corrente é descartada antes: se a avaliação falhou após registrar a entrega
+    (ex.: erro em uma gravação posterior), a sessão pode estar em uma transação inválida.
+    """
+    db.rollback()
+    record = db.get(IdempotencyKey, key)
+    if record is None:
+        return
+    record.status = "completed"
+    record.status_code = status_code
+    record.response = content
+    db.commit()
+
+def release_idempotency_key(db: Session, key: str):
+    """
+    Libera a chave quando a requisição terminou sem registrar a entrega, permitindo nova tentativa.
+    """
+    db.rollback()
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.key == key,
+        IdempotencyKey.status == "processing"
+    ).delete(synchronize_session=False)
+    db.commit()
+
+def replay_response(record: IdempotencyKey) -> JSONResponse:
+    """
+    Reproduz a resposta armazenada para uma chave de idempotência já concluída.
+    """
+    return JSONResponse(
+        status_code=record.status_code,
+        content=record.response,
+        headers={"Idempotent-Replayed": "true"}
+    )
@@ -0,0 +1,175 @@
+"""
+Ingestão em lote de entregas (POST /api/v1/jobs/data/ingest/) para coletores de alto volume.
+
+O corpo é lido de forma incremental, como um fluxo de registros JobDataCreate:
+    - NDJSON (application/x-ndjson), opcionalmente comprimido (Content-Encoding: gzip);
+    - MessagePack (application/msgpack), com os registros concatenados (requer o pacote msgpack).
+
+A memória usada é limitada ao tamanho máximo de um registro mais a fila de registros
+aguardando avaliação, independentemente do tamanho do corpo.
+"""
+import os
+import zlib
+from typing import AsyncIterator, List, Tuple, Union
+from pydantic import TypeAdapter, ValidationError
+from schemas import JobDataCreate
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+INGEST_CONCURRENCY = int(os.getenv("MONAI_INGEST_CONCURRENCY", 4))  # Avaliações simultâneas por requisição de ingestão
+INGEST_QUEUE_SIZE = int(os.getenv("MONAI_INGEST_QUEUE_SIZE", 64))  # Registros lidos aguardando avaliação
+INGEST_MAX_RECORD_BYTES = int(os.getenv("MONAI_INGEST_MAX_RECORD_BYTES", 1024 * 1024))  # Tamanho máximo de um registro
+INGEST_MAX_REPORTED = int(os.getenv("MONAI_INGEST_MAX_REPORTED", 100))  # Anomalias e erros detalhados na resposta
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+# Validação compilada (pydantic-core): o NDJSON é validado direto dos bytes, sem json.loads intermediário
+_job_data_adapter = TypeAdapter(JobDataCreate)
+
+class IngestError(Exception):
+    """
+    Corpo da ingestão inválido ou não suportado.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'registro'}: {item['msg']}"
+        for item in error.errors(include_url=False)
+    )
+
+async def _decompressed(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # Descompressão em blocos limitados (proteção contra "bombas" de compressão); aceita gzip com vários membros
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        pending = chunk
+        while pending:
+            try:
+                data = decompressor.decompress(pending, DECOMPRESS_CHUNK_SIZE)
+            except zlib.error as e:
+                raise IngestError(400, f"Conteúdo gzip inválido: {str(e)}")
+            if decompressor.eof:
+                pending = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                pending = decompressor.unconsumed_tail
+            if data:
+                yield data
+
+async def _ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Union[JobDataCreate, str]]]:
+    buffer = b""
+    index = 0
+    async for data in chunks:
+        buffer += data
+        if b"\n" not in buffer:
+            if len(buffer) > INGEST_MAX_RECORD_BYTES:
+                raise IngestError(413, f"Registro {index} excede {INGEST_MAX_RECORD_BYTES} bytes.")
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            if len(line) > INGEST_MAX_RECORD_BYTES:
+                yield index, f"O registro excede {INGEST_MAX_RECORD_BYTES} bytes."
+            else:
+                yield index, _validate_json(line)
+            index += 1
+        # O registro incompleto que sobra após a última quebra de linha também é limitado
+        if len(buffer) > INGEST_MAX_RECORD_BYTES:
+            raise IngestError(413, f"Registro {index} excede {INGEST_MAX_RECORD_BYTES} bytes.")
+    if buffer.strip():
+        yield index, _validate_json(buffer)
+
+def _validate_json(line: bytes) -> Union[JobDataCreate, str]:
+    try:
+        return _job_data_adapter.validate_json(line)
+    except ValidationError as e:
+        return _validation_message(e)
+
+async def _msgpack_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Union[JobDataCreate, str]]]:
+    unpacker = msgpack.Unpacker(raw=False, max_buffer_size=INGEST_MAX_RECORD_BYTES + DECOMPRESS_CHUNK_SIZE)
+    index = 0
+    async for data in chunks:
+        # Blocos pequenos mantêm o buffer do unpacker abaixo do limite
+        for start in range(0, len(data), DECOMPRESS_CHUNK_SIZE):
+            try:
+                unpacker.feed(data[start:start + DECOMPRESS_CHUNK_SIZE])
+            except msgpack.BufferFull:
+                raise IngestError(413, f"Registro {index} excede {INGEST_MAX_RECORD_BYTES} bytes.")
+            try:
+                for item in unpacker:
+                    try:
+                        yield index, _job_data_adapter.validate_python(item)
+                    except ValidationError as e:
+                        yield index, _validation_message(e)
+                    index += 1
+            except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, ValueError) as e:
+                raise IngestError(400, f"Conteúdo MessagePack inválido após o registro {index}: {str(e)}")
+
+def ingest_records(chunks: AsyncIterator[bytes], content_type: str, content_encoding: str) -> AsyncIterator[Tuple[int, Union[JobDataCreate, str]]]:
+    """
+    Converte o corpo da requisição em um fluxo de (índice, registro validado ou mensagem de erro).
+
+    Raises:
+        IngestError: Formato ou compressão não suportados (415).
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    content_encoding = (content_encoding or "").strip().lower()
+
+    if content_encoding in ("gzip", "x-gzip"):
+        chunks = _decompressed(chunks)
+    elif content_encoding not in ("", "identity"):
+        raise IngestError(415, f"Content-Encoding não suportado: {content_encoding}.")
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        return _ndjson_records(chunks)
+    if content_type in MSGPACK_CONTENT_TYPES:
+        if msgpack is None:
+            raise IngestError(415, "A ingestão em MessagePack requer o pacote msgpack.")
+        return _msgpack_records(chunks)
+    raise IngestError(415, f"Content-Type não suportado: {content_type or 'ausente'}. Use NDJSON ou MessagePack.")
+
+class IngestSummary:
+    """
+    Resumo da ingestão: contagem por resultado e, até INGEST_MAX_REPORTED itens, as
+    anomalias e os erros de cada registro (pelo índice no corpo).
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.results = {"true": 0, "false": 0, "insufficient_history": 0, "deferred": 0, "error": 0}
+        self.anomalies: List[dict] = []
+        self.errors: List[dict] = []
+        self.aborted = None
+
+    def record(self, index: int, outcome: str, detail=None, job_data: JobDataCreate = None):
+        self.results[outcome] += 1
+        if outcome == "false" and len(self.anomalies) < INGEST_MAX_REPORTED:
+            self.anomalies.append({
+                "index": index,
+                "job_name": job_data.job_name if job_data else None,
+                "job_filename": job_data.job_filename if job_data else None,
+                "explanation": detail,
+            })
+        elif outcome == "error" and len(self.errors) < INGEST_MAX_REPORTED:
+            self.errors.append({"index": index, "detail": detail})
+
+    def to_dict(self) -> dict:
+        summary = {
+            "received": self.received,
+            "results": self.results,
+            "anomalies": self.anomalies,
+            "errors": self.errors,
+        }
+        if self.aborted:
+            summary["aborted"] = self.aborted
+        return summary
@@ -0,0 +1,75 @@
+from typing import List, Tuple
+from sqlalchemy import select, or_
+from sqlalchemy.orm import Session
+from models import Rule, RuleGroup, rule_group_rules, job_rule_groups
+
+def _active_job_rules(job_id: str, *columns):
+    # Regras ativas dos grupos ativos do job, em uma única consulta (job -> grupos -> regras)
+    return (
+        select(*columns)
+        .select_from(job_rule_groups)
+        .join(RuleGroup, RuleGroup.id == job_rule_groups.c.rule_group_id)
+        .join(rule_group_rules, rule_group_rules.c.rule_group_id == RuleGroup.id)
+        .join(Rule, Rule.id == rule_group_rules.c.rule_id)
+        .where(
+            job_rule_groups.c.job_id == job_id,
+            RuleGroup.is_active == True,
+            Rule.is_active == True
+        )
+    )
+
+def get_job_rules(db: Session, job_id: str) -> List[str]:
+    """
+    Obtém todas as regras ativas em texto livre associadas a um job através de seus grupos de regras.
+    Regras com expressão estruturada não são incluídas: são avaliadas localmente e só vão ao
+    LLM quando a expressão não se aplica aos atributos recebidos (ver evaluate_rules).
+
+    Args:
+        db (Session): Sessão do banco de dados
+        job_id (str): ID do job
+
+    Returns:
+        List[str]: Lista de regras ativas
+    """
+    query = _active_job_rules(job_id, Rule.rule_text).where(
+        or_(Rule.rule_expression.is_(None), Rule.rule_expression == "")
+    ).distinct().order_by(Rule.rule_text)
+    return list(db.scalars(query))
+
+def get_job_expression_rules(db: Session, job_id: str) -> List[Tuple[str, str, str]]:
+    """
+    Obtém as regras ativas com expressão estruturada associadas a um job.
+
+    Args:
+        db (Session): Sessão do banco de dados
+        job_id (str): ID do job
+
+    Returns:
+        List[Tuple[str, str, str]]: Lista de (nome da regra, expressão, texto da regra); o texto
+        é enviado ao LLM quando a expressão não pode ser avaliada localmente
+    """
+    query = _active_job_rules(job_id, Rule.id, Rule.name, Rule.rule_expression, Rule.rule_text).where(
+        Rule.rule_expression.is_not(None),
+        Rule.rule_expression != ""
+    ).distinct().order_by(Rule.name, Rule.id)
+    return [(name, expression, rule_text) for _, name, expression, rule_text in db.execute(query)]
+
+def get_job_rules_by_group(db: Session, job_id: str) -> List[Tuple[str, List[str]]]:
+    """
+    Obtém as regras ativas em texto livre de um job separadas por grupo de regras (fan-out
+    das regras em sub-prompts).
+
+    Args:
+        db (Session): Sessão do banco de dados
+        job_id (str): ID do job
+
+    Returns:
+        List[Tuple[str, List[str]]]: Nome do grupo e suas regras, na ordem dos nomes dos grupos
+    """
+    query = _active_job_rules(job_id, RuleGroup.id, RuleGroup.name, Rule.rule_text).where(
+        or_(Rule.rule_expression.is_(None), Rule.rule_expression == "")
+    ).distinct().order_by(RuleGroup.name, RuleGroup.id, Rule.rule_text)
+    groups = {}
+    for group_id, name, rule_text in db.execute(query):
+        groups.setdefault(group_id, (name, []))[1].append(rule_text)
+    return list(groups.values())
@@ -1,13 +1,71 @@
 import os
+import re
+import json
+import math
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from fastapi import HTTPException
 
-def initialize_llm_client():
+SYSTEM_INSTRUCTION = "Você é um analista de qualidade de dados altamente especializado."
+
+# Tamanho máximo da explicação; informado ao modelo no schema e no prompt
+EXPLAIN_MAX_CHARS = int(os.getenv("MONAI_EXPLAIN_MAX_CHARS", 500))
+
+# Schema da resposta esperada do LLM: {"result": "true"|"false", "explain": "..."}
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "result": {
+            "type": "string",
+            "enum": ["true", "false"],
+            "description": "Resultado da análise: 'true' se o novo dado segue o padrão do histórico, 'false' caso contrário."
+        },
+        "explain": {
+            "type": "string",
+            "maxLength": EXPLAIN_MAX_CHARS,
+            "description": f"Explicação resumida do resultado, com no máximo {EXPLAIN_MAX_CHARS} caracteres."
+        }
+    },
+    "required": ["result", "explain"],
+    "additionalProperties": False
+}
+
+# Schema usado pelo modelo rápido da cascata, que informa também a confiança do veredicto
+CONFIDENCE_EVALUATION_SCHEMA = {
+    **EVALUATION_SCHEMA,
+    "properties": {
+        **EVALUATION_SCHEMA["properties"],
+        "confidence": {
+            "type": "number",
+            "description": "Confiança no resultado, de 0 (nenhuma) a 1 (total)."
+        }
+    },
+    "required": ["result", "confidence", "explain"]
+}
+
+CONFIDENCE_INSTRUCTION = (
+    "\nInclua também no JSON a chave 'confidence', com um número de 0 a 1 que indica a sua confiança "
+    "no resultado (ex.: 0.95). Use valores baixos quando o histórico for insuficiente ou ambíguo."
+)
+
+# Nome da ferramenta usada para forçar a saída estruturada via tool calling (Anthropic)
+EVALUATION_TOOL_NAME = "registrar_avaliacao"
+
+SCHEMA_OVERHEAD_TOKENS = 24  # Tokens reservados para a estrutura do JSON
+
+# Threads que concluem, em segundo plano, as explicações das respostas em streaming
+LLM_STREAM_WORKERS = int(os.getenv("MONAI_LLM_STREAM_WORKERS", 8))
+_stream_executor = None
+_stream_lock = threading.Lock()
+
+def initialize_llm_client(llm_provider=None, llm_model=None, llm_key=None):
     """
-    Inicializa o cliente LLM com base nas variáveis de ambiente.
+    Inicializa o cliente LLM com base nos parâmetros informados ou, na ausência
+    deles, nas variáveis de ambiente.
     """
-    llm_provider = os.getenv("MONAI_LLM", "OPENAI").upper()
-    llm_model = os.getenv("MONAI_LLM_MODEL", "gpt-4")
-    llm_key = os.getenv("MONAI_LLM_KEY")
+    llm_provider = (llm_provider or os.getenv("MONAI_LLM", "OPENAI")).upper()
+    llm_model = llm_model or os.getenv("MONAI_LLM_MODEL", "gpt-4")
+    llm_key = llm_key or os.getenv("MONAI_LLM_KEY")
 
     if not llm_key:
         raise ValueError("A variável de ambiente MONAI_LLM_KEY não está configurada.")
@@ -26,21 +84,46 @@ def initialize_llm_client():
 
     return client, llm_model, llm_provider
 
-def send_prompt_to_llm(client, llm_model, llm_provider, prompt, max_tokens=200):
+def record_usage(usage, llm_provider, response):
+    """
+    Acumula no dicionário `usage` os tokens de entrada e saída informados pelo provedor.
+    """
+    if usage is None:
+        return
+    if llm_provider == "OPENAI":
+        metadata = getattr(response, "usage", None)
+        prompt_tokens = getattr(metadata, "prompt_tokens", 0)
+        completion_tokens = getattr(metadata, "completion_tokens", 0)
+    elif llm_provider == "GOOGLE":
+        metadata = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(metadata, "prompt_token_count", 0)
+        completion_tokens = getattr(metadata, "candidates_token_count", 0)
+    elif llm_provider == "ANTHROPIC":
+        metadata = getattr(response, "usage", None)
+        prompt_tokens = getattr(metadata, "input_tokens", 0)
+        completion_tokens = getattr(metadata, "output_tokens", 0)
+    else:
+        return
+    usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + (prompt_tokens or 0)
+    usage["completion_tokens"] = usage.get("completion_tokens", 0) + (completion_tokens or 0)
+
+def send_prompt_to_llm(client, llm_model, llm_provider, prompt, max_tokens=200, usage=None):
     """
     Envia o prompt ao LLM e retorna a resposta.
+    Se `usage` for informado, acumula nele os tokens consumidos.
     """
     try:
         if llm_provider == "OPENAI":
             response = client.chat.completions.create(
                 model=llm_model,
                 messages=[
-                    {"role": "system", "content": "Você é um analista de qualidade de dados altamente especializado."},
+                    {"role": "system", "content": SYSTEM_INSTRUCTION},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=max_tokens,
                 temperature=0
             )
+            record_usage(usage, llm_provider, response)
             return response.choices[0].message.content.strip()
         elif llm_provider == "GOOGLE":
             from google.genai import types
@@ -48,23 +131,429 @@ def send_prompt_to_llm(client, llm_model, llm_provider, prompt, max_tokens=200):
                 model=llm_model,
                 contents=[prompt],
                 config=types.GenerateContentConfig(
-                    system_instruction="Você é um analista de qualidade de dados altamente especializado.",
+                    system_instruction=SYSTEM_INSTRUCTION,
                     temperature=0
                 )
             )
+            record_usage(usage, llm_provider, response)
             return getattr(response, "text", "").strip()
         elif llm_provider == "ANTHROPIC":
             response = client.messages.create(
                 model=llm_model,
-                system="Você é um analista de qualidade de dados altamente especializado.",
+                system=SYSTEM_INSTRUCTION,
                 max_tokens=max_tokens,
                 temperature=0,
                 messages=[
                     {"role": "user", "content": prompt}
                 ]
             )
+            record_usage(usage, llm_provider, response)
             return getattr(response.content[0], "text", "").strip()
         else:
             raise ValueError("Cliente LLM não suportado.")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao interagir com o LLM: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erro ao interagir com o LLM: {str(e)}")
+
+def provider_schema(schema: dict, llm_provider: str) -> dict:
+    """
+    Adapta o schema às restrições de cada provedor: o modo strict da OpenAI não aceita
+    "maxLength" (o limite segue informado na descrição e no prompt) e o Gemini não aceita
+    "additionalProperties".
+    """
+    unsupported = {"OPENAI": ("maxLength",), "GOOGLE": ("additionalProperties",)}.get(llm_provider, ())
+    if not unsupported:
+        return schema
+
+    def strip(node):
+        if isinstance(node, dict):
+            return {key: strip(value) for key, value in node.items() if key not in unsupported}
+        return node
+
+    return strip(schema)
+
+def structured_max_tokens(confidence: bool = False) -> int:
+    """
+    Calcula o limite de tokens da resposta a partir do schema: o tamanho máximo
+    da explicação (aprox. 3 caracteres por token) mais a estrutura do JSON.
+    """
+    return math.ceil(EXPLAIN_MAX_CHARS / 3) + SCHEMA_OVERHEAD_TOKENS + (8 if confidence else 0)
+
+def send_structured_prompt_to_llm(client, llm_model, llm_provider, prompt, max_tokens=200, usage=None, schema=EVALUATION_SCHEMA):
+    """
+    Envia o prompt ao LLM forçando a saída no formato de `schema` (padrão: EVALUATION_SCHEMA)
+    por meio dos recursos nativos de cada provedor (JSON schema ou tool calling).
+    Retorna o JSON da resposta como string.
+    """
+    try:
+        if llm_provider == "OPENAI":
+            response = client.chat.completions.create(
+                model=llm_model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_INSTRUCTION},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {
+                        "name": "avaliacao",
+                        "strict": True,
+                        "schema": provider_schema(schema, llm_provider)
+                    }
+                }
+            )
+            record_usage(usage, llm_provider, response)
+            return (response.choices[0].message.content or "").strip()
+        elif llm_provider == "GOOGLE":
+            from google.genai import types
+            response_schema = provider_schema(schema, llm_provider)
+            response = client.models.generate_content(
+                model=llm_model,
+                contents=[prompt],
+                config=types.GenerateContentConfig(
+                    system_instruction=SYSTEM_INSTRUCTION,
+                    temperature=0,
+                    max_output_tokens=max_tokens,
+                    response_mime_type="application/json",
+                    response_schema=response_schema
+                )
+            )
+            record_usage(usage, llm_provider, response)
+            return (getattr(response, "text", "") or "").strip()
+        elif llm_provider == "ANTHROPIC":
+            response = client.messages.create(
+                model=llm_model,
+                system=SYSTEM_INSTRUCTION,
+                max_tokens=max_tokens,
+                temperature=0,
+                tools=[{
+                    "name": EVALUATION_TOOL_NAME,
+                    "description": "Registra o resultado da análise de qualidade do último conjunto de metadados.",
+                    "input_schema": schema
+                }],
+                tool_choice={"type": "tool", "name": EVALUATION_TOOL_NAME},
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            record_usage(usage, llm_provider, response)
+            for block in response.content:
+                if getattr(block, "type", None) == "tool_use":
+                    return json.dumps(block.input, ensure_ascii=False)
+            return ""
+        else:
+            raise ValueError("Cliente LLM não suportado.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao interagir com o LLM: {str(e)}")
+
+def stream_prompt_to_llm(client, llm_model, llm_provider, prompt, max_tokens=200, structured=False, usage=None):
+    """
+    Envia o prompt ao LLM em modo streaming e gera os trechos de texto à medida que chegam.
+    No modo estruturado, gera os trechos do JSON da resposta (JSON schema ou argumentos
+    da ferramenta). Ao final do stream, acumula em `usage` os tokens consumidos.
+    """
+    try:
+        if llm_provider == "OPENAI":
+            kwargs = {}
+            if structured:
+                kwargs["response_format"] = {
+                    "type": "json_schema",
+                    "json_schema": {"name": "avaliacao", "strict": True, "schema": provider_schema(EVALUATION_SCHEMA, llm_provider)}
+                }
+            stream = client.chat.completions.create(
+                model=llm_model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_INSTRUCTION},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0,
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    record_usage(usage, llm_provider, chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        elif llm_provider == "GOOGLE":
+            from google.genai import types
+            config = {"system_instruction": SYSTEM_INSTRUCTION, "temperature": 0}
+            if structured:
+                config.update(
+                    max_output_tokens=max_tokens,
+                    response_mime_type="application/json",
+                    response_schema=provider_schema(EVALUATION_SCHEMA, llm_provider)
+                )
+            last_chunk = None
+            for chunk in client.models.generate_content_stream(
+                model=llm_model,
+                contents=[prompt],
+                config=types.GenerateContentConfig(**config)
+            ):
+                last_chunk = chunk
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+            # O consumo de tokens é informado no último trecho do stream
+            if last_chunk is not None:
+                record_usage(usage, llm_provider, last_chunk)
+        elif llm_provider == "ANTHROPIC":
+            kwargs = {}
+            if structured:
+                kwargs["tools"] = [{
+                    "name": EVALUATION_TOOL_NAME,
+                    "description": "Registra o resultado da análise de qualidade do último conjunto de metadados.",
+                    "input_schema": EVALUATION_SCHEMA
+                }]
+                kwargs["tool_choice"] = {"type": "tool", "name": EVALUATION_TOOL_NAME}
+            with client.messages.stream(
+                model=llm_model,
+                system=SYSTEM_INSTRUCTION,
+                max_tokens=max_tokens,
+                temperature=0,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                **kwargs
+            ) as stream:
+                for event in stream:
+                    if event.type != "content_block_delta":
+                        continue
+                    if event.delta.type == "text_delta":
+                        yield event.delta.text
+                    elif event.delta.type == "input_json_delta":
+                        yield event.delta.partial_json
+                record_usage(usage, llm_provider, stream.get_final_message())
+        else:
+            raise ValueError("Cliente LLM não suportado.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao interagir com o LLM: {str(e)}")
+
+# Veredicto e explicação localizados no JSON ainda incompleto da resposta
+_STREAMED_RESULT = re.compile(r'"result"\s*:\s*"?\s*(true|false)\b', re.IGNORECASE)
+_STREAMED_EXPLAIN = re.compile(r'"explain"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+class StreamedEvaluation:
+    """
+    Avaliação com resposta em streaming: o veredicto é lido assim que o campo 'result'
+    aparece no JSON parcial, e a explicação é concluída depois (ex.: em segundo plano).
+
+    O veredicto retornado por wait_for_result() é definitivo: se a resposta completa não
+    puder ser validada, a explicação é extraída do texto parcial recebido.
+    """
+
+    def __init__(self, client, llm_model, llm_provider, prompt, max_tokens=200, structured=False, max_retries=1, usage=None):
+        self.client = client
+        self.llm_model = llm_model
+        self.llm_provider = llm_provider
+        self.prompt = prompt
+        self.structured = structured
+        self.max_tokens = structured_max_tokens() if structured else max_tokens
+        self.max_retries = max_retries
+        self.usage = usage
+        self.text = ""
+        self.result = None
+        self.evaluation = None
+        self._chunks = stream_prompt_to_llm(
+            client, llm_model, llm_provider, prompt,
+            max_tokens=self.max_tokens, structured=structured, usage=usage
+        )
+
+    def wait_for_result(self) -> str:
+        """
+        Consome o stream até encontrar o veredicto. Se a resposta terminar sem um veredicto
+        reconhecível, aplica o mesmo reparo de request_evaluation.
+        """
+        for chunk in self._chunks:
+            self.text += chunk
+            match = _STREAMED_RESULT.search(self.text)
+            if match:
+                self.result = match.group(1).lower()
+                return self.result
+
+        self._chunks = iter(())
+        try:
+            self.evaluation = parse_evaluation(self.text)
+        except ValueError as e:
+            if self.max_retries < 1:
+                raise ValueError(f"A resposta do modelo é inválida: {e}")
+            self.evaluation = request_evaluation(
+                self.client, self.llm_model, self.llm_provider, build_repair_prompt(self.prompt, self.text, e),
+                max_tokens=self.max_tokens, structured=self.structured, max_retries=self.max_retries - 1, usage=self.usage
+            )
+        self.result = self.evaluation["result"]
+        return self.result
+
+    def finish(self) -> dict:
+        """
+        Consome o restante do stream e retorna a avaliação {result, explain}, mantendo o
+        veredicto já retornado.
+        """
+        if self.evaluation is None:
+            try:
+                for chunk in self._chunks:
+                    self.text += chunk
+            finally:
+                self._chunks.close()
+            try:
+                explain = parse_evaluation(self.text)["explain"]
+            except ValueError:
+                # Resposta truncada ou inválida: aproveita o trecho recebido da explicação
+                match = _STREAMED_EXPLAIN.search(self.text)
+                explain = match.group(1).replace('\\"', '"') if match else self.text.strip()
+            self.evaluation = {"result": self.result, "explain": explain}
+        return self.evaluation
+
+    def close(self):
+        """
+        Interrompe o stream sem concluir a explicação.
+        """
+        if self.evaluation is None and hasattr(self._chunks, "close"):
+            self._chunks.close()
+
+def finish_in_background(streamed: StreamedEvaluation, release=None) -> Future:
+    """
+    Conclui a avaliação em streaming em segundo plano. `release` (ex.: a vaga do
+    escalonamento de chamadas ao LLM) é executado ao fim do stream.
+
+    Returns:
+        Future: Resolvido com a avaliação {result, explain} completa.
+    """
+    global _stream_executor
+    with _stream_lock:
+        if _stream_executor is None:
+            _stream_executor = ThreadPoolExecutor(max_workers=LLM_STREAM_WORKERS, thread_name_prefix="monai-llm-stream")
+
+    def run():
+        try:
+            return streamed.finish()
+        finally:
+            if release is not None:
+                release()
+
+    try:
+        return _stream_executor.submit(run)
+    except Exception:
+        streamed.close()
+        if release is not None:
+            release()
+        raise
+
+def clean_response(response: str) -> str:
+    """
+    Remove caracteres desnecessários, como backticks e texto adicional,
+    para garantir que a resposta seja um JSON puro.
+    """
+    response = response.strip()  # Remove espaços em branco no início e no final
+    response = response.strip("```json").strip("```")
+    if response.startswith("```json"):
+        response = response[7:].strip()  # Remove os 3 backticks e json no início
+    if response.startswith("```"):
+        response = response[3:].strip()  # Remove os 3 backticks no início
+    if response.endswith("```"):
+        response = response[3:].strip()  # Remove os 3 backticks no no final
+    if response.startswith("json"):
+        response = response[4:].strip()  # Remove o prefixo "json" se existir
+
+    """
+    Remove tudo que estiver antes do primeiro '{' e depois do último '}'.
+    Garante que a resposta seja um JSON puro.
+    """
+    try:
+        # Localiza o índice do primeiro '{' e do último '}'
+        start_index = response.index('{')
+        end_index = response.rindex('}') + 1  # Inclui o último '}'
+
+        # Retorna apenas o conteúdo entre o primeiro '{' e o último '}'
+        return response[start_index:end_index].strip()
+    except ValueError:
+        # Caso não encontre '{' ou '}', retorna um erro
+        raise ValueError("A resposta não contém um JSON válido.")
+
+def parse_evaluation(response: str, confidence: bool = False) -> dict:
+    """
+    Converte a resposta do LLM em um dicionário {result, explain} validado. Com
+    `confidence`, inclui a confiança informada pelo modelo (entre 0 e 1, ou None se
+    ausente ou inválida).
+
+    Raises:
+        ValueError: Se a resposta não for um JSON válido ou não respeitar o schema.
+    """
+    try:
+        evaluation = json.loads(response)
+    except ValueError:
+        # Reparo local: extrai o JSON de respostas com texto ou backticks adicionais
+        evaluation = json.loads(clean_response(response))
+
+    if not isinstance(evaluation, dict) or "result" not in evaluation or "explain" not in evaluation:
+        raise ValueError("A resposta do modelo não contém as chaves esperadas: 'result' e 'explain'.")
+
+    result = str(evaluation["result"]).strip().lower()
+    if result not in ("true", "false"):
+        raise ValueError("O valor de 'result' na resposta do modelo é inválido.")
+
+    parsed = {"result": result, "explain": str(evaluation["explain"])}
+    if confidence:
+        try:
+            parsed["confidence"] = min(max(float(evaluation.get("confidence")), 0.0), 1.0)
+        except (TypeError, ValueError):
+            parsed["confidence"] = None
+    return parsed
+
+def build_repair_prompt(prompt: str, response: str, error: Exception) -> str:
+    """
+    Monta o prompt de reparo enviado ao LLM quando a resposta anterior é inválida.
+    """
+    return (
+        f"{prompt}\n\n"
+        f"Sua resposta anterior foi inválida ({error}):\n{response}\n\n"
+        "Responda novamente retornando exclusivamente um JSON com as chaves 'result' ('true' ou 'false') e 'explain'."
+    )
+
+def request_evaluation(client, llm_model, llm_provider, prompt, max_tokens=200, structured=False, max_retries=1, usage=None, confidence=False):
+    """
+    Solicita a avaliação ao LLM e retorna o dicionário {result, explain} validado.
+
+    No modo estruturado, a resposta é forçada pelo schema do provedor e o limite de
+    tokens é dimensionado pelo schema. Respostas inválidas passam por um reparo local
+    e, se ainda assim falharem, por até `max_retries` novas chamadas de correção.
+
+    Args:
+        client: Cliente do provedor de LLM.
+        llm_model (str): Modelo a ser utilizado.
+        llm_provider (str): Provedor do LLM (OPENAI, GOOGLE, ANTHROPIC).
+        prompt (str): Prompt da avaliação.
+        max_tokens (int): Limite de tokens da resposta no modo livre.
+        structured (bool): Indica se deve usar o modo de saída estruturada.
+        max_retries (int): Número máximo de novas tentativas para respostas inválidas.
+        usage (dict, optional): Acumula os tokens consumidos em todas as tentativas.
+        confidence (bool): Solicita ao modelo a confiança do veredicto (cascata de modelos).
+
+    Returns:
+        dict: Avaliação com as chaves 'result' e 'explain' (e 'confidence', se solicitada).
+    """
+    kwargs = {}
+    if confidence:
+        prompt += CONFIDENCE_INSTRUCTION
+    if structured:
+        send = send_structured_prompt_to_llm
+        max_tokens = structured_max_tokens(confidence)
+        if confidence:
+            kwargs["schema"] = CONFIDENCE_EVALUATION_SCHEMA
+    else:
+        send = send_prompt_to_llm
+
+    current_prompt = prompt
+    last_error = None
+    for _ in range(max_retries + 1):
+        response = send(client, llm_model, llm_provider, current_prompt, max_tokens=max_tokens, usage=usage, **kwargs)
+        try:
+            return parse_evaluation(response, confidence)
+        except ValueError as e:
+            last_error = e
+            current_prompt = build_repair_prompt(prompt, response, e)
+
+    raise ValueError(f"A resposta do modelo é inválida após {max_retries + 1} tentativas: {last_error}")
@@ -1,27 +1,69 @@
 import os
-from fastapi import FastAPI, HTTPException, Request, Depends, APIRouter
+from fastapi import FastAPI, HTTPException, Request, Depends, APIRouter, Header, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from fastapi import Depends
-from database import SessionLocal, engine
+from database import SessionLocal, ReadSessionLocal, engine
 from models import Base, JobData, QueryLog, Job, Rule, RuleGroup
 from schemas import (
     JobDataCreate, JobDataResponse, JobCreate, JobUpdate, Job as JobSchema,
     RuleCreate, RuleUpdate, RuleWithGroups as RuleSchema,
-    RuleGroupCreate, RuleGroupUpdate, RuleGroup as RuleGroupSchema
+    RuleGroupCreate, RuleGroupUpdate, RuleGroup as RuleGroupSchema, ShadowReport
 )
 import uuid
 from uuid import UUID  # Adicionando a importação do tipo UUID
 from datetime import datetime, timedelta
 import holidays
-from typing import Union, List
+from typing import Callable, Union, List, Tuple, Optional
 import json
 import pytz  # Biblioteca para lidar com timezones
-from llm_client import initialize_llm_client, send_prompt_to_llm
+from llm_client import initialize_llm_client, request_evaluation, structured_max_tokens, StreamedEvaluation, finish_in_background
+from history import select_history, serialize_history, HISTORY_STRATEGY, HISTORY_STRATEGY_RECENT, HISTORY_STRATEGY_SUMMARY
+from history_summaries import update_history_summaries, summarize_history, SUMMARY_RAW_EXECUTIONS, HISTORY_SUMMARIES
+from vector_index import vector_indexes
+from rule_engine import evaluate_rules
+from job_rules import get_job_rules, get_job_expression_rules, get_job_rules_by_group
+from prompts import build_evaluation_prompt, STRATUM_NOTE
+from shadow import submit_shadow_evaluation, shadow_report
+from token_budget import fit_history_to_budget, estimate_tokens
+from fast_responses import fast_json_response, rules_payload, rule_groups_payload, jobs_payload
+from catalog_cache import not_modified_response
+from outbox import enqueue_anomaly_notifications, outbox_dispatcher
+from admission import admission, AdmissionRejected, ADMISSION_DEFER
+from scheduler import llm_scheduler
+from cascade import model_cascade, TIER_FAST, TIER_STRONG
+from rule_fanout import partition_rule_groups, evaluate_fanout, FanoutCancelled, RULE_FANOUT
+from profiling import (
+    check_admin_token, check_profile_mode, worker_profiler, profile_call, profile_path, folded,
+    ProfileHeaderMiddleware, PROFILE_WALL, PROFILE_MAX_SECONDS
+)
+from ingest import ingest_records, IngestError, IngestSummary, INGEST_CONCURRENCY, INGEST_QUEUE_SIZE
+from query_log_buffer import query_log_buffer, update_query_log, QUERY_LOG_WRITE_BEHIND
+from verdict_stream import publish_verdicts, verdict_events, verdict_hub, verdict_listener, VERDICT_STREAM
+from fastapi.concurrency import run_in_threadpool
+from idempotency import (
+    request_fingerprint, acquire_idempotency_key, complete_idempotency_key,
+    release_idempotency_key, replay_response, PROVISIONAL_STATUS_CODES
+)
+import time
+import threading
+import asyncio
+from contextlib import ExitStack
 import hashlib  # Import necessário para gerar o fingerprint
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse
+
+# O esquema é mantido pelas migrações do Alembic (python setup_database.py). A criação automática
+# das tabelas fica restrita ao SQLite embarcado, usado em desenvolvimento, benchmarks e testes.
+AUTO_CREATE_TABLES = os.getenv(
+    "MONAI_AUTO_CREATE_TABLES", "true" if engine.dialect.name == "sqlite" else "false"
+).lower() == "true"
+# O endpoint destrutivo de recriação das tabelas só é habilitado explicitamente
+ALLOW_RECREATE_TABLES = os.getenv("MONAI_ALLOW_RECREATE_TABLES", "false").lower() == "true"
 
 # Verificar e criar tabelas no banco de dados 
 def create_tables():
+    if not AUTO_CREATE_TABLES:
+        return
     print("Verificando e criando tabelas no banco de dados, se necessário")
     Base.metadata.create_all(bind=engine)
 
@@ -50,9 +92,24 @@ app = FastAPI(
     },
 )
 
+# Cabeçalho X-Monai-Profile-Id nas requisições com perfil (X-Monai-Profile)
+app.add_middleware(ProfileHeaderMiddleware)
+
 # Criar router para a versão 1 da API
 api_v1 = APIRouter(prefix="/api/v1")
 
+@app.on_event("startup")
+def start_background_workers():
+    outbox_dispatcher.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    # Grava os registros pendentes do query_log antes de encerrar o despacho das notificações
+    query_log_buffer.stop()
+    outbox_dispatcher.stop()
+    verdict_hub.close()
+    verdict_listener.stop()
+
 # Chamar a função para verificar e criar tabelas
 create_tables()
 
@@ -76,6 +133,11 @@ client, llm_model, llm_provider = initialize_llm_client()
 # Configuração de variáveis de ambiente
 HISTORY_EXECUTIONS = int(os.getenv("MONAI_HISTORY_EXECUTIONS", 30))  # Padrão: 30 execuções
 MAX_TOKENS = int(os.getenv("MONAI_MAX_TOKENS", 200))  # Padrão: 200 tokens
+STRUCTURED_OUTPUT = os.getenv("MONAI_STRUCTURED_OUTPUT", "false").lower() == "true"  # Padrão: desativado
+STRUCTURED_MAX_RETRIES = int(os.getenv("MONAI_STRUCTURED_MAX_RETRIES", 1))  # Padrão: 1 nova tentativa
+# Streaming: o veredicto é retornado assim que lido na resposta; a explicação é concluída em segundo plano
+LLM_STREAMING = os.getenv("MONAI_LLM_STREAMING", "false").lower() == "true"  # Padrão: desativado
+STREAMING_PENDING_EXPLANATION = "Explicação em processamento; será registrada no QueryLog ao fim da resposta do modelo."
 
 # Dependency para obter a sessão do banco de dados
 def get_db():
@@ -85,6 +147,14 @@ def get_db():
     finally:
         db.close()
 
+# Sessão para leituras, direcionada à réplica de leitura quando configurada
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def get_or_create_job(db: Session, job_name: str, job_filename: str, description: str = None) -> Job:
     """
     Verifica se um job existe e o retorna, ou cria um novo se não existir.
@@ -115,42 +185,16 @@ def get_or_create_job(db: Session, job_name: str, job_filename: str, description
             is_active=True
         )
         db.add(job)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Outra requisição (ex.: ingestão em lote) criou o mesmo job ao mesmo tempo
+            db.rollback()
+            return db.query(Job).filter(Job.id == job_id).one()
         db.refresh(job)
     
     return job
 
-def clean_response(response: str) -> str:
-    """
-    Remove caracteres desnecessários, como backticks e texto adicional,
-    para garantir que a resposta seja um JSON puro.
-    """
-    response = response.strip()  # Remove espaços em branco no início e no final
-    response = response.strip("```json").strip("```")
-    if response.startswith("```json"):
-        response = response[7:].strip()  # Remove os 3 backticks e json no início
-    if response.startswith("```"):
-        response = response[3:].strip()  # Remove os 3 backticks no início
-    if response.endswith("```"):
-        response = response[3:].strip()  # Remove os 3 backticks no no final
-    if response.startswith("json"):
-        response = response[4:].strip()  # Remove o prefixo "json" se existir
-
-    """
-    Remove tudo que estiver antes do primeiro '{' e depois do último '}'.
-    Garante que a resposta seja um JSON puro.
-    """
-    try:
-        # Localiza o índice do primeiro '{' e do último '}'
-        start_index = response.index('{')
-        end_index = response.rindex('}') + 1  # Inclui o último '}'
-
-        # Retorna apenas o conteúdo entre o primeiro '{' e o último '}'
-        return response[start_index:end_index].strip()
-    except ValueError:
-        # Caso não encontre '{' ou '}', retorna um erro
-        raise ValueError("A resposta não contém um JSON válido.")
-
 def log_query(
     db: Session,
     job_id: str,
@@ -164,7 +208,12 @@ def log_query(
     referer: str,
     received_at: datetime,
     monai_history_executions: int,
-    force_true: bool = False
+    force_true: bool = False,
+    prompt_tokens: int = None,
+    completion_tokens: int = None,
+    use_historical_outlier: bool = False,
+    history_strategy: str = None,
+    publish: bool = True
 ):
     """
     Função para registrar informações no QueryLog.
@@ -182,13 +231,23 @@ def log_query(
         referer (str): Referer do cliente.
         received_at (datetime): Data e hora do registro.
         monai_history_executions (int): Número de execuções históricas consideradas.
+        force_true (bool): Indica se o resultado foi forçado como true.
+        prompt_tokens (int, optional): Tokens de entrada consumidos na avaliação.
+        completion_tokens (int, optional): Tokens de saída consumidos na avaliação.
+        use_historical_outlier (bool): Indica se outliers foram considerados no histórico.
+        history_strategy (str, optional): Estratégia de seleção do histórico usada na avaliação.
+        publish (bool): Gera as notificações de anomalia e publica o veredicto no stream; False
+            quando a explicação ainda está em streaming (feito por update_query_log ao fim do stream).
+
+    Returns:
+        QueryLog: O registro criado.
     """
     # Criar fingerprint único
     raw_fingerprint = f"{ip_address}-{user_agent}-{referer}"
     fingerprint = hashlib.sha256(raw_fingerprint.encode()).hexdigest()
 
-    # Criar o registro no QueryLog
-    query_log = QueryLog(
+    values = dict(
+        id=uuid.uuid4(),
         job_id=job_id,
         job_name=job_name,
         job_filename=job_filename,
@@ -199,36 +258,75 @@ def log_query(
         fingerprint=fingerprint,
         received_at=received_at,
         ip_address=ip_address,
-        monai_history_executions=monai_history_executions
+        user_agent=user_agent,
+        monai_history_executions=monai_history_executions,
+        force_true=bool(force_true),
+        use_historical_outlier=bool(use_historical_outlier),
+        history_strategy=history_strategy,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens
     )
+
+    # Gravação adiada: o registro é gravado em lote fora do caminho da requisição
+    if QUERY_LOG_WRITE_BEHIND and query_log_buffer.submit(values, publish=publish):
+        return QueryLog(**values)
+
+    # Criar o registro no QueryLog
+    query_log = QueryLog(**values)
     db.add(query_log)
+
+    if publish:
+        # Anomalias são notificadas via outbox, gravado na mesma transação do QueryLog
+        if result == "false":
+            enqueue_anomaly_notifications(db, query_log)
+        # Veredicto transmitido aos clientes do stream após o commit
+        publish_verdicts(db, [values])
+
     db.commit()
+    return query_log
 
-def get_job_rules(db: Session, job_id: str) -> List[str]:
+def total_tokens(key: str, *usages: dict) -> Optional[int]:
     """
-    Obtém todas as regras ativas associadas a um job através de seus grupos de regras.
-    
-    Args:
-        db (Session): Sessão do banco de dados
-        job_id (str): ID do job
-        
-    Returns:
-        List[str]: Lista de regras ativas
+    Soma os tokens informados nos consumos (modelo principal e modelo rápido da cascata).
     """
-    # Buscar o job com seus grupos de regras
-    job = db.query(Job).filter(Job.id == job_id).first()
-    if not job:
-        return []
-    
-    # Coletar todas as regras ativas dos grupos ativos
-    rules = set()
-    for group in job.rule_groups:
-        if group.is_active:
-            for rule in group.rules:
-                if rule.is_active:
-                    rules.add(rule.rule_text)
-    
-    return list(rules)
+    values = [usage[key] for usage in usages if usage.get(key) is not None]
+    return sum(values) if values else None
+
+def complete_streamed_explanation(future, query_log_id, explanation_prefix: str, llm_usage: dict, prompt: str,
+                                  cascade_usage: dict = None, on_complete: Callable[[], None] = None):
+    """
+    Grava no QueryLog a explicação e o consumo de tokens de uma avaliação respondida em
+    streaming, após o fim do stream (executada pela thread que concluiu o stream), e só
+    então gera as notificações de anomalia e o evento do stream de veredictos.
+
+    on_complete é chamada em seguida (ex.: amostra do modo sombra, com o consumo final).
+    """
+    cascade_usage = cascade_usage or {}
+    try:
+        explanation = future.result()["explain"]
+    except Exception as e:
+        explanation = f"Não foi possível concluir a explicação do modelo: {getattr(e, 'detail', None) or str(e)}"
+    try:
+        if not llm_usage:
+            # Provedor não informou o consumo: registrar a estimativa do prompt
+            llm_usage["prompt_tokens"] = estimate_tokens(prompt, llm_provider, llm_model)
+        if model_cascade.enabled:
+            model_cascade.record(TIER_STRONG, usage=llm_usage)
+        # Notificações e stream de veredictos apenas agora, já com a explicação completa
+        update_query_log(
+            query_log_id,
+            publish=True,
+            explanation=explanation_prefix + explanation,
+            prompt_tokens=total_tokens("prompt_tokens", llm_usage, cascade_usage),
+            completion_tokens=total_tokens("completion_tokens", llm_usage, cascade_usage)
+        )
+    except Exception as e:
+        print(f"Erro ao gravar a explicação do QueryLog {query_log_id}: {str(e)}")
+    if on_complete is not None:
+        try:
+            on_complete()
+        except Exception as e:
+            print(f"Erro ao concluir a avaliação do QueryLog {query_log_id}: {str(e)}")
 
 # Endpoints para gerenciamento de regras
 @api_v1.post("/rules/", response_model=RuleSchema, tags=["Regras"])
@@ -243,21 +341,30 @@ async def create_rule(rule: RuleCreate, db: Session = Depends(get_db)):
     return db_rule
 
 @api_v1.get("/rules/", response_model=List[RuleSchema], tags=["Regras"])
-async def list_rules(db: Session = Depends(get_db)):
+async def list_rules(request: Request, db: Session = Depends(get_read_db)):
     """
     Lista todas as regras cadastradas.
     """
-    return db.query(Rule).all()
+    not_modified, headers = not_modified_response(request, db)
+    if not_modified:
+        return not_modified
+    return fast_json_response(request, rules_payload(db), headers=headers)
 
 @api_v1.get("/rules/{rule_id}", response_model=RuleSchema, tags=["Regras"])
-async def get_rule(rule_id: UUID, db: Session = Depends(get_db)):
+async def get_rule(rule_id: UUID, request: Request, db: Session = Depends(get_read_db)):
     """
     Obtém informações de uma regra específica.
     """
-    rule = db.query(Rule).filter(Rule.id == rule_id).first()
-    if not rule:
+    # A existência é verificada antes do ETag (que é o do catálogo) para não responder 304 a IDs inexistentes
+    if db.query(Rule.id).filter(Rule.id == rule_id).first() is None:
         raise HTTPException(status_code=404, detail="Regra não encontrada.")
-    return rule
+    not_modified, headers = not_modified_response(request, db)
+    if not_modified:
+        return not_modified
+    rules = rules_payload(db, rule_id)
+    if not rules:
+        raise HTTPException(status_code=404, detail="Regra não encontrada.")
+    return fast_json_response(request, rules[0], headers=headers)
 
 @api_v1.put("/rules/{rule_id}", response_model=RuleSchema, tags=["Regras"])
 async def update_rule(rule_id: UUID, rule_update: RuleUpdate, db: Session = Depends(get_db)):
@@ -316,21 +423,30 @@ async def create_rule_group(group: RuleGroupCreate, db: Session = Depends(get_db
     return db_group
 
 @api_v1.get("/rule-groups/", response_model=List[RuleGroupSchema], tags=["Grupos de Regras"])
-async def list_rule_groups(db: Session = Depends(get_db)):
+async def list_rule_groups(request: Request, db: Session = Depends(get_read_db)):
     """
     Lista todos os grupos de regras cadastrados.
     """
-    return db.query(RuleGroup).all()
+    not_modified, headers = not_modified_response(request, db)
+    if not_modified:
+        return not_modified
+    return fast_json_response(request, rule_groups_payload(db), headers=headers)
 
 @api_v1.get("/rule-groups/{group_id}", response_model=RuleGroupSchema, tags=["Grupos de Regras"])
-async def get_rule_group(group_id: UUID, db: Session = Depends(get_db)):
+async def get_rule_group(group_id: UUID, request: Request, db: Session = Depends(get_read_db)):
     """
     Obtém informações de um grupo de regras específico.
     """
-    group = db.query(RuleGroup).filter(RuleGroup.id == group_id).first()
-    if not group:
+    # A existência é verificada antes do ETag (que é o do catálogo) para não responder 304 a IDs inexistentes
+    if db.query(RuleGroup.id).filter(RuleGroup.id == group_id).first() is None:
         raise HTTPException(status_code=404, detail="Grupo de regras não encontrado.")
-    return group
+    not_modified, headers = not_modified_response(request, db)
+    if not_modified:
+        return not_modified
+    groups = rule_groups_payload(db, group_id)
+    if not groups:
+        raise HTTPException(status_code=404, detail="Grupo de regras não encontrado.")
+    return fast_json_response(request, groups[0], headers=headers)
 
 @api_v1.put("/rule-groups/{group_id}", response_model=RuleGroupSchema, tags=["Grupos de Regras"])
 async def update_rule_group(group_id: UUID, group_update: RuleGroupUpdate, db: Session = Depends(get_db)):
@@ -395,7 +511,9 @@ async def create_job(job: JobCreate, db: Session = Depends(get_db)):
         job_name=job.job_name,
         job_filename=job.job_filename,
         description=job.description,
-        is_active=job.is_active
+        is_active=job.is_active,
+        priority_weight=job.priority_weight,
+        max_concurrency=job.max_concurrency
     )
     
     # Adicionar grupos de regras se fornecidos
@@ -415,7 +533,229 @@ async def create_job(job: JobCreate, db: Session = Depends(get_db)):
 
 # Endpoint para registrar dados de um job
 @api_v1.post("/jobs/data/", response_model=Union[JobDataResponse, dict], tags=["Jobs"])
-async def create_job_data(job_data: JobDataCreate, request: Request, db: Session = Depends(get_db)):
+async def create_job_data(
+    job_data: JobDataCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    profile_mode: Optional[str] = Header(None, alias="X-Monai-Profile"),
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Token")
+):
+    """
+    Registra uma entrega e a avalia, sob o controle de admissão.
+
+    Com o cabeçalho Idempotency-Key, uma requisição repetida retorna a resposta armazenada
+    sem reavaliar a entrega, e uma duplicata simultânea aguarda o término da primeira.
+
+    Com o cabeçalho X-Monai-Profile (wall, cpu ou alloc) e o token administrativo, a
+    avaliação é executada sob o perfil e o cabeçalho X-Monai-Profile-Id da resposta
+    identifica o perfil salvo (GET /api/v1/admin/profile/{profile_id}/).
+    """
+    if profile_mode:
+        check_admin_token(admin_token)
+        request.state.profile_mode = check_profile_mode(profile_mode)
+
+    if not idempotency_key:
+        return await admit_job_data(job_data, request, db, read_db)
+
+    fingerprint = request_fingerprint(job_data.model_dump(mode="json"))
+    stored = await acquire_idempotency_key(db, idempotency_key, fingerprint)
+    if stored is not None:
+        return replay_response(stored)
+
+    try:
+        response = await admit_job_data(job_data, request, db, read_db)
+    except HTTPException as e:
+        status_code, content = e.status_code, {"detail": e.detail}
+        response = None
+    except Exception:
+        await run_in_threadpool(release_idempotency_key, db, idempotency_key)
+        raise
+    else:
+        if isinstance(response, JSONResponse):
+            status_code, content = response.status_code, json.loads(response.body)
+        else:
+            status_code, content = 200, response
+
+    # Só há resposta a reproduzir se a entrega foi registrada e avaliada; respostas provisórias
+    # (entrega adiada, fila cheia ou timeout) liberam a chave para uma nova tentativa
+    if getattr(request.state, "delivery_recorded", False) and status_code not in PROVISIONAL_STATUS_CODES:
+        await run_in_threadpool(complete_idempotency_key, db, idempotency_key, status_code, content)
+    else:
+        await run_in_threadpool(release_idempotency_key, db, idempotency_key)
+
+    if response is None:
+        raise HTTPException(status_code=status_code, detail=content["detail"])
+    return response
+
+async def admit_job_data(job_data: JobDataCreate, request: Request, db: Session, read_db: Session, raise_on_anomaly: bool = True):
+    """
+    Avalia a entrega sob o controle de admissão. A avaliação (banco de dados e LLM) é
+    executada no pool de threads, para não bloquear o event loop enquanto outras
+    requisições aguardam na fila de admissão.
+    """
+    profile_mode = getattr(request.state, "profile_mode", None)
+    try:
+        # As vagas são limitadas também por job, para que um job ruidoso não ocupe todas elas
+        # enquanto as suas avaliações aguardam o escalonamento das chamadas ao LLM
+        async with admission.slot(f"{job_data.job_name}-{job_data.job_filename}"):
+            if profile_mode:
+                return await run_in_threadpool(
+                    profile_call, request.state, profile_mode, evaluate_job_data, job_data, request, db, read_db, raise_on_anomaly
+                )
+            return await run_in_threadpool(evaluate_job_data, job_data, request, db, read_db, raise_on_anomaly)
+    except AdmissionRejected as e:
+        if ADMISSION_DEFER:
+            return await run_in_threadpool(defer_job_data, job_data, request, db, e.detail)
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+@api_v1.post("/jobs/data/ingest/", tags=["Jobs"])
+async def ingest_job_data(request: Request):
+    """
+    Ingestão em lote para coletores de alto volume: recebe um fluxo de entregas em NDJSON
+    (opcionalmente gzip) ou MessagePack, lido e validado de forma incremental, e avalia cada
+    entrega pelo mesmo fluxo de /jobs/data/ (controle de admissão, histórico e LLM), com até
+    MONAI_INGEST_CONCURRENCY avaliações simultâneas. As entregas de um mesmo job são avaliadas
+    em ordem, uma por vez. A leitura do corpo acompanha o ritmo
+    das avaliações, mantendo a memória limitada.
+
+    Retorna a contagem por resultado e o detalhe das anomalias e dos erros por registro.
+    """
+    try:
+        records = ingest_records(
+            request.stream(),
+            request.headers.get("content-type"),
+            request.headers.get("content-encoding")
+        )
+    except IngestError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    summary = IngestSummary()
+    # Uma fila por worker; as entregas de um mesmo job vão sempre para a mesma fila, de modo
+    # que são avaliadas em ordem, uma por vez (o histórico de cada uma inclui as anteriores),
+    # enquanto jobs diferentes são avaliados em paralelo
+    workers_count = max(INGEST_CONCURRENCY, 1)
+    queues = [asyncio.Queue(maxsize=max(INGEST_QUEUE_SIZE // workers_count, 1)) for _ in range(workers_count)]
+
+    async def evaluate_record(index: int, job_data: JobDataCreate):
+        db = SessionLocal()
+        read_db = ReadSessionLocal()
+        try:
+            response = await admit_job_data(job_data, request, db, read_db, raise_on_anomaly=False)
+        except HTTPException as e:
+            summary.record(index, "error", e.detail)
+            return
+        except Exception as e:
+            summary.record(index, "error", str(e))
+            return
+        finally:
+            db.close()
+            read_db.close()
+
+        if isinstance(response, JSONResponse):
+            content = json.loads(response.body)
+            if response.status_code == 202:
+                summary.record(index, "deferred")
+            else:
+                summary.record(index, "error", content.get("detail"))
+        elif "result" in response:
+            summary.record(index, response["result"], response.get("explanation"), job_data)
+        else:
+            summary.record(index, "insufficient_history")
+
+    async def worker(queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            await evaluate_record(*item)
+
+    workers = [asyncio.create_task(worker(queue)) for queue in queues]
+    try:
+        async for index, record in records:
+            summary.received += 1
+            if isinstance(record, str):
+                summary.record(index, "error", record)
+            else:
+                queue = queues[hash((record.job_name, record.job_filename)) % workers_count]
+                await queue.put((index, record))
+    except IngestError as e:
+        # Registros já lidos são avaliados; o restante do corpo é descartado
+        summary.aborted = e.detail
+    finally:
+        for queue in queues:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    return summary.to_dict()
+
+def defer_job_data(job_data: JobDataCreate, request: Request, db: Session, reason: str):
+    """
+    Grava a entrega sem avaliá-la (result="deferred") quando a capacidade de avaliação está esgotada.
+    """
+    try:
+        job = get_or_create_job(db, job_data.job_name, job_data.job_filename)
+        if not job.is_active:
+            raise HTTPException(status_code=400, detail="O job está inativo.")
+
+        now = get_current_time()
+        new_job_data = JobData(
+            id=uuid.uuid4(),
+            job_id=job.id,
+            job_name=job.job_name,
+            job_filename=job.job_filename,
+            attributes=job_data.attributes,
+            received_at=now,
+            weekday=now.strftime("%A"),
+            month=now.strftime("%B"),
+            is_holiday=now.date() in holidays.Brazil(),
+            outlier_data=False,
+            force_true=job_data.force_true
+        )
+        db.add(new_job_data)
+        update_history_summaries(db, job.id, now, job_data.attributes)
+        db.commit()
+        db.refresh(new_job_data)
+        request.state.delivery_recorded = True
+        vector_indexes.add(job.id, new_job_data.id, new_job_data.attributes, new_job_data.outlier_data)
+
+        explanation = f"Entrega registrada sem avaliação: {reason}"
+        log_query(
+            db=db,
+            job_id=job.id,
+            job_name=job.job_name,
+            job_filename=job.job_filename,
+            attributes=job_data.attributes,
+            result="deferred",
+            explanation=explanation,
+            ip_address=request.client.host,
+            user_agent=request.headers.get("user-agent", "unknown"),
+            referer=request.headers.get("referer", "unknown"),
+            received_at=now,
+            monai_history_executions=job_data.monai_history_executions or int(os.getenv("MONAI_HISTORY_EXECUTIONS", 30)),
+            force_true=job_data.force_true,
+            use_historical_outlier=job_data.use_historical_outlier
+        )
+        admission.deferred += 1
+        return JSONResponse(status_code=202, content={"result": "deferred", "explanation": explanation})
+
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def evaluate_job_data(job_data: JobDataCreate, request: Request, db: Session, read_db: Session, raise_on_anomaly: bool = True):
+    """
+    Avalia a entrega. As regras são lidas por read_db (réplica de leitura, quando
+    configurada); o histórico e as gravações (job, QueryLog e JobData) usam o banco
+    principal, para que a entrega confirmada logo antes já faça parte do histórico.
+
+    Com raise_on_anomaly=False (ingestão em lote), o veredicto "false" é retornado em vez
+    de gerar o erro 400.
+    """
     try:
         # Verificar ou criar o job automaticamente
         job = get_or_create_job(db, job_data.job_name, job_data.job_filename)
@@ -444,95 +784,187 @@ async def create_job_data(job_data: JobDataCreate, request: Request, db: Session
         if history_executions <= 0:
             raise ValueError("O número de histórico de execuções deve ser maior que zero.")
 
-        # Consultar os registros mais recentes com base no número de execuções
-        if job_data.use_historical_outlier:
-            historical_data = db.query(JobData).filter(
-                JobData.job_id == job.id
-            ).order_by(JobData.received_at.desc()).limit(history_executions).all()
-        else:
-            historical_data = db.query(JobData).filter(
-                JobData.job_id == job.id,
-                JobData.outlier_data == False
-            ).order_by(JobData.received_at.desc()).limit(history_executions).all()
+        # Determinar a estratégia de seleção do histórico
+        history_strategy = (job_data.monai_history_strategy or HISTORY_STRATEGY).lower()
+        if history_strategy == HISTORY_STRATEGY_SUMMARY and not HISTORY_SUMMARIES:
+            # Sem a manutenção dos resumos, eles estariam desatualizados: usa as entregas recentes
+            history_strategy = HISTORY_STRATEGY_RECENT
+
+        # Consultar o histórico com base no número de execuções e na estratégia. O histórico
+        # vem do banco principal: na réplica, a entrega anterior ainda poderia estar ausente
+        historical_selection = select_history(
+            db,
+            job.id,
+            size=history_executions,
+            include_outliers=job_data.use_historical_outlier,
+            strategy=history_strategy,
+            now=now,
+            attributes=job_data.attributes
+        )
+        historical_data = [data for data, _ in historical_selection]
 
         if len(historical_data) >= history_executions:
             # Preparar os dados para enviar ao LLM
-            historical_attributes = [
-                {
-                    "attributes": data.attributes,
-                    "received_at": data.received_at,
-                    "weekday": data.weekday,
-                    "month": data.month,
-                    "is_holiday": data.is_holiday
+            summaries = None
+            if history_strategy == HISTORY_STRATEGY_SUMMARY:
+                # Resumos diários, semanais e mensais mais as últimas entregas completas
+                summaries = summarize_history(db, job.id, now)
+                historical_attributes = serialize_history(historical_selection[:SUMMARY_RAW_EXECUTIONS])
+                history_note = ""
+            else:
+                historical_attributes = serialize_history(
+                    historical_selection,
+                    include_stratum=(history_strategy != HISTORY_STRATEGY_RECENT)
+                )
+                history_note = STRATUM_NOTE if history_strategy != HISTORY_STRATEGY_RECENT else ""
+
+            # Avaliar localmente as regras estruturadas antes de consultar o LLM
+            prompt = None
+            llm_usage = {}
+            cascade_usage = {}  # Tokens do modelo rápido da cascata
+            explanation_future = None
+            verdict_tier = TIER_STRONG
+            violations, unevaluated_rules = evaluate_rules(get_job_expression_rules(read_db, job.id), job_data.attributes)
+
+            if violations:
+                evaluation = {
+                    "result": "false",
+                    "explain": "Regras obrigatórias violadas: " + "; ".join(
+                        f"{name} ({expression})" for name, expression in violations
+                    ) + "."
                 }
-                for data in historical_data
-            ]
+            else:
+                # Regras em texto livre do job, divididas por grupo no modo fan-out
+                # (regras estruturadas não avaliadas localmente seguem para o LLM)
+                rule_groups = None
+                rule_buckets = []
+                if RULE_FANOUT:
+                    rule_groups = get_job_rules_by_group(read_db, job.id)
+                    rule_buckets = partition_rule_groups(
+                        rule_groups + ([("Regras não avaliadas localmente", unevaluated_rules)] if unevaluated_rules else [])
+                    )
 
-            # Regra padrão que sempre deve ser aplicada
-            DEFAULT_RULE = "Considere as variações contextuais e os padrões esperados, dando maior relevância aos dados históricos mais recentes."
-            
-            # Buscar as regras associadas ao job
-            rules_from_job = get_job_rules(db, job.id)
-            
-            # Combinar a regra padrão com as regras do job
-            rules = [DEFAULT_RULE] + (rules_from_job if rules_from_job else [])
-
-            # Formatar as regras para o prompt
-            mandatory_rules = "".join(f"{i + 1}. {rule}\n" for i, rule in enumerate(rules))
-
-            prompt = (
-                "Contexto: Você é a maior autoridade em qualidade de dados, reconhecida por sua expertise em identificar padrões e inconsistências com precisão. "
-                "Com anos de experiência aprofundada, você domina técnicas avançadas de análise e possui um olhar crítico para avaliar a confiabilidade e a coerência dos dados em qualquer cenário.\n"
-                "Papel: Analista de qualidade de dados altamente especializada, referência na área.\n"
-                "Objetivo: Sua missão é garantir a integridade e a consistência dos metadados de arquivos enviados periodicamente. Além de validar a lógica entre os dados recedidos no último conjunto de metadados, "
-                "você analisará o histórico de metadados de remessas anteriores, aplicando, dentre outras técnicas, técnicas avançadas como: \n"
-                "- Análise Exploratória de Dados (EDA) para identificar propriedades estatísticas e padrões históricos.\n"
-                "- Detecção de Anomalias utilizando métodos estatísticos, modelagem probabilística e algoritmos de machine learning.\n"
-                "- Análise de Séries Temporais para compreender tendências, sazonalidades e variações estruturais nos metadados.\n"
-                "- Regras de Negócio e Modelos Heurísticos para identificar desvios esperados e não esperados nos dados.\n"
-                "Além disso, você deve garantir que nenhuma regra obrigatória seja violada, assegurando que os dados estejam em conformidade com os requisitos estabelecidos.\n"
-                "Entre as informações disponíveis, constam o dia da semana e o mês e de geração das remessas, também indicando se no dia da geração é um feriado. Essas variáveis são fundamentais para a análise, "
-                "pois os metadados podem variar conforme o contexto temporal. Sua avaliação deve considerar a periodicidade e essas particularidades para distinguir padrões legítimos de possíveis anomalias, "
-                "garantindo um alto padrão de qualidade e confiabilidade nos dados.\n\n"
-                "As regras abaixo são obrigatórias para a análise e resultado:\n"
-                f"{mandatory_rules}\n"
-                "\n"
-                f"Histórico de dados das últimas {history_executions} execuções:\n{historical_attributes}\n\n"
-                f"Último conjunto de metadados recebido: \n{job_data.attributes}\nRecebido em: {now}\nDia da semana: {weekday}\nMês: {month}\nFeriado: {is_holiday}\n\n"
-                "Saída esperada: Com base na análise, responda de forma objetiva, resumida e direta com uma das seguintes opções:\n"
-                "'true': Se o novo dado segue o mesmo padrão do histórico fornecido.\n"
-                "'false': Se o novo dado apresenta um padrão incomum dentro do histórico.\n"
-                "A resposta deve obrigatoriamente ser formatada em tipo de conterúdo JSON (Content-Type: application/json), contendo uma chave com o resultado da análise (true/false) e uma chave com a explicação resumida. Exemplo:\n"
-                "{\n"
-                "  \"result\": \"false\",\n"
-                "  \"explain\": \"O novo dado apresenta uma anomalia significativa em seu valor de 'max', que é consideravelmente mais alto que os valores históricos...\"\n"
-                "}\n"
-                "Retorne exclusivamente o conteúdo JSON solicitado, sem adicionar qualquer informação extra ou caracteres adicionais, pois a resposta será importada diretamente como JSON puro em outro sistema."
-            )
+                # Montar o prompt respeitando o orçamento de tokens do modelo
+                def fit_prompt(rules: List[str]) -> str:
+                    fitted, _ = fit_history_to_budget(
+                        lambda history, count: build_evaluation_prompt(
+                            rules=rules,
+                            history_executions=count,
+                            history_note=history_note,
+                            historical_attributes=history,
+                            attributes=job_data.attributes,
+                            now=now,
+                            weekday=weekday,
+                            month=month,
+                            is_holiday=is_holiday,
+                            summaries=summaries
+                        ),
+                        historical_attributes,
+                        llm_provider,
+                        llm_model,
+                        completion_tokens=structured_max_tokens() if STRUCTURED_OUTPUT else MAX_TOKENS
+                    )
+                    return fitted
+
+                if len(rule_buckets) > 1:
+                    # Fan-out: um sub-prompt por grupo de regras, com o mesmo histórico, avaliados em
+                    # paralelo pelo modelo principal (sem cascata, streaming nem amostra sombra)
+                    sub_prompts = [(label, fit_prompt(rules)) for label, rules in rule_buckets]
 
-            print(prompt)
+                    def evaluate_sub_prompt(sub_prompt: str, usage: dict, cancelled: threading.Event) -> dict:
+                        # Outro sub-prompt falhou: não ocupa uma vaga nem chama o LLM
+                        if cancelled.is_set():
+                            raise FanoutCancelled()
+                        with llm_scheduler.slot(job.id, job.priority_weight, job.max_concurrency):
+                            if cancelled.is_set():
+                                raise FanoutCancelled()
+                            sub_evaluation = request_evaluation(
+                                client, llm_model, llm_provider, sub_prompt,
+                                max_tokens=MAX_TOKENS,
+                                structured=STRUCTURED_OUTPUT,
+                                max_retries=STRUCTURED_MAX_RETRIES,
+                                usage=usage
+                            )
+                        if not usage:
+                            usage["prompt_tokens"] = estimate_tokens(sub_prompt, llm_provider, llm_model)
+                        return sub_evaluation
 
-            # Enviar o prompt ao LLM
-            evaluation = send_prompt_to_llm(client, llm_model, llm_provider, prompt, max_tokens=MAX_TOKENS)
+                    llm_started = time.perf_counter()
+                    evaluation = evaluate_fanout(sub_prompts, evaluate_sub_prompt, llm_usage)
+                    llm_latency_ms = (time.perf_counter() - llm_started) * 1000
+                else:
+                    # Buscar as regras em texto livre associadas ao job (no modo fan-out com um único
+                    # grupo, reaproveita as regras já lidas por grupo)
+                    if rule_groups is not None:
+                        rules_from_job = sorted({rule for _, rules in rule_groups for rule in rules})
+                    else:
+                        rules_from_job = get_job_rules(read_db, job.id)
+                    rules_from_job += unevaluated_rules
+                    prompt = fit_prompt(rules_from_job)
 
-            # Limpar e processar a resposta
-            evaluation = clean_response(evaluation)
-            evaluation = json.loads(evaluation)
+                    print(prompt)
 
-            # Verificar se as chaves esperadas estão presentes
-            if "result" not in evaluation or "explain" not in evaluation:
-                raise ValueError("A resposta do modelo não contém as chaves esperadas: 'result' e 'explain'.")
+                    # Enviar o prompt ao LLM e validar a resposta (com reparo e novas tentativas),
+                    # aguardando a vaga concedida pelo escalonamento justo entre os jobs
+                    with ExitStack() as llm_slot:
+                        llm_slot.enter_context(llm_scheduler.slot(job.id, job.priority_weight, job.max_concurrency))
+                        llm_started = time.perf_counter()
+                        evaluation = None
+                        if model_cascade.enabled:
+                            # Cascata: o modelo rápido avalia primeiro; o principal só é consultado em caso de dúvida
+                            evaluation = model_cascade.evaluate(
+                                prompt, MAX_TOKENS, STRUCTURED_OUTPUT, STRUCTURED_MAX_RETRIES, usage=cascade_usage
+                            )
+                        strong_started = time.perf_counter()
+                        if evaluation is not None:
+                            verdict_tier = TIER_FAST
+                        elif LLM_STREAMING:
+                            # Veredicto lido no início do stream; a vaga no LLM é liberada ao fim do stream
+                            streamed = StreamedEvaluation(
+                                client, llm_model, llm_provider, prompt,
+                                max_tokens=MAX_TOKENS,
+                                structured=STRUCTURED_OUTPUT,
+                                max_retries=STRUCTURED_MAX_RETRIES,
+                                usage=llm_usage
+                            )
+                            evaluation = {"result": streamed.wait_for_result(), "explain": STREAMING_PENDING_EXPLANATION}
+                            explanation_future = finish_in_background(streamed, llm_slot.pop_all().close)
+                        else:
+                            evaluation = request_evaluation(
+                                client, llm_model, llm_provider, prompt,
+                                max_tokens=MAX_TOKENS,
+                                structured=STRUCTURED_OUTPUT,
+                                max_retries=STRUCTURED_MAX_RETRIES,
+                                usage=llm_usage
+                            )
+                    llm_latency_ms = (time.perf_counter() - llm_started) * 1000
+                    # Latência do modelo que deu o veredicto: sem o tempo do modelo rápido, quando escalonado
+                    verdict_latency_ms = (
+                        (strong_started - llm_started) * 1000 if verdict_tier == TIER_FAST
+                        else (time.perf_counter() - strong_started) * 1000
+                    )
+                    if verdict_tier == TIER_STRONG and explanation_future is None:
+                        if not llm_usage:
+                            # Provedor não informou o consumo: registrar a estimativa do prompt
+                            llm_usage["prompt_tokens"] = estimate_tokens(prompt, llm_provider, llm_model)
+                        if model_cascade.enabled:
+                            model_cascade.record(TIER_STRONG, verdict_latency_ms, llm_usage)
+                    elif verdict_tier == TIER_STRONG and model_cascade.enabled:
+                        # Streaming: os tokens do modelo principal são registrados ao fim do stream
+                        model_cascade.record(TIER_STRONG, verdict_latency_ms)
 
             # Processar o resultado com base no valor de 'result'
-            result = evaluation["result"].lower()
+            result = evaluation["result"]
             explanation = evaluation["explain"]
 
+            explanation_prefix = ""
             if job_data.force_true:
                 result = "true"
-                explanation = "Resultado forçado como 'true' devido à configuração do job: " + explanation
+                explanation_prefix = "Resultado forçado como 'true' devido à configuração do job: "
+                explanation = explanation_prefix + explanation
             
             # Registrar a consulta no QueryLog
-            log_query(
+            query_log = log_query(
                 db=db,
                 job_id=job.id,
                 job_name=job.job_name,
@@ -545,9 +977,42 @@ async def create_job_data(job_data: JobDataCreate, request: Request, db: Session
                 referer=referer,
                 received_at=now,
                 monai_history_executions=history_executions,
-                force_true=job_data.force_true                
+                force_true=job_data.force_true,
+                prompt_tokens=total_tokens("prompt_tokens", llm_usage, cascade_usage),
+                completion_tokens=total_tokens("completion_tokens", llm_usage, cascade_usage),
+                use_historical_outlier=job_data.use_historical_outlier,
+                history_strategy=history_strategy,
+                publish=explanation_future is None
             )
 
+            # Enviar uma amostra da avaliação ao modelo secundário (modo sombra), sem afetar a resposta
+            def submit_shadow(primary_latency_ms: float):
+                submit_shadow_evaluation(
+                    prompt=prompt,
+                    job_id=job.id,
+                    query_log_id=query_log.id,
+                    received_at=now,
+                    primary_provider=model_cascade.provider if verdict_tier == TIER_FAST else llm_provider,
+                    primary_model=model_cascade.model if verdict_tier == TIER_FAST else llm_model,
+                    primary_result=evaluation["result"],
+                    primary_latency_ms=primary_latency_ms,
+                    primary_usage=cascade_usage if verdict_tier == TIER_FAST else llm_usage,
+                    max_tokens=MAX_TOKENS,
+                    structured=STRUCTURED_OUTPUT
+                )
+
+            if explanation_future is not None:
+                # Resposta em streaming: a explicação completa e o consumo de tokens são gravados ao
+                # fim do stream, e a amostra sombra é enviada com a latência e o consumo da chamada inteira
+                explanation_future.add_done_callback(
+                    lambda future: complete_streamed_explanation(
+                        future, query_log.id, explanation_prefix, llm_usage, prompt, cascade_usage,
+                        on_complete=lambda: submit_shadow((time.perf_counter() - strong_started) * 1000)
+                    )
+                )
+            elif prompt is not None:
+                submit_shadow(verdict_latency_ms)
+
             # Criar novo registro no banco de dados
             new_job_data = JobData(
                 id=uuid.uuid4(),
@@ -563,13 +1028,22 @@ async def create_job_data(job_data: JobDataCreate, request: Request, db: Session
                 force_true=job_data.force_true
             )
             db.add(new_job_data)
+            if not new_job_data.outlier_data:
+                update_history_summaries(db, job.id, now, job_data.attributes)
             db.commit()
             db.refresh(new_job_data)
+            request.state.delivery_recorded = True
+            vector_indexes.add(job.id, new_job_data.id, new_job_data.attributes, new_job_data.outlier_data)
             
-            if result == "true":
-                return {"result": result, "explanation": explanation}
+            if explanation_future is not None:
+                # A explicação ainda está em streaming: é registrada no QueryLog indicado
+                response = {"result": result, "explanation": None, "explanation_pending": True, "query_log_id": str(query_log.id)}
+            else:
+                response = {"result": result, "explanation": explanation}
+            if result == "true" or (result == "false" and not raise_on_anomaly):
+                return response
             elif result == "false":
-                raise HTTPException(status_code=400, detail={"result": result, "explanation": explanation})
+                raise HTTPException(status_code=400, detail=response)
             else:
                 raise ValueError("O valor de 'result' na resposta do modelo é inválido.")
         else:
@@ -588,8 +1062,11 @@ async def create_job_data(job_data: JobDataCreate, request: Request, db: Session
                 force_true=job_data.force_true
             )
             db.add(new_job_data)
+            update_history_summaries(db, job.id, now, job_data.attributes)
             db.commit()
             db.refresh(new_job_data)
+            request.state.delivery_recorded = True
+            vector_indexes.add(job.id, new_job_data.id, new_job_data.attributes, new_job_data.outlier_data)
 
             # Registrar a consulta no QueryLog
             log_query(
@@ -605,28 +1082,75 @@ async def create_job_data(job_data: JobDataCreate, request: Request, db: Session
                 referer=referer,
                 received_at=now,
                 monai_history_executions=history_executions,
-                force_true=job_data.force_true
+                force_true=job_data.force_true,
+                use_historical_outlier=job_data.use_historical_outlier,
+                history_strategy=history_strategy
             )
             return {"message": f"É necessário pelo menos {history_executions} execuções de dados históricos para avaliação, mas apenas {len(historical_data)} estão disponíveis."}
 
+    except AdmissionRejected:
+        # Sem vaga no LLM: tratado pelo controle de admissão (429/503 ou gravação sem avaliação)
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_v1.get("/jobs/", response_model=List[JobSchema], tags=["Jobs"])
-async def list_jobs(db: Session = Depends(get_db)):
+async def list_jobs(request: Request, db: Session = Depends(get_read_db)):
     """
     Lista todos os jobs cadastrados.
     """
-    return db.query(Job).all()
+    not_modified, headers = not_modified_response(request, db)
+    if not_modified:
+        return not_modified
+    return fast_json_response(request, jobs_payload(db), headers=headers)
 
 @api_v1.get("/jobs/{job_id}", response_model=JobSchema, tags=["Jobs"])
-async def get_job(job_id: str, db: Session = Depends(get_db)):
+async def get_job(job_id: str, request: Request, db: Session = Depends(get_read_db)):
     """
     Obtém informações de um job específico.
     """
+    # A existência é verificada antes do ETag (que é o do catálogo) para não responder 304 a IDs inexistentes
+    if db.query(Job.id).filter(Job.id == job_id).first() is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    not_modified, headers = not_modified_response(request, db)
+    if not_modified:
+        return not_modified
+    jobs = jobs_payload(db, job_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return fast_json_response(request, jobs[0], headers=headers)
+
+@api_v1.put("/jobs/{job_id}", response_model=JobSchema, tags=["Jobs"])
+async def update_job(job_id: str, job_update: JobUpdate, db: Session = Depends(get_db)):
+    """
+    Atualiza informações de um job existente, como o peso e o limite de concorrência no LLM.
+    """
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=404, detail="Job não encontrado.")
+
+    update_data = job_update.dict(exclude_unset=True)
+
+    # O identificador do job é derivado do nome e do arquivo, que por isso não podem ser alterados
+    for field in ("job_name", "job_filename"):
+        if field in update_data and update_data[field] != getattr(job, field):
+            raise HTTPException(status_code=400, detail="O nome e o arquivo do job não podem ser alterados.")
+
+    if "rule_group_ids" in update_data:
+        rule_groups = db.query(RuleGroup).filter(
+            RuleGroup.id.in_(update_data["rule_group_ids"]),
+            RuleGroup.is_active == True
+        ).all()
+        if len(rule_groups) != len(update_data["rule_group_ids"]):
+            raise HTTPException(status_code=400, detail="Um ou mais grupos de regras não foram encontrados ou estão inativos.")
+        job.rule_groups = rule_groups
+        del update_data["rule_group_ids"]
+
+    for field, value in update_data.items():
+        setattr(job, field, value)
+
+    db.commit()
+    db.refresh(job)
     return job
 
 @api_v1.delete("/jobs/{job_id}", tags=["Jobs"])
@@ -642,12 +1166,101 @@ async def delete_job(job_id: str, db: Session = Depends(get_db)):
     db.commit()
     return {"message": "Job removido com sucesso."}
 
+@api_v1.get("/shadow/report/", response_model=List[ShadowReport], tags=["Avaliação Sombra"])
+async def get_shadow_report(job_id: Optional[str] = None, since: Optional[datetime] = None, db: Session = Depends(get_read_db)):
+    """
+    Compara o modelo principal com o modelo secundário (modo sombra) por job:
+    taxa de concordância e diferenças de latência e custo.
+    """
+    return shadow_report(db, job_id=job_id, since=since)
+
+@api_v1.get("/verdicts/stream/", tags=["Monitoramento"])
+async def stream_verdicts(
+    request: Request,
+    job_id: Optional[List[str]] = Query(None, description="Filtra os veredictos por job (aceita vários)."),
+    result: Optional[List[str]] = Query(None, description="Filtra os veredictos por resultado (true, false, null, deferred).")
+):
+    """
+    Transmite os veredictos (registros do QueryLog) à medida que são gravados, via
+    Server-Sent Events. Cada evento "verdict" traz o registro em JSON; eventos "dropped"
+    informam quantos veredictos foram descartados porque o cliente não os consumiu a tempo.
+    """
+    if not VERDICT_STREAM:
+        raise HTTPException(status_code=403, detail="O stream de veredictos está desabilitado. Configure MONAI_VERDICT_STREAM=true.")
+    if verdict_hub.full():
+        raise HTTPException(status_code=503, detail="Limite de clientes do stream de veredictos atingido.")
+    return StreamingResponse(
+        verdict_events(request, job_id, result),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_v1.get("/admission/metrics/", tags=["Administração"])
+async def get_admission_metrics():
+    """
+    Métricas do controle de admissão (avaliações em andamento, profundidade da fila e
+    rejeições), do escalonamento das chamadas ao LLM entre os jobs, do buffer do query_log
+    e do stream de veredictos.
+    """
+    return {
+        **admission.metrics(),
+        "scheduler": llm_scheduler.metrics(),
+        "query_log_buffer": query_log_buffer.metrics(),
+        "verdict_stream": verdict_hub.metrics()
+    }
+
+@api_v1.get("/cascade/metrics/", tags=["Administração"])
+async def get_cascade_metrics():
+    """
+    Métricas da cascata de modelos neste worker: veredictos aceitos pelo modelo rápido,
+    taxa e motivos de escalonamento e, por camada, chamadas, latência, tokens e custo.
+    """
+    return model_cascade.metrics()
+
+@api_v1.get("/admin/profile/", tags=["Administração"], response_class=PlainTextResponse)
+async def capture_profile(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS, description="Duração da captura, em segundos."),
+    mode: str = Query(PROFILE_WALL, description="wall (tempo de parede), cpu (threads em execução) ou alloc (tracemalloc)."),
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Token")
+):
+    """
+    Captura o perfil do worker que atende a requisição durante o tempo informado e o
+    retorna no formato "folded" dos flamegraphs (flamegraph.pl, inferno, speedscope).
+
+    Nos modos wall e cpu, o peso de cada pilha é o número de amostras; no modo alloc, os
+    bytes alocados (e não liberados) durante a captura. Requer o cabeçalho X-Admin-Token.
+    """
+    check_admin_token(admin_token)
+    mode = check_profile_mode(mode)
+    stacks = await run_in_threadpool(worker_profiler.capture, mode, seconds)
+    return PlainTextResponse(
+        folded(stacks),
+        headers={
+            "Content-Disposition": f'attachment; filename="monai-{os.getpid()}-{mode}.folded"',
+            "X-Monai-Worker-Pid": str(os.getpid())
+        }
+    )
+
+@api_v1.get("/admin/profile/{profile_id}/", tags=["Administração"])
+async def get_request_profile(profile_id: str, admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    """
+    Retorna o perfil salvo de uma requisição (cabeçalho X-Monai-Profile-Id), no formato "folded".
+    """
+    check_admin_token(admin_token)
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
 @api_v1.post("/recreate-tables/", tags=["Administração"])
 async def recreate_tables(db: Session = Depends(get_db)):
     """
     Endpoint para recriar as tabelas no banco de dados.
     Remove todas as tabelas existentes e as recria em branco.
+    Desabilitado por padrão (MONAI_ALLOW_RECREATE_TABLES); mudanças de esquema devem usar as migrações.
     """
+    if not ALLOW_RECREATE_TABLES:
+        raise HTTPException(status_code=403, detail="A recriação das tabelas está desabilitada. Use as migrações (python setup_database.py).")
     try:
         Base.metadata.drop_all(bind=engine)  # Remove todas as tabelas
         Base.metadata.create_all(bind=engine)  # Recria as tabelas
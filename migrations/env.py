@@ -0,0 +1,45 @@
+from logging.config import fileConfig
+from alembic import context
+from database import DATABASE_URL, engine
+from models import Base
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """
+    Gera o SQL das migrações sem conectar ao banco (alembic upgrade head --sql).
+    """
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """
+    Executa as migrações no banco configurado. Cada migração roda em sua própria transação,
+    para que os índices criados com CONCURRENTLY possam sair dela (autocommit_block).
+    """
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+            # O SQLite não altera colunas: as alterações recriam a tabela (modo batch)
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,100 @@
+"""
+Operações de migração seguras para tabelas grandes sob tráfego.
+
+- Índices são criados com CREATE INDEX CONCURRENTLY no PostgreSQL, fora da transação da
+  migração, sem bloquear as escritas em job_data e query_log.
+- Preenchimentos de colunas são feitos em lotes, cada um em sua própria transação, para não
+  manter locks de linha por longos períodos nem gerar uma única transação enorme.
+- As operações verificam o estado atual do banco, de modo que as migrações também podem ser
+  aplicadas sobre bancos criados anteriormente pelo create_all.
+"""
+import os
+from alembic import context, op
+import sqlalchemy as sa
+
+BACKFILL_BATCH_SIZE = int(os.getenv("MONAI_MIGRATION_BATCH_SIZE", 5000))  # Linhas por lote nos preenchimentos
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+# No modo offline (alembic upgrade --sql) não há conexão: o SQL é gerado para um banco vazio
+
+def has_table(table: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(table)
+
+def has_column(table: str, column: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return any(existing["name"] == column for existing in sa.inspect(op.get_bind()).get_columns(table))
+
+def _index_state(table: str, name: str):
+    """
+    Retorna None se o índice não existe, True se é válido e False se é um índice inválido
+    deixado por um CREATE INDEX CONCURRENTLY interrompido.
+    """
+    if context.is_offline_mode():
+        return None
+    if _is_postgresql():
+        valid = op.get_bind().execute(
+            sa.text("SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"),
+            {"name": name}
+        ).scalar()
+        return valid
+    indexes = sa.inspect(op.get_bind()).get_indexes(table)
+    return True if any(index["name"] == name for index in indexes) else None
+
+def create_index_concurrently(name: str, table: str, columns, unique: bool = False):
+    """
+    Cria o índice sem bloquear as escritas na tabela (CONCURRENTLY no PostgreSQL).
+    Um índice inválido, deixado por uma tentativa anterior interrompida, é recriado.
+    """
+    state = _index_state(table, name)
+    if state:
+        return
+    if not _is_postgresql():
+        op.create_index(name, table, columns, unique=unique)
+        return
+    with op.get_context().autocommit_block():
+        if state is False:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+def drop_index_concurrently(name: str, table: str):
+    if _index_state(table, name) is None:
+        return
+    if not _is_postgresql():
+        op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+def batched_backfill(table: str, column: str, value: str, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Preenche as linhas com a coluna nula em lotes, cada lote em sua própria transação.
+
+    Args:
+        table (str): Tabela
+        column (str): Coluna a preencher
+        value (str): Expressão SQL do valor (ex.: "1.0" ou "lower(nome)")
+        batch_size (int): Linhas por lote
+
+    Returns:
+        int: Número de linhas preenchidas.
+    """
+    if context.is_offline_mode() or not _is_postgresql():
+        op.execute(f"UPDATE {table} SET {column} = {value} WHERE {column} IS NULL")
+        return 0
+
+    statement = sa.text(
+        f"UPDATE {table} SET {column} = {value} "
+        f"WHERE ctid IN (SELECT ctid FROM {table} WHERE {column} IS NULL LIMIT :batch_size)"
+    )
+    total = 0
+    with op.get_context().autocommit_block():
+        while True:
+            updated = op.get_bind().execute(statement, {"batch_size": batch_size}).rowcount
+            total += updated
+            if updated < batch_size:
+                return total
@@ -0,0 +1,102 @@
+"""Esquema inicial: jobs, regras, grupos de regras, job_data e query_log
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2025-01-06 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Colunas JSON (json no PostgreSQL), como nos bancos já criados pelo create_all
+JSONType = sa.JSON()
+
+def upgrade():
+    # Bancos criados anteriormente pelo create_all já possuem estas tabelas
+    if not has_table("rules"):
+        op.create_table(
+            "rules",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String()),
+            sa.Column("rule_text", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+        )
+    if not has_table("rule_groups"):
+        op.create_table(
+            "rule_groups",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String()),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+        )
+    if not has_table("jobs"):
+        op.create_table(
+            "jobs",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("job_name", sa.String(), nullable=False),
+            sa.Column("job_filename", sa.String(), nullable=False),
+            sa.Column("description", sa.String()),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+        )
+    if not has_table("job_rule_groups"):
+        op.create_table(
+            "job_rule_groups",
+            sa.Column("job_id", sa.String(), sa.ForeignKey("jobs.id", ondelete="CASCADE")),
+            sa.Column("rule_group_id", sa.Uuid(), sa.ForeignKey("rule_groups.id", ondelete="CASCADE")),
+        )
+    if not has_table("rule_group_rules"):
+        op.create_table(
+            "rule_group_rules",
+            sa.Column("rule_group_id", sa.Uuid(), sa.ForeignKey("rule_groups.id", ondelete="CASCADE")),
+            sa.Column("rule_id", sa.Uuid(), sa.ForeignKey("rules.id", ondelete="CASCADE")),
+        )
+    if not has_table("job_data"):
+        op.create_table(
+            "job_data",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("job_id", sa.String(), sa.ForeignKey("jobs.id"), nullable=False),
+            sa.Column("job_name", sa.String(), nullable=False),
+            sa.Column("job_filename", sa.String(), nullable=False),
+            sa.Column("attributes", JSONType, nullable=True),
+            sa.Column("received_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("weekday", sa.String(), nullable=False),
+            sa.Column("month", sa.String(), nullable=False),
+            sa.Column("is_holiday", sa.Boolean(), nullable=False),
+            sa.Column("outlier_data", sa.Boolean(), nullable=False),
+            sa.Column("force_true", sa.Boolean(), nullable=False),
+        )
+    if not has_table("query_log"):
+        op.create_table(
+            "query_log",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("job_id", sa.String(), sa.ForeignKey("jobs.id"), nullable=False),
+            sa.Column("job_name", sa.String(), nullable=False),
+            sa.Column("job_filename", sa.String(), nullable=False),
+            sa.Column("attributes", JSONType, nullable=True),
+            sa.Column("result", sa.String(), nullable=False),
+            sa.Column("explanation", sa.Text(), nullable=False),
+            sa.Column("referer", sa.String(), nullable=True),
+            sa.Column("fingerprint", sa.String(), nullable=False),
+            sa.Column("received_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("ip_address", sa.String(), nullable=False),
+            sa.Column("user_agent", sa.String(), nullable=True),
+            sa.Column("monai_history_executions", sa.Integer(), nullable=False),
+            sa.Column("force_true", sa.Boolean(), nullable=False),
+            sa.Column("use_historical_outlier", sa.Boolean(), nullable=False),
+        )
+
+def downgrade():
+    for table in ("query_log", "job_data", "rule_group_rules", "job_rule_groups", "jobs", "rule_groups", "rules"):
+        op.drop_table(table)
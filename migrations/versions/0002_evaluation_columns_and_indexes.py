@@ -0,0 +1,54 @@
+"""Colunas de avaliação (regras estruturadas, tokens e escalonamento) e índices do histórico
+
+Revision ID: 0002_evaluation_columns
+Revises: 0001_baseline
+Create Date: 2025-01-20 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_column, create_index_concurrently, drop_index_concurrently, batched_backfill
+
+revision = "0002_evaluation_columns"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+JOB_DATA_INDEXES = {
+    "ix_job_data_job_received_at": ["job_id", "received_at"],
+    "ix_job_data_job_weekday_received_at": ["job_id", "weekday", "received_at"],
+    "ix_job_data_job_holiday_received_at": ["job_id", "is_holiday", "received_at"],
+}
+
+def upgrade():
+    # Colunas anuláveis: no PostgreSQL, o ADD COLUMN só altera o catálogo, sem reescrever a tabela
+    if not has_column("rules", "rule_expression"):
+        op.add_column("rules", sa.Column("rule_expression", sa.String(), nullable=True))
+    if not has_column("query_log", "prompt_tokens"):
+        op.add_column("query_log", sa.Column("prompt_tokens", sa.Integer(), nullable=True))
+    if not has_column("query_log", "completion_tokens"):
+        op.add_column("query_log", sa.Column("completion_tokens", sa.Integer(), nullable=True))
+    if not has_column("jobs", "max_concurrency"):
+        op.add_column("jobs", sa.Column("max_concurrency", sa.Integer(), nullable=True))
+
+    # priority_weight: a coluna é criada anulável, preenchida em lotes e só então passa a NOT NULL
+    if not has_column("jobs", "priority_weight"):
+        op.add_column("jobs", sa.Column("priority_weight", sa.Float(), nullable=True, server_default=sa.text("1.0")))
+    batched_backfill("jobs", "priority_weight", "1.0")
+    with op.batch_alter_table("jobs") as batch:
+        batch.alter_column("priority_weight", existing_type=sa.Float(), nullable=False, existing_server_default=sa.text("1.0"))
+
+    # Índices da seleção do histórico, criados sem bloquear as escritas em job_data
+    for name, columns in JOB_DATA_INDEXES.items():
+        create_index_concurrently(name, "job_data", columns)
+
+def downgrade():
+    for name in JOB_DATA_INDEXES:
+        drop_index_concurrently(name, "job_data")
+    with op.batch_alter_table("jobs") as batch:
+        batch.drop_column("priority_weight")
+        batch.drop_column("max_concurrency")
+    with op.batch_alter_table("query_log") as batch:
+        batch.drop_column("completion_tokens")
+        batch.drop_column("prompt_tokens")
+    with op.batch_alter_table("rules") as batch:
+        batch.drop_column("rule_expression")
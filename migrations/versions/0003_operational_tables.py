@@ -0,0 +1,87 @@
+"""Tabelas operacionais: avaliação sombra, revisões do catálogo, outbox de notificações e chaves de idempotência
+
+Revision ID: 0003_operational_tables
+Revises: 0002_evaluation_columns
+Create Date: 2025-02-03 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table, create_index_concurrently
+
+revision = "0003_operational_tables"
+down_revision = "0002_evaluation_columns"
+branch_labels = None
+depends_on = None
+
+# Colunas JSON (json no PostgreSQL), como nos bancos já criados pelo create_all
+JSONType = sa.JSON()
+
+def upgrade():
+    if not has_table("shadow_evaluations"):
+        op.create_table(
+            "shadow_evaluations",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("job_id", sa.String(), sa.ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("query_log_id", sa.Uuid(), nullable=True),
+            sa.Column("received_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("primary_provider", sa.String(), nullable=False),
+            sa.Column("primary_model", sa.String(), nullable=False),
+            sa.Column("primary_result", sa.String(), nullable=False),
+            sa.Column("primary_latency_ms", sa.Float(), nullable=False),
+            sa.Column("primary_prompt_tokens", sa.Integer(), nullable=True),
+            sa.Column("primary_completion_tokens", sa.Integer(), nullable=True),
+            sa.Column("shadow_provider", sa.String(), nullable=False),
+            sa.Column("shadow_model", sa.String(), nullable=False),
+            sa.Column("shadow_result", sa.String(), nullable=True),
+            sa.Column("shadow_explanation", sa.Text(), nullable=True),
+            sa.Column("shadow_latency_ms", sa.Float(), nullable=True),
+            sa.Column("shadow_prompt_tokens", sa.Integer(), nullable=True),
+            sa.Column("shadow_completion_tokens", sa.Integer(), nullable=True),
+            sa.Column("shadow_error", sa.Text(), nullable=True),
+            sa.Column("agreement", sa.Boolean(), nullable=True),
+        )
+    create_index_concurrently("ix_shadow_evaluations_job_id", "shadow_evaluations", ["job_id"])
+
+    if not has_table("catalog_revisions"):
+        op.create_table(
+            "catalog_revisions",
+            sa.Column("name", sa.String(), primary_key=True),
+            sa.Column("epoch", sa.String(), nullable=False),
+            sa.Column("revision", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        )
+
+    if not has_table("notification_outbox"):
+        op.create_table(
+            "notification_outbox",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("endpoint", sa.String(), nullable=False),
+            sa.Column("dedup_key", sa.String(), nullable=False),
+            sa.Column("job_id", sa.String(), nullable=False),
+            sa.Column("payload", JSONType, nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("last_error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+            sa.UniqueConstraint("endpoint", "dedup_key", name="uq_notification_outbox_endpoint_dedup_key"),
+        )
+    create_index_concurrently("ix_notification_outbox_status_next_attempt", "notification_outbox", ["status", "next_attempt_at"])
+
+    if not has_table("idempotency_keys"):
+        op.create_table(
+            "idempotency_keys",
+            sa.Column("key", sa.String(), primary_key=True),
+            sa.Column("fingerprint", sa.String(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("status_code", sa.Integer(), nullable=True),
+            sa.Column("response", JSONType, nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        )
+    create_index_concurrently("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+def downgrade():
+    for table in ("idempotency_keys", "notification_outbox", "catalog_revisions", "shadow_evaluations"):
+        op.drop_table(table)
@@ -0,0 +1,42 @@
+"""Resumos hierárquicos (diário, semanal e mensal) do histórico dos jobs
+
+Revision ID: 0004_history_summaries
+Revises: 0003_operational_tables
+Create Date: 2025-02-10 00:00:00
+
+Após o upgrade, os resumos das entregas já gravadas podem ser calculados com
+`python history_summaries.py --rebuild`.
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table
+
+revision = "0004_history_summaries"
+down_revision = "0003_operational_tables"
+branch_labels = None
+depends_on = None
+
+# Colunas JSON (json no PostgreSQL), como nos bancos já criados pelo create_all
+JSONType = sa.JSON()
+
+def upgrade():
+    if not has_table("history_summaries"):
+        op.create_table(
+            "history_summaries",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("job_id", sa.String(), sa.ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("granularity", sa.String(), nullable=False),
+            sa.Column("bucket_start", sa.Date(), nullable=False),
+            sa.Column("attribute", sa.String(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("mean", sa.Float(), nullable=False),
+            sa.Column("m2", sa.Float(), nullable=False),
+            sa.Column("min", sa.Float(), nullable=True),
+            sa.Column("max", sa.Float(), nullable=True),
+            sa.Column("sample", JSONType, nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+            sa.UniqueConstraint("job_id", "granularity", "bucket_start", "attribute", name="uq_history_summaries_bucket"),
+        )
+
+def downgrade():
+    op.drop_table("history_summaries")
@@ -0,0 +1,25 @@
+"""Estratégia de seleção do histórico registrada no query_log
+
+Revision ID: 0005_query_log_history_strategy
+Revises: 0004_history_summaries
+Create Date: 2025-02-17 00:00:00
+
+Registros anteriores ficam com a coluna nula; o replay os trata como "recent".
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_column
+
+revision = "0005_query_log_history_strategy"
+down_revision = "0004_history_summaries"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Coluna anulável: no PostgreSQL, o ADD COLUMN só altera o catálogo, sem reescrever a tabela
+    if not has_column("query_log", "history_strategy"):
+        op.add_column("query_log", sa.Column("history_strategy", sa.String(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table("query_log") as batch:
+        batch.drop_column("history_strategy")
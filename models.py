@@ -1,6 +1,5 @@
 import os
-from sqlalchemy import Column, String, JSON, DateTime, Boolean, Text, Integer, ForeignKey, Table, CheckConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, JSON, Date, DateTime, Boolean, Text, Integer, Float, ForeignKey, Table, CheckConstraint, Index, UniqueConstraint, Uuid
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import uuid
@@ -9,29 +8,34 @@ from pytz import timezone
 
 Base = declarative_base()
 
+# Tipos portáveis: UUID nativo no PostgreSQL e equivalente genérico nos demais bancos (ex.: SQLite).
+# As colunas JSON continuam json no PostgreSQL: convertê-las para jsonb reescreveria as tabelas grandes
+JSONType = JSON()
+
 # Tabela de associação entre jobs e grupos de regras
 job_rule_groups = Table(
     'job_rule_groups',
     Base.metadata,
     Column('job_id', String, ForeignKey('jobs.id', ondelete='CASCADE')),
-    Column('rule_group_id', UUID, ForeignKey('rule_groups.id', ondelete='CASCADE'))
+    Column('rule_group_id', Uuid, ForeignKey('rule_groups.id', ondelete='CASCADE'))
 )
 
 # Tabela de associação entre grupos de regras e regras
 rule_group_rules = Table(
     'rule_group_rules',
     Base.metadata,
-    Column('rule_group_id', UUID, ForeignKey('rule_groups.id', ondelete='CASCADE')),
-    Column('rule_id', UUID, ForeignKey('rules.id', ondelete='CASCADE'))
+    Column('rule_group_id', Uuid, ForeignKey('rule_groups.id', ondelete='CASCADE')),
+    Column('rule_id', Uuid, ForeignKey('rules.id', ondelete='CASCADE'))
 )
 
 class Rule(Base):
     __tablename__ = "rules"
 
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     description = Column(String)
     rule_text = Column(String, nullable=False)
+    rule_expression = Column(String, nullable=True)  # Expressão avaliada localmente (ex.: "min <= avg <= max")
     created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(), onupdate=lambda: datetime.now())
     is_active = Column(Boolean, nullable=False, default=True)
@@ -42,7 +46,7 @@ class Rule(Base):
 class RuleGroup(Base):
     __tablename__ = "rule_groups"
 
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     description = Column(String)
     created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now())
@@ -63,6 +67,8 @@ class Job(Base):
     created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(), onupdate=lambda: datetime.now())
     is_active = Column(Boolean, nullable=False, default=True)
+    priority_weight = Column(Float, nullable=False, default=1.0)  # Peso do job no escalonamento das chamadas ao LLM
+    max_concurrency = Column(Integer, nullable=True)  # Chamadas simultâneas ao LLM (padrão: MONAI_JOB_MAX_CONCURRENCY)
     
     # Relacionamentos
     job_data = relationship("JobData", back_populates="job", cascade="all, delete-orphan")
@@ -72,11 +78,11 @@ class Job(Base):
 class JobData(Base):
     __tablename__ = "job_data"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     job_id = Column(String, ForeignKey("jobs.id"), nullable=False)
     job_name = Column(String, nullable=False)
     job_filename = Column(String, nullable=False)
-    attributes = Column(JSON, nullable=True)
+    attributes = Column(JSONType, nullable=True)
     received_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone(os.getenv("TZ", "America/Sao_Paulo"))), nullable=False)
     weekday = Column(String, nullable=False)
     month = Column(String, nullable=False)
@@ -87,14 +93,21 @@ class JobData(Base):
     # Relacionamento
     job = relationship("Job", back_populates="job_data")
 
+    # Índices usados na seleção do histórico (últimas entregas e estratos de calendário)
+    __table_args__ = (
+        Index("ix_job_data_job_received_at", "job_id", "received_at"),
+        Index("ix_job_data_job_weekday_received_at", "job_id", "weekday", "received_at"),
+        Index("ix_job_data_job_holiday_received_at", "job_id", "is_holiday", "received_at"),
+    )
+
 class QueryLog(Base):
     __tablename__ = "query_log"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     job_id = Column(String, ForeignKey("jobs.id"), nullable=False)
     job_name = Column(String, nullable=False)
     job_filename = Column(String, nullable=False)
-    attributes = Column(JSON, nullable=True)
+    attributes = Column(JSONType, nullable=True)
     result = Column(String, nullable=False)
     explanation = Column(Text, nullable=False)
     referer = Column(String, nullable=True)
@@ -105,6 +118,95 @@ class QueryLog(Base):
     monai_history_executions = Column(Integer, nullable=False)
     force_true = Column(Boolean, default=False, nullable=False)
     use_historical_outlier = Column(Boolean, default=False, nullable=False)
+    history_strategy = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
     
     # Relacionamento
-    job = relationship("Job", back_populates="query_logs")
\ No newline at end of file
+    job = relationship("Job", back_populates="query_logs")
+
+class ShadowEvaluation(Base):
+    __tablename__ = "shadow_evaluations"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    job_id = Column(String, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    query_log_id = Column(Uuid, nullable=True)
+    received_at = Column(DateTime(timezone=True), nullable=False)
+    primary_provider = Column(String, nullable=False)
+    primary_model = Column(String, nullable=False)
+    primary_result = Column(String, nullable=False)
+    primary_latency_ms = Column(Float, nullable=False)
+    primary_prompt_tokens = Column(Integer, nullable=True)
+    primary_completion_tokens = Column(Integer, nullable=True)
+    shadow_provider = Column(String, nullable=False)
+    shadow_model = Column(String, nullable=False)
+    shadow_result = Column(String, nullable=True)
+    shadow_explanation = Column(Text, nullable=True)
+    shadow_latency_ms = Column(Float, nullable=True)
+    shadow_prompt_tokens = Column(Integer, nullable=True)
+    shadow_completion_tokens = Column(Integer, nullable=True)
+    shadow_error = Column(Text, nullable=True)
+    agreement = Column(Boolean, nullable=True)
+
+class CatalogRevision(Base):
+    __tablename__ = "catalog_revisions"
+
+    name = Column(String, primary_key=True)
+    epoch = Column(String, nullable=False, default=lambda: uuid.uuid4().hex[:12])  # Muda quando o contador é recriado
+    revision = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now())
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    endpoint = Column(String, nullable=False)
+    dedup_key = Column(String, nullable=False)
+    job_id = Column(String, nullable=False)
+    payload = Column(JSONType, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now())
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("endpoint", "dedup_key", name="uq_notification_outbox_endpoint_dedup_key"),
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)  # Valor do cabeçalho Idempotency-Key (índice único)
+    fingerprint = Column(String, nullable=False)  # Hash do corpo da requisição original
+    status = Column(String, nullable=False, default="processing")  # processing, completed
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSONType, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+class HistorySummary(Base):
+    __tablename__ = "history_summaries"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    job_id = Column(String, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
+    granularity = Column(String, nullable=False)  # day, week, month
+    bucket_start = Column(Date, nullable=False)  # Primeiro dia do período
+    attribute = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)  # Soma dos quadrados dos desvios (variância incremental)
+    min = Column(Float, nullable=True)
+    max = Column(Float, nullable=True)
+    sample = Column(JSONType, nullable=False, default=list)  # Amostra (reservoir) usada nos percentis
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(), onupdate=lambda: datetime.now())
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "granularity", "bucket_start", "attribute", name="uq_history_summaries_bucket"),
+    )
@@ -0,0 +1,163 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List
+import httpx
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import NotificationOutbox, QueryLog
+
+# Endpoints (webhooks) que recebem as anomalias detectadas, separados por vírgula
+WEBHOOK_URLS = [url.strip() for url in os.getenv("MONAI_WEBHOOK_URLS", "").split(",") if url.strip()]
+OUTBOX_INTERVAL = float(os.getenv("MONAI_OUTBOX_INTERVAL", 2))  # Intervalo (s) entre os ciclos do despachante
+OUTBOX_BATCH_SIZE = int(os.getenv("MONAI_OUTBOX_BATCH_SIZE", 100))  # Notificações por lote
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("MONAI_OUTBOX_MAX_ATTEMPTS", 8))  # Tentativas antes de marcar como falha
+OUTBOX_BACKOFF_BASE = float(os.getenv("MONAI_OUTBOX_BACKOFF_BASE", 2))  # Espera inicial (s) entre tentativas
+OUTBOX_BACKOFF_MAX = float(os.getenv("MONAI_OUTBOX_BACKOFF_MAX", 300))  # Espera máxima (s) entre tentativas
+WEBHOOK_TIMEOUT = float(os.getenv("MONAI_WEBHOOK_TIMEOUT", 5))
+OUTBOX_LEASE = float(os.getenv("MONAI_OUTBOX_LEASE", 60))  # Reserva (s) de um lote em envio, antes de voltar a ser elegível
+
+def enqueue_anomaly_notifications(db: Session, query_log: QueryLog):
+    """
+    Adiciona à sessão as notificações de anomalia de um QueryLog, uma por webhook.
+
+    Deve ser chamada antes do commit do QueryLog, para que as notificações sejam
+    gravadas na mesma transação (outbox transacional).
+    """
+    if not WEBHOOK_URLS:
+        return
+    payload = {
+        "event_id": str(query_log.id),
+        "job_id": query_log.job_id,
+        "job_name": query_log.job_name,
+        "job_filename": query_log.job_filename,
+        "attributes": query_log.attributes,
+        "result": query_log.result,
+        "explanation": query_log.explanation,
+        "received_at": query_log.received_at.isoformat(),
+    }
+    for endpoint in WEBHOOK_URLS:
+        db.add(NotificationOutbox(
+            endpoint=endpoint,
+            dedup_key=str(query_log.id),
+            job_id=query_log.job_id,
+            payload=payload
+        ))
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1)), OUTBOX_BACKOFF_MAX))
+
+def dispatch_pending(http_client: httpx.Client) -> int:
+    """
+    Envia um lote de notificações pendentes, agrupadas por endpoint.
+
+    O lote é reivindicado em uma transação curta: as linhas são bloqueadas com FOR UPDATE
+    SKIP LOCKED (no PostgreSQL), recebem uma nova tentativa e têm o next_attempt_at adiado
+    por MONAI_OUTBOX_LEASE segundos, e a transação é confirmada antes dos envios. Assim,
+    nenhum lock fica retido durante os POSTs e vários workers podem despachar em paralelo
+    sem enviar a mesma notificação duas vezes. O resultado é gravado em uma segunda
+    transação; se o worker cair no meio do envio, o lote volta a ser elegível ao fim da
+    reserva. Notificações repetidas (mesmo endpoint e dedup_key) são enviadas uma única vez.
+
+    Returns:
+        int: Número de notificações entregues.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        rows = db.query(NotificationOutbox).filter(
+            NotificationOutbox.status == "pending",
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.created_at).limit(OUTBOX_BATCH_SIZE).with_for_update(skip_locked=True).all()
+        if not rows:
+            db.rollback()
+            return 0
+
+        batches = {}
+        for row in rows:
+            batch = batches.setdefault(row.endpoint, {})
+            if row.dedup_key in batch:
+                # Duplicata já coberta pelo envio do mesmo lote
+                row.status = "sent"
+                row.sent_at = now
+                continue
+            batch[row.dedup_key] = row
+            row.attempts += 1
+            row.next_attempt_at = now + timedelta(seconds=OUTBOX_LEASE)
+
+        # Cópia do lote reivindicado, usada fora da transação
+        claimed = {
+            endpoint: [(row.id, row.attempts, row.payload) for row in batch.values()]
+            for endpoint, batch in batches.items()
+        }
+        db.commit()
+
+        outcomes = {}
+        for endpoint, pending in claimed.items():
+            try:
+                response = http_client.post(
+                    endpoint,
+                    json={"events": [payload for _, _, payload in pending]},
+                    headers={"X-MonAI-Batch-Size": str(len(pending))}
+                )
+                response.raise_for_status()
+                error = None
+            except Exception as e:
+                error = str(e)
+            for row_id, attempts, _ in pending:
+                outcomes[row_id] = (attempts, error)
+
+        delivered = 0
+        for row in db.query(NotificationOutbox).filter(NotificationOutbox.id.in_(list(outcomes))).all():
+            attempts, error = outcomes[row.id]
+            if error is None:
+                row.status = "sent"
+                row.sent_at = datetime.now()
+                delivered += 1
+                continue
+            row.last_error = error
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                row.status = "failed"
+            else:
+                row.next_attempt_at = datetime.now() + _backoff(attempts)
+
+        db.commit()
+        return delivered
+    except Exception as e:
+        db.rollback()
+        print(f"Erro ao despachar notificações: {str(e)}")
+        return 0
+    finally:
+        db.close()
+
+class OutboxDispatcher:
+    """
+    Thread em segundo plano que esvazia o outbox periodicamente.
+    """
+
+    def __init__(self, interval: float = OUTBOX_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not WEBHOOK_URLS or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="monai-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + WEBHOOK_TIMEOUT)
+            self._thread = None
+
+    def _run(self):
+        with httpx.Client(timeout=WEBHOOK_TIMEOUT) as http_client:
+            while not self._stop.is_set():
+                # Continua despachando enquanto houver lotes cheios
+                while dispatch_pending(http_client) >= OUTBOX_BATCH_SIZE and not self._stop.is_set():
+                    pass
+                self._stop.wait(self.interval)
+
+outbox_dispatcher = OutboxDispatcher()
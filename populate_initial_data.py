@@ -1,11 +1,10 @@
-from database import SessionLocal, engine
-from models import Base, Job, Rule, RuleGroup
+from database import SessionLocal
+from models import Job, Rule, RuleGroup
 from datetime import datetime
 import uuid
 import sys
 
-# Criar as tabelas
-Base.metadata.create_all(bind=engine)
+# As tabelas são criadas pelas migrações (python setup_database.py)
 
 # Verificar se o job já existe
 def check_job_exists():
@@ -43,6 +42,7 @@ def create_all_rules(db):
             name="Validação de Média com Min e Max",
             description="Verifica se o valor médio está dentro do intervalo definido pelos valores mínimo e máximo",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'avg', juntamente com 'min' e 'max', o valor de 'avg' deve estar dentro do intervalo definido pelos valores de 'min' e 'max'.",
+            rule_expression="min <= avg <= max",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -52,6 +52,7 @@ def create_all_rules(db):
             name="Validação de Média com Min e Max (mean)",
             description="Verifica se o valor mean está dentro do intervalo definido pelos valores mínimo e máximo",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'mean', juntamente com 'min' e 'max', o valor de 'mean' deve estar dentro do intervalo definido pelos valores de 'min' e 'max'.",
+            rule_expression="min <= mean <= max",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -61,6 +62,7 @@ def create_all_rules(db):
             name="Validação de Máximo",
             description="Verifica se o valor máximo é maior que o valor mínimo",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'max', o valor de 'max' deve ser maior que o valor de 'min'.",
+            rule_expression="max > min",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -70,6 +72,7 @@ def create_all_rules(db):
             name="Validação de Desvio Padrão",
             description="Verifica se o desvio padrão é menor que a diferença entre máximo e mínimo",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'std', juntamente com 'min' e 'max', o valor de 'std' deve ser menor que a diferença entre os valores de 'max' e 'min'.",
+            rule_expression="std < max - min",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -79,6 +82,7 @@ def create_all_rules(db):
             name="Validação de Desvio Padrão (stdev)",
             description="Verifica se o desvio padrão (stdev) é menor que a diferença entre máximo e mínimo",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'stdev', juntamente com 'min' e 'max', o valor de 'stdev' deve ser menor que a diferença entre os valores de 'max' e 'min'.",
+            rule_expression="stdev < max - min",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -89,6 +93,7 @@ def create_all_rules(db):
             name="Validação de Contagem",
             description="Verifica se o valor de contagem é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'count', o valor de 'count' deve ser maior que zero.",
+            rule_expression="count > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -98,6 +103,7 @@ def create_all_rules(db):
             name="Validação de Soma",
             description="Verifica se o valor da soma é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'sum', o valor de 'sum' deve ser maior que zero.",
+            rule_expression="sum > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -108,6 +114,7 @@ def create_all_rules(db):
             name="Validação de Mediana",
             description="Verifica se a mediana está entre os valores mínimo e máximo",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'median', o valor de 'median' deve estar entre os valores de 'min' e 'max'.",
+            rule_expression="min <= median <= max",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -117,6 +124,7 @@ def create_all_rules(db):
             name="Validação de Moda",
             description="Verifica se a moda está entre os valores mínimo e máximo",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'mode', o valor de 'mode' deve estar entre os valores de 'min' e 'max'.",
+            rule_expression="min <= mode <= max",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -127,6 +135,7 @@ def create_all_rules(db):
             name="Validação de Variância",
             description="Verifica se a variância é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'variance', o valor de 'variance' deve ser maior que zero.",
+            rule_expression="variance > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -136,6 +145,7 @@ def create_all_rules(db):
             name="Validação de Assimetria",
             description="Verifica se a assimetria é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'skewness', o valor de 'skewness' deve ser maior que zero.",
+            rule_expression="skewness > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -145,6 +155,7 @@ def create_all_rules(db):
             name="Validação de Curtose",
             description="Verifica se a curtose é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'kurtosis', o valor de 'kurtosis' deve ser maior que zero.",
+            rule_expression="kurtosis > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -154,6 +165,7 @@ def create_all_rules(db):
             name="Validação de Amplitude",
             description="Verifica se a amplitude é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'range', o valor de 'range' deve ser maior que zero.",
+            rule_expression="range > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -163,6 +175,7 @@ def create_all_rules(db):
             name="Validação de IQR",
             description="Verifica se o IQR é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'iqr', o valor de 'iqr' deve ser maior que zero.",
+            rule_expression="iqr > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -172,6 +185,7 @@ def create_all_rules(db):
             name="Validação de MAD",
             description="Verifica se o MAD é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'mad', o valor de 'mad' deve ser maior que zero.",
+            rule_expression="mad > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -181,6 +195,7 @@ def create_all_rules(db):
             name="Validação de CV",
             description="Verifica se o coeficiente de variação é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'cv', o valor de 'cv' deve ser maior que zero.",
+            rule_expression="cv > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -191,6 +206,7 @@ def create_all_rules(db):
             name="Validação de Z-Score",
             description="Verifica se o Z-Score é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'z_score', o valor de 'z_score' deve ser maior que zero.",
+            rule_expression="z_score > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -200,6 +216,7 @@ def create_all_rules(db):
             name="Validação de P-Valor",
             description="Verifica se o P-Valor é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'p_value', o valor de 'p_value' deve ser maior que zero.",
+            rule_expression="p_value > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -209,6 +226,7 @@ def create_all_rules(db):
             name="Validação de Intervalo de Confiança",
             description="Verifica se o intervalo de confiança é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'confidence_interval', o valor de 'confidence_interval' deve ser maior que zero.",
+            rule_expression="confidence_interval > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -218,6 +236,7 @@ def create_all_rules(db):
             name="Validação de Limite Superior",
             description="Verifica se o limite superior é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'upper_bound', o valor de 'upper_bound' deve ser maior que zero.",
+            rule_expression="upper_bound > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -227,6 +246,7 @@ def create_all_rules(db):
             name="Validação de Limite Inferior",
             description="Verifica se o limite inferior é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'lower_bound', o valor de 'lower_bound' deve ser maior que zero.",
+            rule_expression="lower_bound > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -236,6 +256,7 @@ def create_all_rules(db):
             name="Validação de Outliers",
             description="Verifica se o número de outliers é maior que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'outliers', o valor de 'outliers' deve ser maior que zero.",
+            rule_expression="outliers > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -246,6 +267,7 @@ def create_all_rules(db):
             name="Validação de Percentis",
             description="Verifica se os percentis são maiores que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'percentiles', o valor de 'percentiles' deve ser maior que zero.",
+            rule_expression="percentiles > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -255,6 +277,7 @@ def create_all_rules(db):
             name="Validação de Decis",
             description="Verifica se os decis são maiores que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'deciles', o valor de 'deciles' deve ser maior que zero.",
+            rule_expression="deciles > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -264,6 +287,7 @@ def create_all_rules(db):
             name="Validação de Quartis",
             description="Verifica se os quartis são maiores que zero",
             rule_text="Ao aplicar esta regra, considere a avaliação do último dado recebido e não compare com o histórico. Se houver valores para 'quartiles', o valor de 'quartiles' deve ser maior que zero.",
+            rule_expression="quartiles > 0",
             is_active=True,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -0,0 +1,256 @@
+import os
+import re
+import sys
+import hmac
+import time
+import uuid
+import tempfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional, Set
+from fastapi import HTTPException
+
+# Perfil sob demanda dos workers em produção: amostragem das pilhas (tempo de parede ou CPU)
+# e alocações (tracemalloc), exportados no formato "folded" dos flamegraphs
+# (flamegraph.pl, inferno, speedscope)
+ADMIN_TOKEN = os.getenv("MONAI_ADMIN_TOKEN")  # Token dos endpoints administrativos; vazio desativa o perfil
+PROFILE_INTERVAL = float(os.getenv("MONAI_PROFILE_INTERVAL_MS", 10)) / 1000  # Intervalo entre as amostras
+PROFILE_MAX_SECONDS = float(os.getenv("MONAI_PROFILE_MAX_SECONDS", 60))  # Duração máxima de uma captura
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("MONAI_PROFILE_TRACEMALLOC_FRAMES", 25))  # Profundidade das pilhas de alocação
+PROFILE_DIR = os.getenv("MONAI_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "monai-profiles"))  # Perfis por requisição
+PROFILE_KEEP = int(os.getenv("MONAI_PROFILE_KEEP", 50))  # Perfis por requisição mantidos em PROFILE_DIR
+
+PROFILE_WALL = "wall"
+PROFILE_CPU = "cpu"
+PROFILE_ALLOC = "alloc"
+PROFILE_MODES = (PROFILE_WALL, PROFILE_CPU, PROFILE_ALLOC)
+
+# O estado das threads (em execução ou aguardando) é lido do /proc, disponível apenas no Linux
+CPU_SAMPLING = os.path.isdir("/proc/self/task")
+
+_PROFILE_NAME = re.compile(r"[0-9A-Za-z-]+")
+
+def check_admin_token(token: Optional[str]):
+    """
+    Valida o token administrativo (cabeçalho X-Admin-Token).
+
+    Raises:
+        HTTPException: 403 se MONAI_ADMIN_TOKEN não estiver configurado; 401 se o token for inválido.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Os endpoints administrativos estão desabilitados. Configure MONAI_ADMIN_TOKEN.")
+    if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token administrativo inválido.")
+
+def check_profile_mode(mode: str) -> str:
+    mode = (mode or "").lower()
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"Modo de perfil inválido: {mode}. Opções: {', '.join(PROFILE_MODES)}.")
+    if mode == PROFILE_CPU and not CPU_SAMPLING:
+        raise HTTPException(status_code=400, detail="O perfil de CPU requer o /proc do Linux; use o modo wall.")
+    return mode
+
+def _thread_running(native_id: Optional[int]) -> bool:
+    try:
+        with open(f"/proc/self/task/{native_id}/stat") as stat:
+            # O estado vem após o nome da thread, entre parênteses
+            return stat.read().rsplit(")", 1)[1].split()[0] == "R"
+    except (OSError, IndexError):
+        return False
+
+class StackSampler:
+    """
+    Amostra periodicamente as pilhas das threads do processo (sys._current_frames) em uma
+    thread própria. No modo "cpu", só entram as threads em execução no momento da amostra;
+    no modo "wall", também as que aguardam (E/S, locks, LLM).
+    """
+
+    def __init__(self, mode: str, interval: float = PROFILE_INTERVAL, thread_ids: Optional[Set[int]] = None):
+        self.mode = mode
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="monai-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                thread = threads.get(ident)
+                if self.mode == PROFILE_CPU and not _thread_running(thread.native_id if thread else None):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append((thread.name if thread else str(ident)).replace(";", ","))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+class _AllocationTracer:
+    """
+    Inicia o tracemalloc enquanto houver capturas de alocação em andamento, sem interromper
+    um rastreamento iniciado fora do perfil (ex.: PYTHONTRACEMALLOC).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._started = False
+
+    def acquire(self) -> tracemalloc.Snapshot:
+        with self._lock:
+            if self._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+                self._started = True
+            self._users += 1
+        return tracemalloc.take_snapshot()
+
+    def release(self, before: tracemalloc.Snapshot) -> Counter:
+        try:
+            after = tracemalloc.take_snapshot()
+        finally:
+            with self._lock:
+                self._users -= 1
+                if self._users == 0 and self._started:
+                    tracemalloc.stop()
+                    self._started = False
+        ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        stacks = Counter()
+        for stat in after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "traceback"):
+            if stat.size_diff > 0:
+                # Pilhas do tracemalloc vão do quadro mais antigo ao mais recente
+                stack = ";".join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback)
+                stacks[stack] += stat.size_diff
+        return stacks
+
+allocation_tracer = _AllocationTracer()
+
+def folded(stacks: Counter) -> str:
+    """
+    Serializa as pilhas no formato "folded" (uma pilha por linha, quadros separados por ";",
+    seguida do peso: amostras ou bytes alocados).
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+class WorkerProfiler:
+    """
+    Captura com duração limitada do worker inteiro; uma captura por vez em cada worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def capture(self, mode: str, seconds: float) -> Counter:
+        """
+        Raises:
+            HTTPException: 409 se já houver uma captura em andamento neste worker.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="Já existe uma captura de perfil em andamento neste worker.")
+        try:
+            if mode == PROFILE_ALLOC:
+                before = allocation_tracer.acquire()
+                time.sleep(seconds)
+                return allocation_tracer.release(before)
+            sampler = StackSampler(mode)
+            sampler.start()
+            time.sleep(seconds)
+            return sampler.stop()
+        finally:
+            self._lock.release()
+
+worker_profiler = WorkerProfiler()
+
+def _save_profile(mode: str, stacks: Counter) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{mode}-{uuid.uuid4().hex[:8]}"
+    with open(os.path.join(PROFILE_DIR, f"{name}.folded"), "w") as output:
+        output.write(folded(stacks))
+    # Mantém apenas os perfis mais recentes
+    profiles = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".folded")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in profiles[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return name
+
+def profile_path(name: str) -> Optional[str]:
+    """
+    Caminho de um perfil salvo, ou None se o nome for inválido ou o arquivo não existir.
+    """
+    if not _PROFILE_NAME.fullmatch(name or ""):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{name}.folded")
+    return path if os.path.isfile(path) else None
+
+def profile_call(state, mode: str, function, *args):
+    """
+    Executa a função (na thread atual) sob o perfil do modo informado e registra o nome do
+    perfil salvo em state.profile_name. As amostras de pilha se limitam à thread atual; as
+    alocações incluem as das demais requisições simultâneas.
+    """
+    if mode == PROFILE_ALLOC:
+        before = allocation_tracer.acquire()
+        try:
+            return function(*args)
+        finally:
+            state.profile_name = _save_profile(mode, allocation_tracer.release(before))
+
+    sampler = StackSampler(mode, thread_ids={threading.get_ident()})
+    sampler.start()
+    try:
+        return function(*args)
+    finally:
+        state.profile_name = _save_profile(mode, sampler.stop())
+
+class ProfileHeaderMiddleware:
+    """
+    Middleware ASGI que informa o perfil da requisição no cabeçalho X-Monai-Profile-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                name = scope.get("state", {}).get("profile_name")
+                if name:
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-monai-profile-id", name.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_profile)
@@ -0,0 +1,98 @@
+from datetime import datetime
+from typing import List
+from llm_client import EXPLAIN_MAX_CHARS
+
+# Regra padrão que sempre deve ser aplicada
+DEFAULT_RULE = "Considere as variações contextuais e os padrões esperados, dando maior relevância aos dados históricos mais recentes."
+
+# Nota incluída no prompt quando o histórico não é apenas o das entregas mais recentes
+STRATUM_NOTE = (
+    "O campo 'stratum' indica o critério de seleção de cada registro do histórico: entregas recentes, "
+    "mesmo dia da semana, mesma posição em relação ao fim do mês, feriados ou entregas semelhantes à atual.\n"
+)
+
+def format_rules(rules: List[str]) -> str:
+    """
+    Combina a regra padrão com as regras do job e as numera para o prompt.
+    """
+    rules = [DEFAULT_RULE] + (rules if rules else [])
+    return "".join(f"{i + 1}. {rule}\n" for i, rule in enumerate(rules))
+
+def build_evaluation_prompt(
+    rules: List[str],
+    history_executions: int,
+    history_note: str,
+    historical_attributes,
+    attributes: dict,
+    now: datetime,
+    weekday: str,
+    month: str,
+    is_holiday: bool,
+    summaries: dict = None
+) -> str:
+    """
+    Monta o prompt de avaliação enviado ao LLM.
+
+    Args:
+        rules (List[str]): Regras em texto livre do job
+        history_executions (int): Número de execuções do histórico
+        history_note (str): Observação sobre a seleção do histórico (vazia na estratégia padrão)
+        historical_attributes (list | dict): Histórico serializado (ou compactado em formato tabular)
+        attributes (dict): Último conjunto de metadados recebido
+        now (datetime): Data e hora do recebimento
+        weekday (str): Dia da semana do recebimento
+        month (str): Mês do recebimento
+        is_holiday (bool): Indica se o recebimento ocorreu em um feriado
+        summaries (dict, optional): Resumos diários, semanais e mensais do histórico (estratégia "summary")
+
+    Returns:
+        str: Prompt de avaliação
+    """
+    # Formatar as regras para o prompt
+    mandatory_rules = format_rules(rules)
+
+    # Histórico compactado pelo orçamento de tokens (formato tabular)
+    if isinstance(historical_attributes, dict):
+        history_note += "O histórico está em formato tabular: 'columns' lista os campos e cada item de 'rows' é uma entrega, do mais recente ao mais antigo.\n"
+
+    # Resumos de longo prazo, enviados junto com as últimas entregas
+    summaries_section = ""
+    if summaries:
+        summaries_section = (
+            "Resumo estatístico do histórico por período ('day', 'week' e 'month'), do mais recente ao mais antigo. "
+            "Cada linha traz, para um atributo, o início do período, a quantidade de entregas, a média, o desvio padrão, "
+            "o mínimo, os percentis 10, 50 e 90 e o máximo:\n"
+            f"{summaries}\n\n"
+        )
+
+    return (
+        "Contexto: Você é a maior autoridade em qualidade de dados, reconhecida por sua expertise em identificar padrões e inconsistências com precisão. "
+        "Com anos de experiência aprofundada, você domina técnicas avançadas de análise e possui um olhar crítico para avaliar a confiabilidade e a coerência dos dados em qualquer cenário.\n"
+        "Papel: Analista de qualidade de dados altamente especializada, referência na área.\n"
+        "Objetivo: Sua missão é garantir a integridade e a consistência dos metadados de arquivos enviados periodicamente. Além de validar a lógica entre os dados recedidos no último conjunto de metadados, "
+        "você analisará o histórico de metadados de remessas anteriores, aplicando, dentre outras técnicas, técnicas avançadas como: \n"
+        "- Análise Exploratória de Dados (EDA) para identificar propriedades estatísticas e padrões históricos.\n"
+        "- Detecção de Anomalias utilizando métodos estatísticos, modelagem probabilística e algoritmos de machine learning.\n"
+        "- Análise de Séries Temporais para compreender tendências, sazonalidades e variações estruturais nos metadados.\n"
+        "- Regras de Negócio e Modelos Heurísticos para identificar desvios esperados e não esperados nos dados.\n"
+        "Além disso, você deve garantir que nenhuma regra obrigatória seja violada, assegurando que os dados estejam em conformidade com os requisitos estabelecidos.\n"
+        "Entre as informações disponíveis, constam o dia da semana e o mês e de geração das remessas, também indicando se no dia da geração é um feriado. Essas variáveis são fundamentais para a análise, "
+        "pois os metadados podem variar conforme o contexto temporal. Sua avaliação deve considerar a periodicidade e essas particularidades para distinguir padrões legítimos de possíveis anomalias, "
+        "garantindo um alto padrão de qualidade e confiabilidade nos dados.\n\n"
+        "As regras abaixo são obrigatórias para a análise e resultado:\n"
+        f"{mandatory_rules}\n"
+        "\n"
+        f"{summaries_section}"
+        f"Histórico de dados das últimas {history_executions} execuções:\n{history_note}{historical_attributes}\n\n"
+        f"Último conjunto de metadados recebido: \n{attributes}\nRecebido em: {now}\nDia da semana: {weekday}\nMês: {month}\nFeriado: {is_holiday}\n\n"
+        "Saída esperada: Com base na análise, responda de forma objetiva, resumida e direta com uma das seguintes opções:\n"
+        "'true': Se o novo dado segue o mesmo padrão do histórico fornecido.\n"
+        "'false': Se o novo dado apresenta um padrão incomum dentro do histórico.\n"
+        "A resposta deve obrigatoriamente ser formatada em tipo de conterúdo JSON (Content-Type: application/json), contendo uma chave com o resultado da análise (true/false) e uma chave com a explicação resumida, "
+        f"com no máximo {EXPLAIN_MAX_CHARS} caracteres. Exemplo:\n"
+        "{\n"
+        "  \"result\": \"false\",\n"
+        "  \"explain\": \"O novo dado apresenta uma anomalia significativa em seu valor de 'max', que é consideravelmente mais alto que os valores históricos...\"\n"
+        "}\n"
+        "Retorne exclusivamente o conteúdo JSON solicitado, sem adicionar qualquer informação extra ou caracteres adicionais, pois a resposta será importada diretamente como JSON puro em outro sistema."
+    )
@@ -0,0 +1,241 @@
+import os
+import time
+import threading
+from collections import deque
+from typing import List, Optional, Set
+from sqlalchemy import insert
+from database import SessionLocal
+from models import QueryLog
+from outbox import enqueue_anomaly_notifications
+from verdict_stream import publish_verdicts
+
+# Gravação adiada (write-behind) do query_log: os registros são acumulados em memória e
+# gravados em lote, fora do caminho da requisição
+QUERY_LOG_WRITE_BEHIND = os.getenv("MONAI_QUERY_LOG_WRITE_BEHIND", "false").lower() == "true"
+QUERY_LOG_FLUSH_SIZE = int(os.getenv("MONAI_QUERY_LOG_FLUSH_SIZE", 500))  # Registros que disparam a gravação do lote
+QUERY_LOG_FLUSH_INTERVAL = float(os.getenv("MONAI_QUERY_LOG_FLUSH_INTERVAL", 1))  # Intervalo máximo (s) entre gravações
+QUERY_LOG_BUFFER_SIZE = int(os.getenv("MONAI_QUERY_LOG_BUFFER_SIZE", 10000))  # Registros pendentes antes de aplicar contrapressão
+QUERY_LOG_BUFFER_TIMEOUT = float(os.getenv("MONAI_QUERY_LOG_BUFFER_TIMEOUT", 5))  # Espera (s) por espaço no buffer cheio
+QUERY_LOG_FLUSH_MAX_ATTEMPTS = 3  # Tentativas do lote antes de gravar os registros individualmente
+
+class QueryLogBuffer:
+    """
+    Buffer em memória dos registros do query_log, gravados por uma thread em segundo plano
+    com INSERTs de múltiplas linhas quando o lote atinge QUERY_LOG_FLUSH_SIZE registros ou a
+    cada QUERY_LOG_FLUSH_INTERVAL segundos.
+
+    As notificações de anomalia (outbox) são gravadas na mesma transação do lote. Com o
+    buffer cheio, quem registra aguarda por espaço (contrapressão, que se propaga para o
+    controle de admissão); esgotado o prazo, o registro é gravado de forma síncrona.
+    """
+
+    def __init__(self, flush_size: int, flush_interval: float, max_size: int, timeout: float):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.timeout = timeout
+        self._records = deque()
+        self._unpublished = set()  # Registros notificados e publicados só ao fim do streaming da explicação
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.flushed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.backpressure_waits = 0
+        self.synchronous_fallbacks = 0
+        self.dropped = 0
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None or self._stopping:
+                return
+            self._thread = threading.Thread(target=self._run, name="monai-query-log", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Interrompe a thread de gravação e grava todos os registros pendentes. Depois disso,
+        o buffer não aceita novos registros, que passam a ser gravados de forma síncrona.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def submit(self, values: dict, publish: bool = True) -> bool:
+        """
+        Enfileira um registro do query_log. Com publish=False, as notificações de anomalia e o
+        veredicto do stream não são gerados na gravação do lote, e sim quando update_pending
+        for chamada com publish=True.
+
+        Returns:
+            bool: True se o registro foi enfileirado; False se o buffer continuou cheio
+            durante todo o prazo de espera ou já foi encerrado (o chamador deve gravá-lo
+            de forma síncrona).
+        """
+        self.start()
+        with self._condition:
+            if len(self._records) >= self.max_size and not self._stopping:
+                self.backpressure_waits += 1
+                deadline = time.monotonic() + self.timeout
+                while len(self._records) >= self.max_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.synchronous_fallbacks += 1
+                        return False
+                    self._condition.wait(remaining)
+            if self._stopping:
+                # Após o stop, nenhuma gravação pendente recolheria o registro
+                self.synchronous_fallbacks += 1
+                return False
+            self._records.append(values)
+            if not publish:
+                self._unpublished.add(values["id"])
+            if len(self._records) >= self.flush_size:
+                self._condition.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._records) < self.flush_size:
+                    self._condition.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Grava os registros pendentes em lotes de até QUERY_LOG_FLUSH_SIZE registros.
+
+        Returns:
+            int: Número de registros gravados.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._condition:
+                    batch = [self._records.popleft() for _ in range(min(self.flush_size, len(self._records)))]
+                    # Libera quem aguarda espaço no buffer
+                    self._condition.notify_all()
+                if not batch:
+                    return written
+                written += self._write_batch(batch)
+
+    def _write_batch(self, batch: List[dict]) -> int:
+        ids = {values["id"] for values in batch}
+        with self._condition:
+            unpublished = self._unpublished & ids
+            self._unpublished -= unpublished
+        for attempt in range(QUERY_LOG_FLUSH_MAX_ATTEMPTS):
+            try:
+                write_query_logs(batch, unpublished)
+                self.batches += 1
+                self.flushed += len(batch)
+                return len(batch)
+            except Exception as e:
+                self.failed_batches += 1
+                print(f"Erro ao gravar lote do query_log (tentativa {attempt + 1}): {str(e)}")
+                time.sleep(min(0.1 * 2 ** attempt, 1))
+
+        # Um registro inválido não deve impedir a gravação dos demais
+        written = 0
+        for values in batch:
+            try:
+                write_query_logs([values], unpublished)
+                written += 1
+            except Exception as e:
+                self.dropped += 1
+                print(f"Registro do query_log descartado ({values.get('id')}): {str(e)}")
+        self.flushed += written
+        return written
+
+    def update_pending(self, query_log_id, values: dict, publish: bool = False) -> bool:
+        """
+        Atualiza um registro ainda não gravado. Com publish=True, as notificações e o veredicto
+        passam a ser gerados na gravação do lote.
+
+        Returns:
+            bool: True se o registro estava no buffer.
+        """
+        with self._condition:
+            for record in self._records:
+                if record["id"] == query_log_id:
+                    record.update(values)
+                    if publish:
+                        self._unpublished.discard(query_log_id)
+                    return True
+        return False
+
+    def metrics(self) -> dict:
+        with self._condition:
+            pending = len(self._records)
+        return {
+            "enabled": QUERY_LOG_WRITE_BEHIND,
+            "pending": pending,
+            "max_size": self.max_size,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "backpressure_waits": self.backpressure_waits,
+            "synchronous_fallbacks": self.synchronous_fallbacks,
+            "dropped": self.dropped,
+        }
+
+def write_query_logs(rows: List[dict], unpublished: Set = frozenset()):
+    """
+    Grava os registros do query_log com um INSERT de múltiplas linhas, junto com as
+    notificações das anomalias, em uma única transação. Os registros em unpublished
+    (explicação ainda em streaming) não geram notificações nem eventos do stream.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(insert(QueryLog), rows)
+        published = [values for values in rows if values["id"] not in unpublished]
+        for values in published:
+            if values["result"] == "false":
+                enqueue_anomaly_notifications(db, QueryLog(**values))
+        publish_verdicts(db, published)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def update_query_log(query_log_id, publish: bool = False, **values) -> bool:
+    """
+    Atualiza um registro do query_log, esteja ele gravado ou ainda no buffer da gravação
+    adiada (ex.: a explicação concluída após a resposta em streaming). Com publish=True,
+    gera as notificações de anomalia e publica o veredicto com os valores atualizados.
+
+    Returns:
+        bool: True se o registro foi atualizado.
+    """
+    for _ in range(2):
+        if QUERY_LOG_WRITE_BEHIND and query_log_buffer.update_pending(query_log_id, values, publish):
+            return True
+        db = SessionLocal()
+        try:
+            updated = db.query(QueryLog).filter(QueryLog.id == query_log_id).update(values, synchronize_session=False)
+            if updated and publish:
+                # Na mesma transação da atualização, como na gravação do registro
+                query_log = db.get(QueryLog, query_log_id)
+                if query_log.result == "false":
+                    enqueue_anomaly_notifications(db, query_log)
+                publish_verdicts(db, [{column.name: getattr(query_log, column.name) for column in QueryLog.__table__.columns}])
+            db.commit()
+        finally:
+            db.close()
+        if updated or not QUERY_LOG_WRITE_BEHIND:
+            return bool(updated)
+        # O registro pode estar em um lote sendo gravado: aguarda a gravação e tenta novamente
+        query_log_buffer.flush()
+    return False
+
+query_log_buffer = QueryLogBuffer(QUERY_LOG_FLUSH_SIZE, QUERY_LOG_FLUSH_INTERVAL, QUERY_LOG_BUFFER_SIZE, QUERY_LOG_BUFFER_TIMEOUT)
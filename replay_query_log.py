@@ -0,0 +1,250 @@
+"""
+Reexecuta um intervalo do query_log contra um provedor/modelo (ou um stub local) para
+medir vazão, latência e concordância com os veredictos originais.
+
+O histórico de cada avaliação é reconstruído como estava no momento do recebimento
+(apenas entregas anteriores a received_at), com a estratégia de seleção e a inclusão de
+outliers registradas no query_log, permitindo validar mudanças de prompt ou de modelo
+com o tráfego real antes de colocá-las em produção. Avaliações com resultado forçado
+(force_true) não são reexecutadas.
+
+Uso:
+    python replay_query_log.py --start 2025-01-01 --end 2025-01-31 --concurrency 8
+    python replay_query_log.py --start 2025-01-01 --provider ANTHROPIC --model claude-3-5-haiku-latest
+    python replay_query_log.py --start 2025-01-01 --stub --stub-latency-ms 50
+"""
+import os
+import json
+import time
+import argparse
+import threading
+import holidays
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+from database import ReadSessionLocal
+from models import QueryLog
+from history import select_history, serialize_history, HISTORY_STRATEGY_RECENT, HISTORY_STRATEGY_STRATIFIED
+from job_rules import get_job_rules, get_job_expression_rules
+from rule_engine import evaluate_rules
+from prompts import build_evaluation_prompt, STRATUM_NOTE
+from token_budget import fit_history_to_budget
+from llm_client import initialize_llm_client, request_evaluation, structured_max_tokens
+
+MAX_TOKENS = int(os.getenv("MONAI_MAX_TOKENS", 200))
+# Estratégias cujo histórico pode ser reconstruído em uma data anterior
+REPLAYABLE_STRATEGIES = (HISTORY_STRATEGY_RECENT, HISTORY_STRATEGY_STRATIFIED)
+# Prefixo da explicação das avaliações forçadas, gravadas antes da coluna force_true ser preenchida
+FORCED_EXPLANATION_PREFIX = "Resultado forçado como 'true'"
+STRUCTURED_OUTPUT = os.getenv("MONAI_STRUCTURED_OUTPUT", "false").lower() == "true"
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """
+    Calcula o percentil (interpolação linear) de uma lista de valores.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def load_cases(start: datetime, end: Optional[datetime], job_id: Optional[str], limit: Optional[int],
+               history_strategy: Optional[str], llm_provider: str, llm_model: str) -> List[dict]:
+    """
+    Carrega as avaliações do query_log e reconstrói o prompt de cada uma com o
+    histórico existente no momento do recebimento.
+
+    Sem history_strategy, usa a estratégia registrada em cada avaliação ("recent" para
+    registros anteriores à coluna). Avaliações com estratégias que não podem ser
+    reconstruídas ("similar" e "summary") são ignoradas.
+    """
+    db = ReadSessionLocal()
+    try:
+        query = db.query(QueryLog).filter(
+            QueryLog.received_at >= start,
+            QueryLog.result.in_(["true", "false"]),
+            QueryLog.force_true == False,
+            ~QueryLog.explanation.startswith(FORCED_EXPLANATION_PREFIX)
+        )
+        if end:
+            query = query.filter(QueryLog.received_at < end)
+        if job_id:
+            query = query.filter(QueryLog.job_id == job_id)
+        query = query.order_by(QueryLog.received_at)
+        if limit:
+            query = query.limit(limit)
+
+        br_holidays = holidays.Brazil()
+        cases = []
+        for log in query.all():
+            history_size = log.monai_history_executions
+            strategy = (history_strategy or log.history_strategy or HISTORY_STRATEGY_RECENT).lower()
+            case = {"id": log.id, "job_id": log.job_id, "original": log.result, "prompt": None, "local": None}
+
+            if strategy not in REPLAYABLE_STRATEGIES:
+                case["skipped"] = True
+                cases.append(case)
+                continue
+
+            selection = select_history(
+                db,
+                log.job_id,
+                size=history_size,
+                include_outliers=log.use_historical_outlier,
+                strategy=strategy,
+                now=log.received_at,
+                attributes=log.attributes,
+                before=log.received_at
+            )
+
+            if len(selection) < history_size:
+                case["skipped"] = True
+                cases.append(case)
+                continue
+
+            violations, unevaluated_rules = evaluate_rules(get_job_expression_rules(db, log.job_id), log.attributes)
+            if violations:
+                case["local"] = "false"
+            else:
+                received_at = log.received_at
+                rules = get_job_rules(db, log.job_id) + unevaluated_rules
+                case["prompt"], _ = fit_history_to_budget(
+                    lambda history, count: build_evaluation_prompt(
+                        rules=rules,
+                        history_executions=count,
+                        history_note=STRATUM_NOTE if strategy != HISTORY_STRATEGY_RECENT else "",
+                        historical_attributes=history,
+                        attributes=log.attributes,
+                        now=received_at,
+                        weekday=received_at.strftime("%A"),
+                        month=received_at.strftime("%B"),
+                        is_holiday=received_at.date() in br_holidays
+                    ),
+                    serialize_history(selection, include_stratum=(strategy != HISTORY_STRATEGY_RECENT)),
+                    llm_provider,
+                    llm_model,
+                    completion_tokens=structured_max_tokens() if STRUCTURED_OUTPUT else MAX_TOKENS
+                )
+            cases.append(case)
+        return cases
+    finally:
+        db.close()
+
+def make_stub(result: str, latency_ms: float):
+    """
+    Cria um avaliador local com a mesma assinatura de request_evaluation, que responde
+    após a latência configurada. Com result="original", repete o veredicto original.
+    """
+    def stub(client, llm_model, llm_provider, prompt, original=None, **kwargs):
+        time.sleep(latency_ms / 1000)
+        return {"result": original if result == "original" else result, "explain": "Resposta do stub local."}
+    return stub
+
+def replay(cases: List[dict], evaluate, client, llm_model: str, llm_provider: str, concurrency: int, stub: bool) -> dict:
+    """
+    Executa as avaliações com a concorrência configurada e agrega as métricas.
+    """
+    latencies = []
+    agreements = 0
+    evaluated = 0
+    errors = 0
+    local = 0
+    usage = {}
+    lock = threading.Lock()
+
+    def run(case):
+        nonlocal agreements, evaluated, errors, local
+        if case.get("skipped"):
+            return
+        if case["local"] is not None:
+            with lock:
+                local += 1
+                evaluated += 1
+                agreements += case["local"] == case["original"]
+            return
+
+        case_usage = {}
+        started = time.perf_counter()
+        try:
+            kwargs = {"original": case["original"]} if stub else {
+                "max_tokens": MAX_TOKENS, "structured": STRUCTURED_OUTPUT, "usage": case_usage
+            }
+            evaluation = evaluate(client, llm_model, llm_provider, case["prompt"], **kwargs)
+        except Exception as e:
+            with lock:
+                errors += 1
+            print(f"Erro ao reavaliar {case['id']}: {getattr(e, 'detail', None) or str(e)}")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed_ms)
+            evaluated += 1
+            agreements += evaluation["result"] == case["original"]
+            for key, value in case_usage.items():
+                usage[key] = usage.get(key, 0) + value
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run, cases))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "cases": len(cases),
+        "skipped": sum(1 for case in cases if case.get("skipped")),
+        "evaluated": evaluated,
+        "local_rule_verdicts": local,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 3) if elapsed > 0 else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        "agreement_rate": agreements / evaluated if evaluated else None,
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Reexecuta avaliações do query_log para benchmark e regressão.")
+    parser.add_argument("--start", required=True, type=datetime.fromisoformat, help="Início do intervalo (ISO 8601).")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Fim do intervalo, exclusivo (ISO 8601).")
+    parser.add_argument("--job-id", help="Reexecuta apenas as avaliações de um job.")
+    parser.add_argument("--limit", type=int, help="Número máximo de avaliações reexecutadas.")
+    parser.add_argument("--provider", default=os.getenv("MONAI_LLM", "OPENAI"), help="Provedor do LLM.")
+    parser.add_argument("--model", default=os.getenv("MONAI_LLM_MODEL", "gpt-4"), help="Modelo do LLM.")
+    parser.add_argument("--key", help="Chave de API (padrão: MONAI_LLM_KEY).")
+    parser.add_argument("--history-strategy", choices=REPLAYABLE_STRATEGIES, help="Estratégia de seleção do histórico para todas as avaliações (padrão: a registrada em cada uma).")
+    parser.add_argument("--concurrency", type=int, default=4, help="Número de avaliações simultâneas.")
+    parser.add_argument("--stub", action="store_true", help="Usa um stub local no lugar do LLM.")
+    parser.add_argument("--stub-result", default="true", choices=["true", "false", "original"], help="Veredicto retornado pelo stub.")
+    parser.add_argument("--stub-latency-ms", type=float, default=0, help="Latência simulada pelo stub.")
+    parser.add_argument("--output", help="Arquivo JSON para gravar o relatório.")
+    args = parser.parse_args()
+
+    provider = args.provider.upper()
+    print("Reconstruindo avaliações do query_log...")
+    cases = load_cases(args.start, args.end, args.job_id, args.limit, args.history_strategy, provider, args.model)
+
+    if args.stub:
+        client, evaluate = None, make_stub(args.stub_result, args.stub_latency_ms)
+    else:
+        client, args.model, provider = initialize_llm_client(provider, args.model, args.key)
+        evaluate = request_evaluation
+
+    print(f"Reexecutando {len(cases)} avaliações com concorrência {args.concurrency}...")
+    report = replay(cases, evaluate, client, args.model, provider, args.concurrency, args.stub)
+    report.update({"provider": "STUB" if args.stub else provider, "model": None if args.stub else args.model})
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
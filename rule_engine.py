@@ -0,0 +1,179 @@
+import ast
+import operator
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from vector_index import to_number
+
+# Operadores permitidos nas expressões de regras estruturadas
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+}
+_UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+_COMPARE_OPERATORS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+_FUNCTIONS = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+}
+
+# Tamanho máximo da expressão, para evitar expressões abusivas
+MAX_EXPRESSION_LENGTH = 500
+
+class CompiledRule:
+    """
+    Expressão de regra compilada em funções Python que recebem os atributos da entrega.
+    """
+
+    def __init__(self, expression: str, evaluator: Callable[[Dict[str, float]], object], names: Tuple[str, ...]):
+        self.expression = expression
+        self.names = names
+        self._evaluator = evaluator
+
+    def evaluate(self, attributes: Optional[dict]) -> Optional[bool]:
+        """
+        Avalia a regra sobre os atributos da entrega.
+
+        Returns:
+            Optional[bool]: True/False conforme a regra, ou None quando a regra não pode ser
+            avaliada (atributo referenciado ausente ou não numérico, ou divisão por zero).
+        """
+        values = {}
+        for name in self.names:
+            number = to_number((attributes or {}).get(name))
+            if number is None:
+                return None
+            values[name] = number
+        try:
+            return bool(self._evaluator(values))
+        except ZeroDivisionError:
+            return None
+
+def _compile_node(node: ast.AST, names: set) -> Callable[[Dict[str, float]], object]:
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body, names)
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError(f"Constante não permitida na expressão: {node.value!r}")
+        value = node.value
+        return lambda values: value
+
+    if isinstance(node, ast.Name):
+        # Nomes são sempre atributos (ex.: "min" e "max"); funções só são reconhecidas em chamadas
+        name = node.id
+        names.add(name)
+        return lambda values: values[name]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        op = _BINARY_OPERATORS[type(node.op)]
+        left, right = _compile_node(node.left, names), _compile_node(node.right, names)
+        return lambda values: op(left(values), right(values))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        op = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand, names)
+        return lambda values: op(operand(values))
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile_node(value, names) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda values: all(operand(values) for operand in operands)
+        return lambda values: any(operand(values) for operand in operands)
+
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPERATORS for op in node.ops):
+        first = _compile_node(node.left, names)
+        pairs = [(_COMPARE_OPERATORS[type(op)], _compile_node(comparator, names)) for op, comparator in zip(node.ops, node.comparators)]
+
+        def compare(values):
+            left = first(values)
+            for op, comparator in pairs:
+                right = comparator(values)
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+        return compare
+
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in _FUNCTIONS
+        and node.args
+        and not node.keywords
+    ):
+        function = _FUNCTIONS[node.func.id]
+        arguments = [_compile_node(argument, names) for argument in node.args]
+        return lambda values: function(*(argument(values) for argument in arguments))
+
+    raise ValueError(f"Elemento não permitido na expressão: {type(node).__name__}")
+
+@lru_cache(maxsize=1024)
+def compile_rule_expression(expression: str) -> CompiledRule:
+    """
+    Valida e compila uma expressão de regra sobre os nomes dos atributos.
+
+    São aceitos números, nomes de atributos, operadores aritméticos (+, -, *, /, %),
+    comparações (inclusive encadeadas, ex.: "min <= avg <= max"), and/or/not e as
+    funções abs, min e max. Qualquer outro elemento é rejeitado.
+
+    Raises:
+        ValueError: Se a expressão for inválida ou contiver elementos não permitidos.
+    """
+    if not expression or not expression.strip():
+        raise ValueError("A expressão da regra está vazia.")
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"A expressão da regra excede {MAX_EXPRESSION_LENGTH} caracteres.")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Expressão de regra inválida: {e.msg}")
+
+    names = set()
+    evaluator = _compile_node(tree, names)
+    return CompiledRule(expression, evaluator, tuple(sorted(names)))
+
+def evaluate_rules(rules: List[Tuple[str, str, str]], attributes: Optional[dict]) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Avalia localmente as regras estruturadas sobre os atributos da entrega.
+
+    Uma regra cuja expressão não pode ser avaliada (atributo ausente, não numérico, lista,
+    objeto ou divisão por zero) não é considerada atendida: o seu texto é devolvido para
+    ser verificado pelo LLM. O mesmo vale para uma expressão gravada que deixou de compilar
+    (a validação ocorre apenas na criação e na atualização da regra).
+
+    Args:
+        rules (List[Tuple[str, str, str]]): Lista de (nome da regra, expressão, texto da regra)
+        attributes (dict): Atributos da entrega
+
+    Returns:
+        Tuple[List[Tuple[str, str]], List[str]]: Regras violadas, como (nome da regra, expressão),
+        e os textos das regras não avaliadas localmente
+    """
+    violations = []
+    unevaluated = []
+    for name, expression, rule_text in rules:
+        try:
+            outcome = compile_rule_expression(expression).evaluate(attributes)
+        except ValueError as e:
+            print(f"Expressão da regra '{name}' não compilou e será verificada pelo LLM: {str(e)}")
+            outcome = None
+        if outcome is False:
+            violations.append((name, expression))
+        elif outcome is None and rule_text:
+            unevaluated.append(rule_text)
+    return violations, unevaluated
@@ -0,0 +1,105 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from typing import Callable, List, Tuple
+
+# Fan-out das regras: jobs com vários grupos de regras são avaliados em sub-prompts
+# paralelos (um por grupo, com o mesmo histórico), em vez de um único prompt longo
+RULE_FANOUT = os.getenv("MONAI_RULE_FANOUT", "false").lower() == "true"
+RULE_FANOUT_MAX = int(os.getenv("MONAI_RULE_FANOUT_MAX", 4))  # Sub-prompts por avaliação; grupos excedentes são agrupados
+RULE_FANOUT_WORKERS = int(os.getenv("MONAI_RULE_FANOUT_WORKERS", 16))  # Threads das chamadas ao LLM dos sub-prompts
+
+_fanout_executor = None
+_fanout_lock = threading.Lock()
+
+class FanoutCancelled(Exception):
+    """
+    Sub-prompt interrompido porque outro sub-prompt da mesma avaliação falhou.
+    """
+
+def partition_rule_groups(groups: List[Tuple[str, List[str]]], max_fanout: int = None) -> List[Tuple[str, List[str]]]:
+    """
+    Distribui as regras dos grupos em até max_fanout sub-prompts, equilibrando o número de
+    regras de cada um (os grupos maiores são alocados primeiro no sub-prompt com menos regras).
+    Uma regra presente em mais de um grupo é enviada uma única vez.
+
+    Args:
+        groups (List[Tuple[str, List[str]]]): Nome do grupo e suas regras em texto livre
+        max_fanout (int, optional): Limite de sub-prompts (padrão: MONAI_RULE_FANOUT_MAX)
+
+    Returns:
+        List[Tuple[str, List[str]]]: Rótulo (nomes dos grupos) e regras de cada sub-prompt
+    """
+    max_fanout = max(max_fanout or RULE_FANOUT_MAX, 1)
+    seen = set()
+    unique_groups = []
+    for name, rules in groups:
+        rules = [rule for rule in rules if rule not in seen]
+        seen.update(rules)
+        if rules:
+            unique_groups.append((name, rules))
+
+    buckets = [([], []) for _ in range(min(len(unique_groups), max_fanout))]
+    for name, rules in sorted(unique_groups, key=lambda group: len(group[1]), reverse=True):
+        names, bucket_rules = min(buckets, key=lambda bucket: len(bucket[1]))
+        names.append(name)
+        bucket_rules.extend(rules)
+    return [(", ".join(names), rules) for names, rules in buckets]
+
+def evaluate_fanout(
+    prompts: List[Tuple[str, str]],
+    evaluate: Callable[[str, dict, threading.Event], dict],
+    usage: dict = None
+) -> dict:
+    """
+    Avalia os sub-prompts em paralelo e agrega os veredictos: basta um "false" para o
+    resultado ser "false". A explicação reúne as explicações dos sub-prompts que apontaram
+    a anomalia (ou de todos, quando o resultado é "true"), identificadas pelos grupos.
+
+    Args:
+        prompts (List[Tuple[str, str]]): Rótulo e texto de cada sub-prompt
+        evaluate (Callable): Avalia um prompt e acumula os tokens no dicionário informado. O
+            evento recebido é sinalizado quando outro sub-prompt falha: a função deve verificá-lo
+            antes de reservar uma vaga de chamada ao LLM e, se sinalizado, gerar FanoutCancelled
+        usage (dict, optional): Acumula os tokens de todos os sub-prompts
+
+    Raises:
+        Exception: O primeiro erro de um sub-prompt (os demais pendentes são cancelados e os
+        que já estão em execução deixam de chamar o LLM).
+    """
+    global _fanout_executor
+    with _fanout_lock:
+        if _fanout_executor is None:
+            _fanout_executor = ThreadPoolExecutor(max_workers=RULE_FANOUT_WORKERS, thread_name_prefix="monai-rule-fanout")
+
+    usages = [{} for _ in prompts]
+    cancelled = threading.Event()
+    futures = [
+        _fanout_executor.submit(evaluate, prompt, sub_usage, cancelled)
+        for (_, prompt), sub_usage in zip(prompts, usages)
+    ]
+    done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+    if pending:
+        # future.cancel() só descarta os sub-prompts que ainda não começaram
+        cancelled.set()
+        for future in pending:
+            future.cancel()
+
+    if usage is not None:
+        for sub_usage in usages:
+            for key, value in sub_usage.items():
+                usage[key] = usage.get(key, 0) + value
+
+    for future in futures:
+        if future in done and future.exception() is not None:
+            raise future.exception()
+
+    evaluations = [(label, future.result()) for (label, _), future in zip(prompts, futures)]
+    anomalies = [(label, evaluation) for label, evaluation in evaluations if evaluation["result"] != "true"]
+    result = "false" if anomalies else "true"
+    return {
+        "result": result,
+        "explain": " ".join(
+            f"[{label}] {evaluation['explain']}" for label, evaluation in (anomalies or evaluations)
+        )
+    }
@@ -0,0 +1,138 @@
+import os
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+from admission import AdmissionRejected
+
+# Escalonamento das chamadas ao LLM entre os jobs
+LLM_MAX_CONCURRENCY = int(os.getenv("MONAI_LLM_MAX_CONCURRENCY", 8))  # Chamadas simultâneas ao LLM
+JOB_MAX_CONCURRENCY = int(os.getenv("MONAI_JOB_MAX_CONCURRENCY", 4))  # Limite padrão de chamadas simultâneas por job
+SCHEDULER_TIMEOUT = float(os.getenv("MONAI_SCHEDULER_TIMEOUT", 60))  # Espera máxima (s) por uma vaga no LLM
+
+class _Ticket:
+    __slots__ = ("job_id", "max_concurrency", "granted", "cancelled")
+
+    def __init__(self, job_id: str, max_concurrency: int):
+        self.job_id = job_id
+        self.max_concurrency = max_concurrency
+        self.granted = False
+        self.cancelled = False
+
+class WeightedFairScheduler:
+    """
+    Distribui as vagas de chamada ao LLM entre os jobs por enfileiramento justo ponderado
+    (start-time fair queuing).
+
+    Cada requisição recebe uma marca de início igual ao maior valor entre o tempo virtual
+    do escalonador e a marca de término da requisição anterior do mesmo job; a marca de
+    término soma 1/peso. As vagas são concedidas em ordem crescente da marca de início,
+    de modo que um job com peso 3 recebe três vezes mais vagas que um job com peso 1
+    quando ambos têm demanda, e um job ruidoso não impede o atendimento dos demais.
+    Requisições de jobs que atingiram o limite de concorrência aguardam sem bloquear a fila.
+    """
+
+    def __init__(self, max_concurrency: int, job_max_concurrency: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.job_max_concurrency = job_max_concurrency
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._finish_tags = {}
+        self._virtual_time = 0.0
+        self._running = 0
+        self._active = defaultdict(int)
+        self._waiting = defaultdict(int)
+        self.timed_out = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    def _dispatch(self):
+        deferred = []
+        while self._running < self.max_concurrency and self._queue:
+            start_tag, sequence, ticket = heapq.heappop(self._queue)
+            if ticket.cancelled:
+                continue
+            if self._active[ticket.job_id] >= ticket.max_concurrency:
+                deferred.append((start_tag, sequence, ticket))
+                continue
+            ticket.granted = True
+            self._virtual_time = max(self._virtual_time, start_tag)
+            self._running += 1
+            self._active[ticket.job_id] += 1
+            self._waiting[ticket.job_id] -= 1
+        for item in deferred:
+            heapq.heappush(self._queue, item)
+        if not self._queue:
+            # Fila vazia: as marcas antigas não precisam mais ser lembradas
+            self._finish_tags.clear()
+        self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, job_id: str, weight: Optional[float] = None, max_concurrency: Optional[int] = None):
+        """
+        Reserva uma vaga de chamada ao LLM para o job pelo tempo do bloco.
+
+        Args:
+            job_id (str): Identificador do job
+            weight (float, optional): Peso do job (padrão: 1)
+            max_concurrency (int, optional): Limite de chamadas simultâneas do job
+
+        Raises:
+            AdmissionRejected: Se a vaga não for concedida dentro de SCHEDULER_TIMEOUT segundos.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        weight = weight if weight and weight > 0 else 1.0
+        ticket = _Ticket(job_id, max(max_concurrency or self.job_max_concurrency, 1))
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            start_tag = max(self._virtual_time, self._finish_tags.get(job_id, 0.0))
+            self._finish_tags[job_id] = start_tag + 1.0 / weight
+            self._waiting[job_id] += 1
+            heapq.heappush(self._queue, (start_tag, next(self._sequence), ticket))
+            self._dispatch()
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    ticket.cancelled = True
+                    self._waiting[job_id] -= 1
+                    self.timed_out += 1
+                    raise AdmissionRejected(503, "Tempo de espera por uma vaga no LLM esgotado.", max(1, int(self.timeout / 4)))
+                self._condition.wait(remaining)
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._active[job_id] -= 1
+                if not self._active[job_id]:
+                    del self._active[job_id]
+                if not self._waiting[job_id]:
+                    del self._waiting[job_id]
+                self._dispatch()
+
+    def metrics(self) -> dict:
+        with self._condition:
+            return {
+                "enabled": self.enabled,
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "waiting": sum(self._waiting.values()),
+                "timed_out": self.timed_out,
+                "jobs": {
+                    job_id: {"running": self._active.get(job_id, 0), "waiting": self._waiting.get(job_id, 0)}
+                    for job_id in set(self._active) | {job_id for job_id, count in self._waiting.items() if count}
+                },
+            }
+
+llm_scheduler = WeightedFairScheduler(LLM_MAX_CONCURRENCY, JOB_MAX_CONCURRENCY, SCHEDULER_TIMEOUT)
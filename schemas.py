@@ -1,16 +1,26 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Dict, List, Any
 from uuid import UUID
 from datetime import datetime
 import hashlib
+from rule_engine import compile_rule_expression
 
 # Primeiro definimos as classes base e regras
 class RuleBase(BaseModel):
     name: str = Field(..., description="Nome da regra.")
     description: Optional[str] = Field(None, description="Descrição da regra.")
     rule_text: str = Field(..., description="Texto da regra.")
+    rule_expression: Optional[str] = Field(None, description="Expressão sobre os nomes dos atributos avaliada localmente, sem o LLM (ex.: 'min <= avg <= max'). A regra só se aplica quando todos os atributos referenciados estão presentes.")
     is_active: bool = Field(True, description="Indica se a regra está ativa.")
 
+    @field_validator("rule_expression")
+    @classmethod
+    def validate_rule_expression(cls, value: Optional[str]) -> Optional[str]:
+        """Garante que a expressão da regra pode ser compilada."""
+        if value is not None:
+            compile_rule_expression(value)
+        return value
+
 class RuleCreate(RuleBase):
     pass
 
@@ -18,6 +28,7 @@ class RuleUpdate(RuleBase):
     name: Optional[str] = None
     description: Optional[str] = None
     rule_text: Optional[str] = None
+    rule_expression: Optional[str] = None
     is_active: Optional[bool] = None
 
 class Rule(RuleBase):
@@ -62,6 +73,8 @@ class JobBase(BaseModel):
     job_filename: str = Field(..., description="Nome do arquivo do job.")
     description: Optional[str] = Field(None, description="Descrição do job.")
     is_active: bool = Field(True, description="Indica se o job está ativo.")
+    priority_weight: float = Field(1.0, gt=0, description="Peso do job no escalonamento das chamadas ao LLM (jobs com peso maior recebem mais vagas).")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Número máximo de chamadas simultâneas ao LLM para o job.")
 
 class JobCreate(JobBase):
     pass
@@ -71,6 +84,7 @@ class JobUpdate(JobBase):
     job_filename: Optional[str] = None
     description: Optional[str] = None
     is_active: Optional[bool] = None
+    priority_weight: Optional[float] = Field(None, gt=0)
     rule_group_ids: Optional[List[UUID]] = None
 
 class Job(JobBase):
@@ -87,6 +101,7 @@ class JobDataCreate(BaseModel):
     job_filename: str = Field(..., description="Nome do arquivo do job.")
     attributes: Dict[str, Any] = Field(..., description="Atributos do job.")
     monai_history_executions: Optional[int] = Field(None, description="Número de execuções históricas a serem consideradas.")
+    monai_history_strategy: Optional[str] = Field(None, description="Estratégia de seleção do histórico: 'recent' (últimas execuções), 'stratified' (estratos de calendário), 'similar' (entregas semelhantes) ou 'summary' (resumos diários, semanais e mensais mais as últimas execuções).")
     use_historical_outlier: Optional[bool] = Field(False, description="Indica se deve considerar outliers no histórico.")
     force_true: Optional[bool] = Field(False, description="Indica se deve forçar o resultado como true.")
 
@@ -107,4 +122,20 @@ class JobDataResponse(BaseModel):
     month: str = Field(..., description="Mês em que o registro foi recebido (ex.: 'January', 'February').")
     is_holiday: bool = Field(..., description="Indica se o dia do registro é um feriado.")
     outlier_data: bool = Field(..., description="Indica se o registro é considerado um outlier com base na análise.")
-    use_historical_outlier: bool = Field(default=False, description="Indica se o registro foi forçado a considerar outliers no histórico.")
\ No newline at end of file
+    use_historical_outlier: bool = Field(default=False, description="Indica se o registro foi forçado a considerar outliers no histórico.")
+
+class ShadowReport(BaseModel):
+    job_id: str = Field(..., description="Identificador único do job.")
+    primary_model: str = Field(..., description="Modelo principal que respondeu às requisições.")
+    shadow_model: str = Field(..., description="Modelo secundário avaliado em modo sombra.")
+    samples: int = Field(..., description="Número de avaliações enviadas ao modelo secundário.")
+    shadow_errors: int = Field(..., description="Número de avaliações sombra que falharam.")
+    agreement_rate: Optional[float] = Field(None, description="Fração das avaliações em que os dois modelos concordaram.")
+    primary_avg_latency_ms: Optional[float] = Field(None, description="Latência média do modelo principal (ms).")
+    shadow_avg_latency_ms: Optional[float] = Field(None, description="Latência média do modelo secundário (ms).")
+    latency_delta_ms: Optional[float] = Field(None, description="Diferença de latência média (secundário - principal).")
+    primary_tokens: int = Field(..., description="Total de tokens consumidos pelo modelo principal.")
+    shadow_tokens: int = Field(..., description="Total de tokens consumidos pelo modelo secundário.")
+    primary_cost: float = Field(..., description="Custo estimado do modelo principal.")
+    shadow_cost: float = Field(..., description="Custo estimado do modelo secundário.")
+    cost_delta: float = Field(..., description="Diferença de custo (secundário - principal).")
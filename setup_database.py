@@ -1,24 +1,30 @@
 import os
 from alembic.config import Config
 from alembic import command
-from populate_rules import populate_rules
+from populate_initial_data import check_job_exists, populate_database
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
 
 def setup_database():
     """
-    Executa as migrações do banco de dados e popula as regras padrão.
+    Executa as migrações do banco de dados e popula os dados iniciais (job de exemplo e regras padrão).
+
+    As migrações também podem ser aplicadas sobre bancos criados anteriormente pelo create_all:
+    tabelas, colunas e índices já existentes são mantidos.
     """
     # Configurar o Alembic
-    alembic_cfg = Config("alembic.ini")
+    alembic_cfg = Config(ALEMBIC_INI)
     
     # Executar as migrações
     print("Executando migrações do banco de dados...")
     command.upgrade(alembic_cfg, "head")
     
     # Popular as regras
-    print("Populando regras padrão...")
-    populate_rules()
+    print("Populando dados iniciais...")
+    if not check_job_exists():
+        populate_database()
     
     print("Configuração do banco de dados concluída!")
 
 if __name__ == "__main__":
-    setup_database() 
\ No newline at end of file
+    setup_database() 
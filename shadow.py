@@ -0,0 +1,200 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import ShadowEvaluation
+from llm_client import initialize_llm_client, request_evaluation
+
+# Configuração do modo sombra: uma amostra das avaliações é reenviada a um segundo provedor/modelo
+SHADOW_LLM = os.getenv("MONAI_SHADOW_LLM")  # Provedor secundário (OPENAI, GOOGLE, ANTHROPIC)
+SHADOW_LLM_MODEL = os.getenv("MONAI_SHADOW_LLM_MODEL")  # Modelo secundário
+SHADOW_LLM_KEY = os.getenv("MONAI_SHADOW_LLM_KEY")  # Chave do provedor secundário (padrão: MONAI_LLM_KEY)
+SHADOW_SAMPLE_RATE = float(os.getenv("MONAI_SHADOW_SAMPLE_RATE", 0))  # Fração das avaliações enviadas (0 a 1)
+SHADOW_WORKERS = int(os.getenv("MONAI_SHADOW_WORKERS", 2))  # Threads dedicadas às avaliações sombra
+SHADOW_MAX_PENDING = int(os.getenv("MONAI_SHADOW_MAX_PENDING", 100))  # Avaliações sombra pendentes antes de descartar amostras
+
+# Preço por milhão de tokens (entrada/saída) usado no relatório de custo
+PRIMARY_PRICE_INPUT = float(os.getenv("MONAI_LLM_PRICE_INPUT", 0))
+PRIMARY_PRICE_OUTPUT = float(os.getenv("MONAI_LLM_PRICE_OUTPUT", 0))
+SHADOW_PRICE_INPUT = float(os.getenv("MONAI_SHADOW_LLM_PRICE_INPUT", 0))
+SHADOW_PRICE_OUTPUT = float(os.getenv("MONAI_SHADOW_LLM_PRICE_OUTPUT", 0))
+
+_executor = None
+_shadow_client = None
+_pending = threading.BoundedSemaphore(max(SHADOW_MAX_PENDING, 1))
+_lock = threading.Lock()
+
+def shadow_enabled() -> bool:
+    return bool(SHADOW_LLM and SHADOW_LLM_MODEL and SHADOW_SAMPLE_RATE > 0)
+
+def _get_shadow_client():
+    global _executor, _shadow_client
+    with _lock:
+        if _shadow_client is None:
+            _shadow_client = initialize_llm_client(SHADOW_LLM, SHADOW_LLM_MODEL, SHADOW_LLM_KEY)
+            _executor = ThreadPoolExecutor(max_workers=SHADOW_WORKERS, thread_name_prefix="monai-shadow")
+        return _shadow_client
+
+def submit_shadow_evaluation(
+    prompt: str,
+    job_id: str,
+    query_log_id,
+    received_at: datetime,
+    primary_provider: str,
+    primary_model: str,
+    primary_result: str,
+    primary_latency_ms: float,
+    primary_usage: dict,
+    max_tokens: int,
+    structured: bool
+) -> bool:
+    """
+    Envia, em segundo plano, uma amostra da avaliação ao provedor/modelo secundário.
+
+    A resposta da requisição original não é afetada: a chamada retorna imediatamente e
+    descarta a amostra quando o modo sombra está desativado, fora da amostragem ou
+    quando há avaliações sombra pendentes demais.
+
+    Returns:
+        bool: True se a avaliação sombra foi agendada.
+    """
+    if not shadow_enabled() or random.random() >= SHADOW_SAMPLE_RATE:
+        return False
+    if not _pending.acquire(blocking=False):
+        return False
+
+    try:
+        client, model, provider = _get_shadow_client()
+        _executor.submit(
+            _run_shadow_evaluation, client, model, provider, prompt, job_id, query_log_id, received_at,
+            primary_provider, primary_model, primary_result, primary_latency_ms, primary_usage,
+            max_tokens, structured
+        )
+    except Exception as e:
+        _pending.release()
+        print(f"Erro ao agendar avaliação sombra: {str(e)}")
+        return False
+    return True
+
+def _run_shadow_evaluation(
+    client, model, provider, prompt, job_id, query_log_id, received_at,
+    primary_provider, primary_model, primary_result, primary_latency_ms, primary_usage,
+    max_tokens, structured
+):
+    usage = {}
+    shadow_result = shadow_explanation = shadow_error = None
+    started = time.perf_counter()
+    try:
+        evaluation = request_evaluation(
+            client, model, provider, prompt,
+            max_tokens=max_tokens, structured=structured, usage=usage
+        )
+        shadow_result = evaluation["result"]
+        shadow_explanation = evaluation["explain"]
+    except Exception as e:
+        shadow_error = getattr(e, "detail", None) or str(e)
+    shadow_latency_ms = (time.perf_counter() - started) * 1000
+
+    db = SessionLocal()
+    try:
+        db.add(ShadowEvaluation(
+            job_id=job_id,
+            query_log_id=query_log_id,
+            received_at=received_at,
+            primary_provider=primary_provider,
+            primary_model=primary_model,
+            primary_result=primary_result,
+            primary_latency_ms=primary_latency_ms,
+            primary_prompt_tokens=primary_usage.get("prompt_tokens"),
+            primary_completion_tokens=primary_usage.get("completion_tokens"),
+            shadow_provider=provider,
+            shadow_model=model,
+            shadow_result=shadow_result,
+            shadow_explanation=shadow_explanation,
+            shadow_latency_ms=shadow_latency_ms,
+            shadow_prompt_tokens=usage.get("prompt_tokens"),
+            shadow_completion_tokens=usage.get("completion_tokens"),
+            shadow_error=shadow_error,
+            agreement=(shadow_result == primary_result) if shadow_result is not None else None
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Erro ao registrar avaliação sombra: {str(e)}")
+    finally:
+        db.close()
+        _pending.release()
+
+def _cost(prompt_tokens, completion_tokens, price_input, price_output) -> float:
+    return ((prompt_tokens or 0) * price_input + (completion_tokens or 0) * price_output) / 1_000_000
+
+def shadow_report(db: Session, job_id: Optional[str] = None, since: Optional[datetime] = None) -> List[dict]:
+    """
+    Agrega as avaliações sombra por job: taxa de concordância e diferenças de latência e custo
+    entre o modelo principal e o secundário.
+
+    Args:
+        db (Session): Sessão do banco de dados
+        job_id (str, optional): Filtra por um job específico
+        since (datetime, optional): Considera apenas avaliações recebidas a partir desta data
+
+    Returns:
+        List[dict]: Uma entrada por job com as métricas comparativas
+    """
+    query = db.query(
+        ShadowEvaluation.job_id,
+        ShadowEvaluation.primary_model,
+        ShadowEvaluation.shadow_model,
+        func.count(ShadowEvaluation.id),
+        func.count(ShadowEvaluation.shadow_result),
+        func.sum(case((ShadowEvaluation.agreement == True, 1), else_=0)),
+        func.avg(ShadowEvaluation.primary_latency_ms),
+        func.avg(ShadowEvaluation.shadow_latency_ms),
+        func.sum(ShadowEvaluation.primary_prompt_tokens),
+        func.sum(ShadowEvaluation.primary_completion_tokens),
+        func.sum(ShadowEvaluation.shadow_prompt_tokens),
+        func.sum(ShadowEvaluation.shadow_completion_tokens),
+    )
+    if job_id:
+        query = query.filter(ShadowEvaluation.job_id == job_id)
+    if since:
+        query = query.filter(ShadowEvaluation.received_at >= since)
+    rows = query.group_by(
+        ShadowEvaluation.job_id, ShadowEvaluation.primary_model, ShadowEvaluation.shadow_model
+    ).all()
+
+    # Amostras respondidas pelo modelo rápido da cascata usam o preço dele (importação local:
+    # o módulo cascade importa os preços do modelo principal deste módulo)
+    from cascade import CASCADE_LLM_MODEL, CASCADE_PRICE_INPUT, CASCADE_PRICE_OUTPUT
+
+    report = []
+    for (row_job_id, primary_model, shadow_model, samples, answered, agreements,
+         primary_latency, shadow_latency, primary_in, primary_out, shadow_in, shadow_out) in rows:
+        if CASCADE_LLM_MODEL and primary_model == CASCADE_LLM_MODEL:
+            primary_cost = _cost(primary_in, primary_out, CASCADE_PRICE_INPUT, CASCADE_PRICE_OUTPUT)
+        else:
+            primary_cost = _cost(primary_in, primary_out, PRIMARY_PRICE_INPUT, PRIMARY_PRICE_OUTPUT)
+        shadow_cost = _cost(shadow_in, shadow_out, SHADOW_PRICE_INPUT, SHADOW_PRICE_OUTPUT)
+        report.append({
+            "job_id": row_job_id,
+            "primary_model": primary_model,
+            "shadow_model": shadow_model,
+            "samples": samples,
+            "shadow_errors": samples - answered,
+            "agreement_rate": (agreements or 0) / answered if answered else None,
+            "primary_avg_latency_ms": primary_latency,
+            "shadow_avg_latency_ms": shadow_latency,
+            "latency_delta_ms": (shadow_latency - primary_latency) if shadow_latency is not None and primary_latency is not None else None,
+            "primary_tokens": (primary_in or 0) + (primary_out or 0),
+            "shadow_tokens": (shadow_in or 0) + (shadow_out or 0),
+            "primary_cost": primary_cost,
+            "shadow_cost": shadow_cost,
+            "cost_delta": shadow_cost - primary_cost,
+        })
+    return report
@@ -1,9 +1,10 @@
 #!/bin/bash
 
-# Executa o script de população de dados
-echo "Verificando e populando dados iniciais..."
-python populate_initial_data.py
+# Executa as migrações do banco de dados e popula os dados iniciais
+echo "Executando migrações e populando dados iniciais..."
+python setup_database.py || exit 1
 
 # Inicia a aplicação FastAPI
 echo "Iniciando a aplicação FastAPI..."
-exec uvicorn main:app --host 0.0.0.0 --port 8000 
\ No newline at end of file
+# Streams SSE abertos (/api/v1/verdicts/stream/) são encerrados após o prazo de desligamento
+exec uvicorn main:app --host 0.0.0.0 --port 8000 --timeout-graceful-shutdown 10
\ No newline at end of file
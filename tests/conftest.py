@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+# Os módulos da aplicação leem a configuração ao serem importados: os testes usam um
+# SQLite embarcado temporário, sem réplica, e nenhuma chamada real chega ao LLM
+os.environ.setdefault("MONAI_LLM", "OPENAI")
+os.environ.setdefault("MONAI_LLM_KEY", "test-key")
+os.environ.setdefault("MONAI_SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="monai-tests-"), "monai.db"))
+os.environ.pop("MONAI_DATABASE_URL", None)
+os.environ.pop("MONAI_DATABASE_REPLICA_URL", None)
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+from database import create_database_engine
+from models import Base
+
+@pytest.fixture
+def db():
+    """
+    Sessão de um banco SQLite em memória com todas as tabelas criadas.
+    """
+    test_engine = create_database_engine("sqlite://")
+    Base.metadata.create_all(bind=test_engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        test_engine.dispose()
@@ -0,0 +1,56 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+def _create_rule(client, name="Linhas positivas"):
+    response = client.post("/api/v1/rules/", json={"name": name, "rule_text": "O número de linhas deve ser positivo."})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def test_unchanged_rule_returns_304(client):
+    rule_id = _create_rule(client)
+    first = client.get(f"/api/v1/rules/{rule_id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = client.get(f"/api/v1/rules/{rule_id}", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+
+def test_updated_rule_returns_200_with_new_etag(client):
+    rule_id = _create_rule(client)
+    etag = client.get(f"/api/v1/rules/{rule_id}").headers["ETag"]
+
+    assert client.put(f"/api/v1/rules/{rule_id}", json={"description": "Atualizada"}).status_code == 200
+
+    response = client.get(f"/api/v1/rules/{rule_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["description"] == "Atualizada"
+    assert response.headers["ETag"] != etag
+
+def test_deleted_rule_returns_404_not_304(client):
+    rule_id = _create_rule(client)
+    etag = client.get(f"/api/v1/rules/{rule_id}").headers["ETag"]
+
+    assert client.delete(f"/api/v1/rules/{rule_id}").status_code == 200
+
+    response = client.get(f"/api/v1/rules/{rule_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+    # A versão do catálogo após a exclusão também não pode validar um item inexistente
+    current = client.get("/api/v1/rules/").headers["ETag"]
+    response = client.get(f"/api/v1/rules/{rule_id}", headers={"If-None-Match": current})
+    assert response.status_code == 404
+
+def test_list_returns_304_until_catalog_changes(client):
+    etag = client.get("/api/v1/rules/").headers["ETag"]
+    assert client.get("/api/v1/rules/", headers={"If-None-Match": etag}).status_code == 304
+
+    _create_rule(client, name="Outra regra")
+    response = client.get("/api/v1/rules/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
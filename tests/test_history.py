@@ -0,0 +1,43 @@
+import uuid
+from datetime import datetime, timedelta
+from history import select_history, STRATUM_RECENT
+from models import Job, JobData
+
+def _add_deliveries(db, job_id, attributes_list, start):
+    db.add(Job(id=job_id, job_name="job", job_filename="arquivo.csv"))
+    for i, attributes in enumerate(attributes_list):
+        received_at = start + timedelta(days=i)
+        db.add(JobData(
+            job_id=job_id, job_name="job", job_filename="arquivo.csv", attributes=attributes,
+            received_at=received_at, weekday=received_at.strftime("%A"), month=received_at.strftime("%B"),
+            outlier_data=False
+        ))
+    db.commit()
+
+def test_similar_fills_window_with_recent_rows_for_text_only_job(db):
+    job_id = uuid.uuid4().hex
+    start = datetime(2026, 1, 1)
+    _add_deliveries(db, job_id, [{"status": f"ok-{i}", "origem": "sftp"} for i in range(10)], start)
+
+    selection = select_history(
+        db, job_id, size=6, include_outliers=False, strategy="similar",
+        now=start + timedelta(days=10), attributes={"status": "ok", "origem": "sftp"}
+    )
+
+    assert len(selection) == 6
+    assert len({row.id for row, _ in selection}) == 6
+    assert all(stratum == STRATUM_RECENT for _, stratum in selection)
+    # A janela é completada com as entregas mais recentes, da mais nova à mais antiga
+    assert [row.attributes["status"] for row, _ in selection] == [f"ok-{i}" for i in range(9, 3, -1)]
+
+def test_similar_returns_all_rows_when_job_has_fewer_than_window(db):
+    job_id = uuid.uuid4().hex
+    start = datetime(2026, 1, 1)
+    _add_deliveries(db, job_id, [{"status": "ok"} for _ in range(3)], start)
+
+    selection = select_history(
+        db, job_id, size=6, include_outliers=False, strategy="similar",
+        now=start + timedelta(days=3), attributes={"status": "ok"}
+    )
+
+    assert len(selection) == 3
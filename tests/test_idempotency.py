@@ -0,0 +1,72 @@
+import uuid
+from contextlib import asynccontextmanager
+import pytest
+from fastapi.testclient import TestClient
+import main
+from admission import admission, AdmissionRejected
+
+class _SaturatedAdmission:
+    deferred = 0
+
+    @asynccontextmanager
+    async def slot(self, job_key=None):
+        raise AdmissionRejected(503, "Tempo de espera na fila de avaliação esgotado.", 1)
+        yield
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+def _payload():
+    return {"job_name": f"job-{uuid.uuid4().hex}", "job_filename": "arquivo.csv", "attributes": {"rows": 10}}
+
+def _fake_evaluation(calls):
+    def evaluate(job_data, request, db, read_db, raise_on_anomaly=True):
+        calls.append(job_data.job_name)
+        request.state.delivery_recorded = True
+        return {"result": "true", "explanation": "Dentro do padrão."}
+    return evaluate
+
+def test_deferred_response_is_not_replayed(client, monkeypatch):
+    payload = _payload()
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    monkeypatch.setattr(main, "admission", _SaturatedAdmission())
+    monkeypatch.setattr(main, "ADMISSION_DEFER", True)
+
+    deferred = client.post("/api/v1/jobs/data/", json=payload, headers=headers)
+    assert deferred.status_code == 202
+    assert deferred.json()["result"] == "deferred"
+
+    # Com a capacidade restabelecida, a mesma chave é avaliada em vez de reproduzir o 202
+    calls = []
+    monkeypatch.setattr(main, "admission", admission)
+    monkeypatch.setattr(main, "evaluate_job_data", _fake_evaluation(calls))
+    evaluated = client.post("/api/v1/jobs/data/", json=payload, headers=headers)
+    assert evaluated.status_code == 200
+    assert evaluated.json()["result"] == "true"
+    assert "Idempotent-Replayed" not in evaluated.headers
+    assert calls == [payload["job_name"]]
+
+    # A resposta final passa a ser reproduzida
+    replayed = client.post("/api/v1/jobs/data/", json=payload, headers=headers)
+    assert replayed.status_code == 200
+    assert replayed.json() == evaluated.json()
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert calls == [payload["job_name"]]
+
+def test_rejected_response_releases_key(client, monkeypatch):
+    payload = _payload()
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    monkeypatch.setattr(main, "admission", _SaturatedAdmission())
+    monkeypatch.setattr(main, "ADMISSION_DEFER", False)
+
+    rejected = client.post("/api/v1/jobs/data/", json=payload, headers=headers)
+    assert rejected.status_code == 503
+    assert "Retry-After" in rejected.headers
+
+    calls = []
+    monkeypatch.setattr(main, "admission", admission)
+    monkeypatch.setattr(main, "evaluate_job_data", _fake_evaluation(calls))
+    assert client.post("/api/v1/jobs/data/", json=payload, headers=headers).status_code == 200
+    assert calls == [payload["job_name"]]
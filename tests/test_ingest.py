@@ -0,0 +1,107 @@
+import asyncio
+import gzip
+import json
+import pytest
+import ingest
+from ingest import IngestError, ingest_records
+from schemas import JobDataCreate
+
+msgpack = pytest.importorskip("msgpack")
+
+def _record(i, **attributes):
+    return {"job_name": f"job-{i % 2}", "job_filename": "arquivo.csv", "attributes": {"rows": i, **attributes}}
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def _collect(data: bytes, content_type: str, content_encoding: str = None, size: int = 7):
+    async def run():
+        items, error = [], None
+        try:
+            async for item in ingest_records(_chunks(data, size), content_type, content_encoding):
+                items.append(item)
+        except IngestError as e:
+            error = e
+        return items, error
+    return asyncio.run(run())
+
+def _ndjson(records) -> bytes:
+    return b"".join(json.dumps(record).encode() + b"\n" for record in records)
+
+def test_ndjson_over_gzip():
+    records = [_record(i) for i in range(5)]
+    # Dois membros gzip concatenados, com uma linha inválida e uma linha vazia no meio
+    body = gzip.compress(_ndjson(records[:3]) + b"\n{\"job_name\": 1}\n") + gzip.compress(_ndjson(records[3:]).rstrip(b"\n"))
+
+    items, error = _collect(body, "application/x-ndjson; charset=utf-8", "gzip")
+
+    assert error is None
+    assert [index for index, _ in items] == [0, 1, 2, 3, 4, 5]
+    assert isinstance(items[3][1], str)
+    valid = [record for _, record in items if isinstance(record, JobDataCreate)]
+    assert [record.attributes["rows"] for record in valid] == [0, 1, 2, 3, 4]
+
+def test_invalid_gzip_is_rejected():
+    items, error = _collect(b"isto nao e gzip", "application/x-ndjson", "gzip")
+    assert error.status_code == 400
+
+def test_msgpack_records():
+    records = [_record(i) for i in range(4)]
+    body = b"".join(msgpack.packb(record) for record in records[:2]) + msgpack.packb({"job_name": "x"}) + msgpack.packb(records[2])
+
+    items, error = _collect(body, "application/msgpack", size=5)
+
+    assert error is None
+    assert [index for index, _ in items] == [0, 1, 2, 3]
+    assert isinstance(items[2][1], str)
+    assert [record.attributes["rows"] for _, record in items if not isinstance(record, str)] == [0, 1, 2]
+
+def test_msgpack_oversize_record(monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_MAX_RECORD_BYTES", 64)
+    monkeypatch.setattr(ingest, "DECOMPRESS_CHUNK_SIZE", 16)
+    body = msgpack.packb(_record(0)) + msgpack.packb(_record(1, payload="x" * 500))
+
+    items, error = _collect(body, "application/msgpack", size=16)
+
+    assert error.status_code == 413
+    assert [index for index, _ in items] == [0]
+
+def test_ndjson_oversize_line_is_a_record_error(monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_MAX_RECORD_BYTES", 120)
+    body = _ndjson([_record(0), _record(1, payload="x" * 200), _record(2)])
+
+    items, error = _collect(body, "application/x-ndjson", size=len(body))
+
+    assert error is None
+    assert [index for index, _ in items] == [0, 1, 2]
+    assert "excede" in items[1][1]
+
+def test_ndjson_oversize_trailing_record(monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_MAX_RECORD_BYTES", 120)
+    # O mesmo bloco traz um registro completo e o início de um registro grande, sem quebra de linha
+    body = _ndjson([_record(0)]) + json.dumps(_record(1, payload="x" * 200)).encode()
+
+    items, error = _collect(body, "application/x-ndjson", size=len(body))
+
+    assert error.status_code == 413
+    assert [index for index, _ in items] == [0]
+
+def test_ndjson_oversize_record_without_newline(monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_MAX_RECORD_BYTES", 120)
+    body = json.dumps(_record(0, payload="x" * 200)).encode()
+
+    items, error = _collect(body, "application/x-ndjson", size=50)
+
+    assert error.status_code == 413
+    assert items == []
+
+@pytest.mark.parametrize("content_type, content_encoding", [
+    ("application/json", None),
+    (None, None),
+    ("application/x-ndjson", "br"),
+])
+def test_unsupported_body_is_rejected(content_type, content_encoding):
+    with pytest.raises(IngestError) as rejected:
+        ingest_records(_chunks(b"", 1), content_type, content_encoding)
+    assert rejected.value.status_code == 415
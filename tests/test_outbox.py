@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from sqlalchemy.orm import sessionmaker
+import outbox
+from models import NotificationOutbox
+
+@pytest.fixture
+def outbox_db(db, monkeypatch):
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    monkeypatch.setattr(outbox, "SessionLocal", factory)
+    for i in range(3):
+        db.add(NotificationOutbox(
+            endpoint="http://webhook.test/monai", dedup_key=f"evento-{i}", job_id="job",
+            payload={"event_id": f"evento-{i}"}, next_attempt_at=datetime.now() - timedelta(seconds=1)
+        ))
+    db.commit()
+    return factory
+
+def test_post_happens_after_claim_is_committed(outbox_db):
+    seen = []
+
+    def handler(request):
+        # Durante o POST, a reserva já está confirmada e visível para outra sessão
+        with outbox_db() as other:
+            seen.extend((row.status, row.attempts, row.next_attempt_at > datetime.now()) for row in other.query(NotificationOutbox))
+        return httpx.Response(200)
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as http_client:
+        assert outbox.dispatch_pending(http_client) == 3
+
+    assert seen == [("pending", 1, True)] * 3
+    with outbox_db() as session:
+        assert {(row.status, row.attempts) for row in session.query(NotificationOutbox)} == {("sent", 1)}
+
+def test_failed_post_schedules_retry_then_fails(outbox_db, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(outbox, "OUTBOX_BACKOFF_BASE", 0)
+
+    with httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(500))) as http_client:
+        assert outbox.dispatch_pending(http_client) == 0
+        with outbox_db() as session:
+            rows = session.query(NotificationOutbox).all()
+            assert {(row.status, row.attempts) for row in rows} == {("pending", 1)}
+            assert all(row.last_error for row in rows)
+
+        assert outbox.dispatch_pending(http_client) == 0
+
+    with outbox_db() as session:
+        assert {(row.status, row.attempts) for row in session.query(NotificationOutbox)} == {("failed", 2)}
@@ -0,0 +1,88 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+import pytest
+import main
+import query_log_buffer as buffer_module
+from models import Job, QueryLog
+from query_log_buffer import QueryLogBuffer
+
+@pytest.fixture
+def written(monkeypatch):
+    batches = []
+    monkeypatch.setattr(buffer_module, "write_query_logs", lambda rows, unpublished=frozenset(): batches.append((list(rows), set(unpublished))))
+    return batches
+
+@pytest.fixture
+def buffer():
+    query_log_buffer = QueryLogBuffer(flush_size=100, flush_interval=60, max_size=2, timeout=0.05)
+    yield query_log_buffer
+    query_log_buffer.stop()
+
+def _values(**extra):
+    return dict(id=uuid.uuid4(), result="true", explanation="ok", **extra)
+
+def test_backpressure_falls_back_when_buffer_stays_full(buffer, written):
+    assert buffer.submit(_values())
+    assert buffer.submit(_values())
+    assert buffer.submit(_values()) is False
+    assert buffer.metrics()["backpressure_waits"] == 1
+    assert buffer.metrics()["synchronous_fallbacks"] == 1
+
+def test_backpressure_waits_for_flush(buffer, written):
+    buffer.timeout = 2
+    buffer.submit(_values())
+    buffer.submit(_values())
+    accepted = []
+    waiting = threading.Thread(target=lambda: accepted.append(buffer.submit(_values())))
+    waiting.start()
+    while not buffer.metrics()["backpressure_waits"]:
+        time.sleep(0.005)
+
+    assert buffer.flush() >= 2
+    waiting.join(2)
+    assert accepted == [True]
+    assert buffer.metrics()["synchronous_fallbacks"] == 0
+
+def test_submit_after_stop_is_rejected(buffer, written):
+    values = _values()
+    assert buffer.submit(values)
+    buffer.stop()
+    assert [row["id"] for row in written[0][0]] == [values["id"]]
+
+    assert buffer.submit(_values()) is False
+    assert buffer._thread is None
+    assert buffer.metrics()["pending"] == 0
+
+def test_update_pending_with_publish(buffer, written):
+    streamed, other = _values(), _values()
+    buffer.submit(streamed, publish=False)
+    buffer.submit(other, publish=False)
+
+    assert buffer.update_pending(streamed["id"], {"explanation": "completa"}, publish=True)
+    assert buffer.update_pending(other["id"], {"prompt_tokens": 10})
+    assert buffer.update_pending(uuid.uuid4(), {"explanation": "x"}, publish=True) is False
+    buffer.flush()
+
+    rows, unpublished = written[0]
+    assert {row["id"]: row["explanation"] for row in rows}[streamed["id"]] == "completa"
+    # Só o registro ainda em streaming deixa de gerar notificações e eventos
+    assert unpublished == {other["id"]}
+
+def test_log_query_writes_synchronously_after_stop(db, monkeypatch):
+    stopped = QueryLogBuffer(flush_size=100, flush_interval=60, max_size=10, timeout=0.05)
+    stopped.stop()
+    monkeypatch.setattr(main, "QUERY_LOG_WRITE_BEHIND", True)
+    monkeypatch.setattr(main, "query_log_buffer", stopped)
+    db.add(Job(id="job", job_name="job", job_filename="arquivo.csv"))
+    db.commit()
+
+    query_log = main.log_query(
+        db=db, job_id="job", job_name="job", job_filename="arquivo.csv", attributes={"rows": 1},
+        result="true", explanation="ok", ip_address="127.0.0.1", user_agent="pytest", referer="unknown",
+        received_at=datetime(2026, 1, 1), monai_history_executions=30
+    )
+
+    assert db.query(QueryLog).filter(QueryLog.id == query_log.id).count() == 1
+    assert stopped.metrics()["synchronous_fallbacks"] == 1
@@ -0,0 +1,85 @@
+import pytest
+from rule_engine import compile_rule_expression, evaluate_rules
+
+@pytest.mark.parametrize("expression, attributes, expected", [
+    ("min <= avg <= max", {"min": 1, "avg": 2, "max": 3}, True),
+    ("min <= avg <= max", {"min": 1, "avg": 5, "max": 3}, False),
+    ("std < max - min", {"std": 1, "max": 10, "min": 2}, True),
+    ("count % 2 == 0", {"count": 7}, False),
+    ("abs(delta) <= 0.5 * limit", {"delta": -1, "limit": 4}, True),
+    ("max(a, b) > 10 or not c", {"a": 1, "b": 2, "c": 0}, True),
+    ("-total < 0 and +total > 0", {"total": 3}, True),
+    ("total > 0", {"total": "12.5"}, True),
+])
+def test_evaluate(expression, attributes, expected):
+    assert compile_rule_expression(expression).evaluate(attributes) is expected
+
+def test_function_names_are_attributes_outside_calls():
+    rule = compile_rule_expression("min <= max")
+    assert rule.names == ("max", "min")
+    assert rule.evaluate({"min": 1, "max": 2}) is True
+
+@pytest.mark.parametrize("attributes", [
+    None,
+    {},
+    {"percentiles": [10, 20, 30]},
+    {"percentiles": {"p50": 10}},
+    {"percentiles": "n/a"},
+    {"percentiles": True},
+    {"percentiles": None},
+    {"percentiles": float("nan")},
+])
+def test_unevaluable_attributes_return_none(attributes):
+    assert compile_rule_expression("percentiles > 0").evaluate(attributes) is None
+
+def test_division_by_zero_returns_none():
+    assert compile_rule_expression("total / count > 1").evaluate({"total": 1, "count": 0}) is None
+
+@pytest.mark.parametrize("expression", [
+    "",
+    "   ",
+    "x >",
+    "__import__('os')",
+    "x.real > 0",
+    "x[0] > 0",
+    "x ** 2 > 4",
+    "x // 2 > 1",
+    "'a' == x",
+    "True",
+    "x in (1, 2)",
+    "x is None",
+    "round(x) > 1",
+    "max() > 1",
+    "max(x, key=y) > 1",
+    "lambda: x",
+    "[x for x in y]",
+    "x if y else z",
+    "x > " + "1 + " * 200 + "1",
+])
+def test_rejected_expressions(expression):
+    with pytest.raises(ValueError):
+        compile_rule_expression(expression)
+
+def test_evaluate_rules_splits_violations_and_unevaluated():
+    rules = [
+        ("Média entre extremos", "min <= avg <= max", "A média deve estar entre o mínimo e o máximo."),
+        ("Percentis positivos", "percentiles > 0", "Os percentis devem ser maiores que zero."),
+        ("Desvio", "std < max - min", "O desvio deve ser menor que a amplitude."),
+    ]
+    attributes = {"min": 1, "avg": 5, "max": 3, "std": 1, "percentiles": [1, 2]}
+    violations, unevaluated = evaluate_rules(rules, attributes)
+    assert violations == [("Média entre extremos", "min <= avg <= max")]
+    assert unevaluated == ["Os percentis devem ser maiores que zero."]
+
+def test_evaluate_rules_all_satisfied():
+    violations, unevaluated = evaluate_rules([("Positivo", "x > 0", "x deve ser positivo.")], {"x": 1})
+    assert violations == [] and unevaluated == []
+
+def test_evaluate_rules_stored_expression_that_no_longer_compiles():
+    rules = [
+        ("Legada", "__import__('os')", "A regra legada deve ser verificada pelo LLM."),
+        ("Positivo", "x > 0", "x deve ser positivo."),
+    ]
+    violations, unevaluated = evaluate_rules(rules, {"x": -1})
+    assert violations == [("Positivo", "x > 0")]
+    assert unevaluated == ["A regra legada deve ser verificada pelo LLM."]
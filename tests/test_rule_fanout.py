@@ -0,0 +1,76 @@
+import threading
+import time
+import pytest
+from rule_fanout import FanoutCancelled, evaluate_fanout, partition_rule_groups
+
+def test_partition_balances_rules_across_buckets():
+    groups = [
+        ("Financeiro", ["f1", "f2", "f3", "f4"]),
+        ("Estoque", ["e1", "e2"]),
+        ("Cadastro", ["c1", "c2"]),
+        ("Fiscal", ["x1"]),
+    ]
+    buckets = partition_rule_groups(groups, max_fanout=2)
+    # Os grupos maiores são alocados primeiro, sempre no sub-prompt com menos regras
+    assert buckets == [("Financeiro, Fiscal", ["f1", "f2", "f3", "f4", "x1"]), ("Estoque, Cadastro", ["e1", "e2", "c1", "c2"])]
+
+def test_partition_sends_shared_rules_once_and_drops_empty_groups():
+    groups = [("A", ["comum", "a1"]), ("B", ["comum"]), ("C", ["c1", "comum"])]
+    buckets = partition_rule_groups(groups, max_fanout=4)
+    assert sorted(buckets) == [("A", ["comum", "a1"]), ("C", ["c1"])]
+    assert sum(len(rules) for _, rules in buckets) == 3
+
+def test_partition_single_group_and_no_groups():
+    assert partition_rule_groups([("A", ["a1", "a2"])], max_fanout=4) == [("A", ["a1", "a2"])]
+    assert partition_rule_groups([], max_fanout=4) == []
+
+def _evaluator(results):
+    def evaluate(prompt, usage, cancelled):
+        usage["prompt_tokens"] = 10
+        usage["completion_tokens"] = 2
+        return results[prompt]
+    return evaluate
+
+def test_any_false_wins_and_explanations_are_labelled():
+    results = {
+        "p1": {"result": "true", "explain": "Sem problemas."},
+        "p2": {"result": "false", "explain": "Total fora do padrão."},
+        "p3": {"result": "false", "explain": "Data inválida."},
+    }
+    usage = {}
+    evaluation = evaluate_fanout([("Financeiro", "p1"), ("Estoque", "p2"), ("Fiscal, Cadastro", "p3")], _evaluator(results), usage)
+
+    assert evaluation == {"result": "false", "explain": "[Estoque] Total fora do padrão. [Fiscal, Cadastro] Data inválida."}
+    assert usage == {"prompt_tokens": 30, "completion_tokens": 6}
+
+def test_all_true_reports_every_group():
+    results = {"p1": {"result": "true", "explain": "Ok 1."}, "p2": {"result": "true", "explain": "Ok 2."}}
+    evaluation = evaluate_fanout([("A", "p1"), ("B", "p2")], _evaluator(results))
+    assert evaluation == {"result": "true", "explain": "[A] Ok 1. [B] Ok 2."}
+
+def test_failure_cancels_running_sub_prompts():
+    calls = []
+    finished = threading.Event()
+    started = threading.Barrier(3, timeout=2)
+
+    def evaluate(prompt, usage, cancelled):
+        started.wait()
+        if prompt == "falha":
+            raise RuntimeError("erro no LLM")
+        # Os demais sub-prompts aguardam uma vaga; ao recebê-la, verificam o cancelamento
+        cancelled.wait(2)
+        try:
+            if cancelled.is_set():
+                raise FanoutCancelled()
+            calls.append(prompt)
+            return {"result": "true", "explain": "Ok."}
+        finally:
+            if prompt == "lento-2":
+                finished.set()
+
+    with pytest.raises(RuntimeError, match="erro no LLM"):
+        evaluate_fanout([("A", "lento-1"), ("B", "falha"), ("C", "lento-2")], evaluate)
+
+    assert finished.wait(2)
+    time.sleep(0.05)
+    assert calls == []
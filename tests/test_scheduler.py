@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+import pytest
+from admission import AdmissionController, AdmissionRejected
+from scheduler import WeightedFairScheduler
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida a tempo"
+        time.sleep(0.005)
+
+def _holder(scheduler, job_id, release, **kwargs):
+    held = threading.Event()
+
+    def run():
+        with scheduler.slot(job_id, **kwargs):
+            held.set()
+            release.wait(2)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert held.wait(2)
+    return thread
+
+def test_weighted_fair_ordering():
+    scheduler = WeightedFairScheduler(max_concurrency=1, job_max_concurrency=4, timeout=5)
+    release = threading.Event()
+    holder = _holder(scheduler, "ocupante", release)
+
+    granted = []
+    threads = []
+    for job_id, weight in [("a", 1), ("a", 1), ("a", 1), ("b", 3), ("b", 3), ("b", 3)]:
+        def run(job_id=job_id, weight=weight):
+            with scheduler.slot(job_id, weight):
+                granted.append(job_id)
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+        expected = len(threads)
+        _wait_until(lambda: scheduler.metrics()["waiting"] == expected)
+
+    release.set()
+    for thread in [holder] + threads:
+        thread.join(2)
+
+    # Peso 3: o job "b" recebe três vagas no intervalo em que o job "a" recebe uma
+    assert granted == ["a", "b", "b", "b", "a", "a"]
+
+def test_job_cap_does_not_block_other_jobs():
+    scheduler = WeightedFairScheduler(max_concurrency=4, job_max_concurrency=4, timeout=5)
+    release = threading.Event()
+    holder = _holder(scheduler, "a", release, max_concurrency=1)
+
+    waiting = threading.Thread(target=lambda: scheduler.slot("a", max_concurrency=1).__enter__())
+    waiting.daemon = True
+    waiting.start()
+    _wait_until(lambda: scheduler.metrics()["jobs"].get("a", {}).get("waiting") == 1)
+
+    # O job "b" é atendido enquanto a segunda chamada do job "a" aguarda o limite do job
+    with scheduler.slot("b"):
+        metrics = scheduler.metrics()
+        assert metrics["running"] == 2
+        assert metrics["jobs"]["a"] == {"running": 1, "waiting": 1}
+
+    release.set()
+    holder.join(2)
+    _wait_until(lambda: scheduler.metrics()["jobs"].get("a", {}).get("waiting", 0) == 0)
+
+def test_timeout_raises_503():
+    scheduler = WeightedFairScheduler(max_concurrency=1, job_max_concurrency=4, timeout=0.05)
+    release = threading.Event()
+    holder = _holder(scheduler, "a", release)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        with scheduler.slot("b"):
+            pass
+    assert rejected.value.status_code == 503
+    assert scheduler.metrics()["timed_out"] == 1
+    assert scheduler.metrics()["waiting"] == 0
+
+    release.set()
+    holder.join(2)
+    # A vaga liberada volta a ser concedida normalmente
+    with scheduler.slot("b"):
+        assert scheduler.metrics()["running"] == 1
+
+def test_admission_limits_slots_per_job():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=4, max_queue=8, queue_timeout=0.2, job_max_in_flight=1)
+        release = asyncio.Event()
+
+        async def hold(job_key):
+            async with admission.slot(job_key):
+                await release.wait()
+
+        first = asyncio.create_task(hold("a"))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(hold("a"))
+        await asyncio.sleep(0.01)
+        assert admission.metrics()["in_flight"] == 1
+        assert admission.metrics()["queue_depth"] == 1
+
+        # Além das vagas e da fila do job, a requisição é rejeitada de imediato
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.slot("a"):
+                pass
+        assert rejected.value.status_code == 429
+
+        # Outro job continua sendo admitido
+        async with admission.slot("b"):
+            assert admission.metrics()["in_flight"] == 2
+
+        release.set()
+        await asyncio.gather(first, second)
+        assert admission.metrics()["in_flight"] == 0
+        assert admission.metrics()["jobs"] == 0
+
+    asyncio.run(scenario())
+
+def test_admission_job_queue_timeout_releases_job_position():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=4, max_queue=8, queue_timeout=0.05, job_max_in_flight=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.slot("a"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.slot("a"):
+                pass
+        assert rejected.value.status_code == 503
+
+        release.set()
+        await holder
+        async with admission.slot("a"):
+            assert admission.metrics()["in_flight"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,155 @@
+import json
+from types import SimpleNamespace as NS
+import pytest
+from llm_client import StreamedEvaluation
+
+class _Deltas:
+    """
+    Gera os trechos do stream registrando quantos já foram consumidos.
+    """
+
+    def __init__(self, deltas):
+        self.deltas = list(deltas)
+        self.consumed = 0
+
+    def __iter__(self):
+        for delta in self.deltas:
+            self.consumed += 1
+            yield delta
+
+class OpenAIClient:
+    def __init__(self, deltas, repair=None):
+        self.deltas = _Deltas(deltas)
+        self.repair = repair
+        self.chat = NS(completions=NS(create=self._create))
+
+    def _create(self, **kwargs):
+        if not kwargs.get("stream"):
+            return NS(choices=[NS(message=NS(content=self.repair))], usage=NS(prompt_tokens=50, completion_tokens=20))
+        return self._chunks()
+
+    def _chunks(self):
+        for delta in self.deltas:
+            yield NS(choices=[NS(delta=NS(content=delta))], usage=None)
+        yield NS(choices=[], usage=NS(prompt_tokens=100, completion_tokens=40))
+
+class GeminiClient:
+    def __init__(self, deltas):
+        self.deltas = _Deltas(deltas)
+        self.models = NS(generate_content_stream=self._stream)
+
+    def _stream(self, **kwargs):
+        for delta in self.deltas:
+            yield NS(text=delta, usage_metadata=None)
+        yield NS(text=None, usage_metadata=NS(prompt_token_count=100, candidates_token_count=40))
+
+class _AnthropicStream:
+    def __init__(self, events):
+        self.events = events
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        yield NS(type="message_start")
+        for event in self.events:
+            yield event
+        yield NS(type="message_stop")
+
+    def get_final_message(self):
+        return NS(usage=NS(input_tokens=100, output_tokens=40))
+
+class AnthropicClient:
+    def __init__(self, deltas, structured=False):
+        self.deltas = _Deltas(deltas)
+        self.structured = structured
+        self.messages = NS(stream=self._stream)
+
+    def _events(self):
+        for delta in self.deltas:
+            if self.structured:
+                yield NS(type="content_block_delta", delta=NS(type="input_json_delta", partial_json=delta))
+            else:
+                yield NS(type="content_block_delta", delta=NS(type="text_delta", text=delta))
+
+    def _stream(self, **kwargs):
+        return _AnthropicStream(self._events())
+
+RESPONSE = json.dumps({"result": "false", "explain": "O valor de \"max\" está muito acima do histórico."}, ensure_ascii=False)
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize("provider, make_client", [
+    ("OPENAI", OpenAIClient),
+    ("GOOGLE", GeminiClient),
+    ("ANTHROPIC", AnthropicClient),
+    ("ANTHROPIC", lambda deltas: AnthropicClient(deltas, structured=True)),
+])
+def test_early_verdict_and_final_explanation(provider, make_client):
+    client = make_client(_split(RESPONSE, 4))
+    usage = {}
+    streamed = StreamedEvaluation(client, "modelo", provider, "prompt", usage=usage)
+
+    assert streamed.wait_for_result() == "false"
+    # O veredicto é conhecido antes do fim do stream
+    assert client.deltas.consumed < len(client.deltas.deltas)
+
+    evaluation = streamed.finish()
+    assert evaluation == {"result": "false", "explain": "O valor de \"max\" está muito acima do histórico."}
+    assert client.deltas.consumed == len(client.deltas.deltas)
+    assert usage == {"prompt_tokens": 100, "completion_tokens": 40}
+
+@pytest.mark.parametrize("deltas", [
+    ['{"res', 'ult', '": "t', 'r', 'ue", "explain": "Dentro do padrão."}'],
+    ['```json\n{', '"result"', ':', ' ', '"TRUE"', ', "explain": "Dentro', ' do padrão."}\n```'],
+    ['{"result": t', 'rue, "explain": "Dentro do padrão."}'],
+])
+def test_verdict_split_across_tokens(deltas):
+    client = OpenAIClient(deltas)
+    streamed = StreamedEvaluation(client, "modelo", "OPENAI", "prompt")
+
+    assert streamed.wait_for_result() == "true"
+    assert streamed.finish()["explain"] == "Dentro do padrão."
+
+def test_partial_keyword_is_not_a_verdict():
+    client = OpenAIClient(['{"result": "f', 'al', 'se", "explain": "Fora do padrão."}'])
+    streamed = StreamedEvaluation(client, "modelo", "OPENAI", "prompt")
+
+    assert streamed.wait_for_result() == "false"
+    assert client.deltas.consumed == 3
+
+def test_truncated_stream_keeps_partial_explanation():
+    client = GeminiClient(['{"result": "false", ', '"explain": "O total de ', 'linhas caiu \\"muito\\" em rel'])
+    streamed = StreamedEvaluation(client, "modelo", "GOOGLE", "prompt")
+
+    assert streamed.wait_for_result() == "false"
+    assert streamed.finish() == {"result": "false", "explain": 'O total de linhas caiu "muito" em rel'}
+
+def test_truncated_stream_without_explanation_uses_raw_text():
+    client = AnthropicClient(['{"result": "true"'])
+    streamed = StreamedEvaluation(client, "modelo", "ANTHROPIC", "prompt")
+
+    assert streamed.wait_for_result() == "true"
+    assert streamed.finish() == {"result": "true", "explain": '{"result": "true"'}
+
+def test_non_json_stream_is_repaired():
+    repair = json.dumps({"result": "true", "explain": "Resposta corrigida."})
+    client = OpenAIClient(["Não consigo ", "avaliar agora."], repair=repair)
+    usage = {}
+    streamed = StreamedEvaluation(client, "modelo", "OPENAI", "prompt", usage=usage)
+
+    assert streamed.wait_for_result() == "true"
+    assert streamed.finish() == {"result": "true", "explain": "Resposta corrigida."}
+    # Consumo do stream e da chamada de reparo
+    assert usage == {"prompt_tokens": 150, "completion_tokens": 60}
+
+def test_non_json_stream_without_retries_raises():
+    client = OpenAIClient(["sem ", "json"])
+    streamed = StreamedEvaluation(client, "modelo", "OPENAI", "prompt", max_retries=0)
+
+    with pytest.raises(ValueError):
+        streamed.wait_for_result()
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+import pytest
+import token_budget
+from prompts import build_evaluation_prompt
+from token_budget import compact_history, estimate_tokens, fit_history_to_budget, prompt_token_budget
+
+PROVIDER = "GOOGLE"
+MODEL = "gemini-pro"
+COMPLETION_TOKENS = 200
+
+@pytest.fixture
+def small_context_window(monkeypatch):
+    monkeypatch.setattr(token_budget, "PROMPT_TOKEN_BUDGET", 0)
+    monkeypatch.setattr(token_budget, "CONTEXT_WINDOW", 2200)
+    monkeypatch.setattr(token_budget, "PROMPT_TOKEN_BUDGET_MAX", 0)
+
+def _history(size):
+    start = datetime(2026, 3, 1, 8, 0)
+    history = []
+    for i in range(size):
+        received_at = start - timedelta(days=i)
+        history.append({
+            "attributes": {"rows": 1000 + i, "min": i, "max": 500 + i, "avg": 250.5 + i, "origem": "sftp"},
+            "received_at": received_at,
+            "weekday": received_at.strftime("%A"),
+            "month": received_at.strftime("%B"),
+            "is_holiday": False,
+        })
+    return history
+
+def _recording_builder(calls):
+    def build(history, count):
+        calls.append((history, count))
+        return build_evaluation_prompt(
+            rules=["O número de linhas deve ser positivo."],
+            history_executions=count,
+            history_note="",
+            historical_attributes=history,
+            attributes={"rows": 1200, "min": 0, "max": 510, "avg": 251.0, "origem": "sftp"},
+            now=datetime(2026, 3, 2, 8, 0),
+            weekday="Monday",
+            month="March",
+            is_holiday=False
+        )
+    return build
+
+def test_compact_history_lists_columns_once():
+    compact = compact_history(_history(2))
+    assert compact["columns"] == ["received_at", "weekday", "month", "is_holiday", "rows", "min", "max", "avg", "origem"]
+    assert compact["rows"][0] == ["2026-03-01T08:00:00", "Sunday", "March", False, 1000, 0, 500, 250.5, "sftp"]
+    assert len(compact["rows"]) == 2
+
+def test_fit_history_keeps_full_history_when_it_fits(small_context_window):
+    calls = []
+    history = _history(2)
+    prompt, count = fit_history_to_budget(_recording_builder(calls), history, PROVIDER, MODEL, COMPLETION_TOKENS)
+    assert count == 2
+    assert calls == [(history, 2)]
+
+def test_fit_history_trims_to_budget(small_context_window):
+    calls = []
+    history = _history(200)
+    budget = prompt_token_budget(MODEL, COMPLETION_TOKENS, PROVIDER)
+
+    prompt, count = fit_history_to_budget(_recording_builder(calls), history, PROVIDER, MODEL, COMPLETION_TOKENS)
+
+    assert estimate_tokens(prompt, PROVIDER, MODEL) <= budget
+    assert 0 < count < len(history)
+    # O número informado ao prompt corresponde às entregas mantidas, as mais recentes
+    kept = next(rows for rows, passed in reversed(calls) if passed == count)
+    assert isinstance(kept, dict) and len(kept["rows"]) == count
+    assert kept["rows"] == compact_history(history)["rows"][:count]
+    assert f"últimas {count} execuções" in prompt
+    # Uma entrega a mais já não caberia no orçamento
+    assert estimate_tokens(_recording_builder([])(
+        {"columns": kept["columns"], "rows": compact_history(history)["rows"][:count + 1]}, count + 1
+    ), PROVIDER, MODEL) > budget
+
+def test_fit_history_raises_when_nothing_fits(monkeypatch):
+    monkeypatch.setattr(token_budget, "PROMPT_TOKEN_BUDGET", 100)
+    with pytest.raises(ValueError):
+        fit_history_to_budget(_recording_builder([]), _history(5), PROVIDER, MODEL, COMPLETION_TOKENS)
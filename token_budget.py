@@ -0,0 +1,175 @@
+import os
+import math
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+# Orçamento explícito de tokens do prompt (se não definido, é derivado da janela de contexto do modelo)
+PROMPT_TOKEN_BUDGET = int(os.getenv("MONAI_PROMPT_TOKEN_BUDGET", 0))
+# Janela de contexto explícita do modelo (se não definida, usa a tabela abaixo)
+CONTEXT_WINDOW = int(os.getenv("MONAI_CONTEXT_WINDOW", 0))
+# Margem de segurança sobre a contagem de tokens feita pelo tokenizador (tiktoken)
+BUDGET_SAFETY_MARGIN = float(os.getenv("MONAI_BUDGET_SAFETY_MARGIN", 0.05))
+# Margem de segurança quando os tokens são estimados por caracteres (sem tokenizador)
+HEURISTIC_SAFETY_MARGIN = float(os.getenv("MONAI_HEURISTIC_SAFETY_MARGIN", 0.20))
+# Teto do orçamento derivado da janela de contexto (0 desativa): evita prompts do tamanho da janela inteira
+PROMPT_TOKEN_BUDGET_MAX = int(os.getenv("MONAI_PROMPT_TOKEN_BUDGET_MAX", 32000))
+
+# Janelas de contexto conhecidas por prefixo do modelo (o prefixo mais longo prevalece)
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "o4": 200000,
+    "claude": 200000,
+    "gemini-pro": 32760,
+    "gemini-1.5": 1048576,
+    "gemini-2": 1048576,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Caracteres por token usados quando não há tokenizador disponível para o provedor
+CHARS_PER_TOKEN = {
+    "OPENAI": 4.0,
+    "GOOGLE": 4.0,
+    "ANTHROPIC": 3.5,
+}
+
+def context_window(llm_model: str) -> int:
+    """
+    Retorna a janela de contexto do modelo, em tokens.
+    """
+    if CONTEXT_WINDOW > 0:
+        return CONTEXT_WINDOW
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if llm_model.lower().startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+@lru_cache(maxsize=32)
+def _openai_encoding(llm_model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(llm_model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def prompt_token_budget(llm_model: str, completion_tokens: int, llm_provider: str = None) -> int:
+    """
+    Calcula o orçamento de tokens do prompt: o valor configurado ou a janela de
+    contexto do modelo menos os tokens reservados para a resposta e a margem de segurança,
+    limitado a MONAI_PROMPT_TOKEN_BUDGET_MAX.
+
+    A margem é maior quando os tokens são estimados por caracteres, já que a
+    aproximação pode subestimar o tamanho real do prompt.
+    """
+    if PROMPT_TOKEN_BUDGET > 0:
+        return PROMPT_TOKEN_BUDGET
+    exact = llm_provider == "OPENAI" and _openai_encoding(llm_model) is not None
+    margin = BUDGET_SAFETY_MARGIN if exact else HEURISTIC_SAFETY_MARGIN
+    budget = int((context_window(llm_model) - completion_tokens) * (1 - margin))
+    if PROMPT_TOKEN_BUDGET_MAX > 0:
+        budget = min(budget, PROMPT_TOKEN_BUDGET_MAX)
+    return budget
+
+def estimate_tokens(text: str, llm_provider: str, llm_model: str) -> int:
+    """
+    Estima o número de tokens de um texto para o provedor/modelo.
+
+    Para a OpenAI usa o tokenizador tiktoken, quando instalado; nos demais casos,
+    aplica uma aproximação por caracteres por token.
+    """
+    if llm_provider == "OPENAI":
+        encoding = _openai_encoding(llm_model)
+        if encoding is not None:
+            return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN.get(llm_provider, 4.0))
+
+def compact_history(history: List[dict]) -> dict:
+    """
+    Compacta o histórico em formato tabular: os nomes dos atributos aparecem uma
+    única vez em "columns" e cada entrega vira uma linha de valores.
+    """
+    keys = []
+    for entry in history:
+        for key in (entry.get("attributes") or {}):
+            if key not in keys:
+                keys.append(key)
+
+    has_stratum = any("stratum" in entry for entry in history)
+    columns = ["received_at", "weekday", "month", "is_holiday"] + (["stratum"] if has_stratum else []) + keys
+    rows = []
+    for entry in history:
+        received_at = entry.get("received_at")
+        row = [
+            received_at.isoformat(timespec="seconds") if hasattr(received_at, "isoformat") else received_at,
+            entry.get("weekday"),
+            entry.get("month"),
+            entry.get("is_holiday"),
+        ]
+        if has_stratum:
+            row.append(entry.get("stratum"))
+        attributes = entry.get("attributes") or {}
+        row.extend(attributes.get(key) for key in keys)
+        rows.append(row)
+    return {"columns": columns, "rows": rows}
+
+def fit_history_to_budget(
+    build_prompt: Callable[[object, int], str],
+    history: List[dict],
+    llm_provider: str,
+    llm_model: str,
+    completion_tokens: int
+) -> Tuple[str, int]:
+    """
+    Monta o prompt respeitando o orçamento de tokens do modelo.
+
+    Usa o histórico completo se couber; caso contrário, compacta o histórico em formato
+    tabular e, se ainda for necessário, remove as entregas mais antigas até caber.
+
+    Args:
+        build_prompt (Callable): Função que recebe o histórico (lista ou formato compacto)
+            e o número de entregas e retorna o prompt
+        history (List[dict]): Histórico serializado, do mais recente ao mais antigo
+        llm_provider (str): Provedor do LLM
+        llm_model (str): Modelo do LLM
+        completion_tokens (int): Tokens reservados para a resposta
+
+    Returns:
+        Tuple[str, int]: Prompt final e número de entregas do histórico incluídas
+
+    Raises:
+        ValueError: Se nem uma única entrega do histórico couber no orçamento.
+    """
+    budget = prompt_token_budget(llm_model, completion_tokens, llm_provider)
+
+    prompt = build_prompt(history, len(history))
+    if estimate_tokens(prompt, llm_provider, llm_model) <= budget:
+        return prompt, len(history)
+
+    compact = compact_history(history)
+
+    def build_compact(count: int) -> str:
+        return build_prompt({"columns": compact["columns"], "rows": compact["rows"][:count]}, count)
+
+    # Busca binária pelo maior número de entregas que cabe no orçamento
+    low, high, best = 1, len(history), None
+    while low <= high:
+        middle = (low + high) // 2
+        candidate = build_compact(middle)
+        if estimate_tokens(candidate, llm_provider, llm_model) <= budget:
+            best = (candidate, middle)
+            low = middle + 1
+        else:
+            high = middle - 1
+
+    if best is None:
+        raise ValueError(f"O prompt excede o orçamento de {budget} tokens do modelo {llm_model} mesmo com o histórico reduzido.")
+    return best
@@ -0,0 +1,281 @@
+import os
+import math
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from models import JobData
+
+# Número de entregas a partir do qual o job passa a usar um índice aproximado (hnswlib), se disponível
+ANN_THRESHOLD = int(os.getenv("MONAI_ANN_THRESHOLD", 5000))
+# Número máximo de jobs com índice mantido em memória (os menos usados são descartados)
+MAX_INDEXED_JOBS = int(os.getenv("MONAI_VECTOR_INDEX_MAX_JOBS", 256))
+# Antes de cada busca, incorpora as entregas gravadas por outros workers desde a última leitura
+REFRESH_FROM_DB = os.getenv("MONAI_VECTOR_INDEX_REFRESH", "true").lower() == "true"
+# Sobreposição da releitura, para entregas confirmadas fora da ordem de received_at
+REFRESH_OVERLAP = timedelta(seconds=float(os.getenv("MONAI_VECTOR_INDEX_REFRESH_OVERLAP", 60)))
+
+def to_number(value) -> Optional[float]:
+    """
+    Converte o valor de um atributo em número, ignorando booleanos e valores não numéricos.
+    """
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def numeric_attributes(attributes: Optional[dict]) -> Dict[str, float]:
+    """
+    Retorna apenas os atributos numéricos (inclusive números enviados como texto).
+    """
+    numbers = {}
+    for key, value in (attributes or {}).items():
+        number = to_number(value)
+        if number is not None:
+            numbers[key] = number
+    return numbers
+
+class JobVectorIndex:
+    """
+    Índice vetorial dos atributos numéricos das entregas de um job.
+
+    Os vetores são normalizados por z-score (média e desvio padrão de cada atributo)
+    e comparados por distância euclidiana. Jobs pequenos usam busca exata com NumPy;
+    a partir de ANN_THRESHOLD entregas, um índice HNSW é usado quando o hnswlib está instalado.
+    """
+
+    def __init__(self, features: List[str]):
+        self.features = features
+        self._positions = {feature: i for i, feature in enumerate(features)}
+        self.lock = threading.Lock()  # Protege a inclusão, a construção do HNSW e a busca
+        self.watermark = None  # Maior received_at lido do banco
+        self._known = set()
+        self.ids = []
+        self.outliers = []
+        self._vectors = []
+        self._matrix = None
+        self._ann = None
+        self._ann_stats = None
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[object, dict, bool]]) -> "JobVectorIndex":
+        rows = [(row_id, numeric_attributes(attributes), outlier) for row_id, attributes, outlier in rows]
+        features = sorted({key for _, numbers, _ in rows for key in numbers})
+        index = cls(features)
+        for row_id, numbers, outlier in rows:
+            index._append(row_id, numbers, outlier)
+        index._maybe_build_ann()
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _vectorize(self, numbers: Dict[str, float]) -> np.ndarray:
+        vector = np.full(len(self.features), np.nan, dtype=np.float32)
+        for key, number in numbers.items():
+            position = self._positions.get(key)
+            if position is not None:
+                vector[position] = number
+        return vector
+
+    def _append(self, row_id, numbers: Dict[str, float], outlier: bool):
+        self._known.add(row_id)
+        self.ids.append(row_id)
+        self.outliers.append(bool(outlier))
+        self._vectors.append(self._vectorize(numbers))
+        self._matrix = None
+
+    def add(self, row_id, attributes: Optional[dict], outlier: bool) -> bool:
+        """
+        Adiciona uma entrega ao índice de forma incremental.
+
+        Returns:
+            bool: False se a entrega possui atributos ainda não indexados (o índice deve ser reconstruído).
+        """
+        if row_id in self._known:
+            return True
+        numbers = numeric_attributes(attributes)
+        if any(key not in self._positions for key in numbers):
+            return False
+        self._append(row_id, numbers, outlier)
+        if self._ann is not None:
+            self._ann_add(len(self.ids) - 1)
+        else:
+            self._maybe_build_ann()
+        return True
+
+    def _matrix_view(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.vstack(self._vectors) if self._vectors else np.empty((0, len(self.features)), dtype=np.float32)
+        return self._matrix
+
+    @staticmethod
+    def _stats(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        with np.errstate(all="ignore"):
+            mean = np.nanmean(matrix, axis=0)
+            std = np.nanstd(matrix, axis=0)
+        mean = np.nan_to_num(mean)
+        std = np.nan_to_num(std)
+        std[std == 0] = 1.0
+        return mean, std
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+        # Atributos ausentes ficam na média (zero após a normalização)
+        return np.nan_to_num((matrix - mean) / std).astype(np.float32)
+
+    def _maybe_build_ann(self):
+        if len(self.ids) < ANN_THRESHOLD or not self.features:
+            return
+        try:
+            import hnswlib
+        except ImportError:
+            return
+        matrix = self._matrix_view()
+        mean, std = self._stats(matrix)
+        ann = hnswlib.Index(space="l2", dim=len(self.features))
+        ann.init_index(max_elements=len(self.ids) * 2, ef_construction=200, M=16)
+        ann.add_items(self._normalize(matrix, mean, std), np.arange(len(self.ids)))
+        ann.set_ef(64)
+        self._ann = ann
+        self._ann_stats = (mean, std)
+
+    def _ann_add(self, position: int):
+        mean, std = self._ann_stats
+        if self._ann.get_current_count() >= self._ann.get_max_elements():
+            self._ann.resize_index(self._ann.get_max_elements() * 2)
+        self._ann.add_items(self._normalize(self._vectors[position][None, :], mean, std), np.array([position]))
+
+    def search(self, attributes: Optional[dict], k: int, include_outliers: bool, exclude: Set = frozenset()) -> List:
+        """
+        Retorna os IDs das k entregas mais semelhantes aos atributos informados.
+        """
+        if k <= 0 or not self.ids or not self.features:
+            return []
+        query = self._vectorize(numeric_attributes(attributes))
+
+        if self._ann is not None:
+            mean, std = self._ann_stats
+            candidates = min(len(self.ids), (k + len(exclude)) * 4)
+            labels, _ = self._ann.knn_query(self._normalize(query[None, :], mean, std), k=candidates)
+            found = []
+            for position in labels[0]:
+                row_id = self.ids[position]
+                if row_id in exclude or (self.outliers[position] and not include_outliers):
+                    continue
+                found.append(row_id)
+                if len(found) == k:
+                    return found
+            # Candidatos insuficientes após os filtros: recorre à busca exata
+
+        matrix = self._matrix_view()
+        mean, std = self._stats(matrix)
+        normalized = self._normalize(matrix, mean, std)
+        distances = np.square(normalized - self._normalize(query[None, :], mean, std)).sum(axis=1)
+
+        mask = np.array([
+            row_id in exclude or (outlier and not include_outliers)
+            for row_id, outlier in zip(self.ids, self.outliers)
+        ])
+        distances[mask] = np.inf
+        available = int((~mask).sum())
+        if available == 0:
+            return []
+        k = min(k, available)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [self.ids[position] for position in nearest]
+
+class VectorIndexRegistry:
+    """
+    Mantém em memória os índices vetoriais por job, carregados sob demanda a partir
+    do banco e atualizados incrementalmente a cada nova entrega.
+
+    O lock do registro protege apenas o mapa de índices; a construção, a inclusão e a
+    busca usam o lock de cada índice, de modo que buscas de jobs diferentes não se bloqueiam.
+    Os índices são mantidos por processo: com vários workers, cada busca relê do banco as
+    entregas gravadas desde a última leitura (MONAI_VECTOR_INDEX_REFRESH).
+    """
+
+    def __init__(self, max_jobs: int = MAX_INDEXED_JOBS):
+        self.max_jobs = max_jobs
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _rows(db: Session, job_id: str, since=None) -> list:
+        query = db.query(JobData.id, JobData.attributes, JobData.outlier_data, JobData.received_at).filter(
+            JobData.job_id == job_id
+        )
+        if since is not None:
+            query = query.filter(JobData.received_at >= since)
+        return query.all()
+
+    def _load(self, db: Session, job_id: str) -> JobVectorIndex:
+        rows = self._rows(db, job_id)
+        index = JobVectorIndex.build((row.id, row.attributes, row.outlier_data) for row in rows)
+        index.watermark = max((row.received_at for row in rows), default=None)
+        return index
+
+    def get(self, db: Session, job_id: str) -> JobVectorIndex:
+        with self._lock:
+            index = self._indexes.get(job_id)
+            if index is not None:
+                self._indexes.move_to_end(job_id)
+                return index
+        index = self._load(db, job_id)
+        with self._lock:
+            self._indexes[job_id] = index
+            self._indexes.move_to_end(job_id)
+            while len(self._indexes) > self.max_jobs:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _discard(self, job_id: str, index: JobVectorIndex):
+        with self._lock:
+            if self._indexes.get(job_id) is index:
+                del self._indexes[job_id]
+
+    def add(self, job_id: str, row_id, attributes: Optional[dict], outlier: bool):
+        """
+        Atualiza o índice do job com uma nova entrega, se ele já estiver carregado.
+        """
+        with self._lock:
+            index = self._indexes.get(job_id)
+        if index is None:
+            return
+        with index.lock:
+            added = index.add(row_id, attributes, outlier)
+        if not added:
+            # Novos atributos mudam a dimensão dos vetores: reconstruir na próxima consulta
+            self._discard(job_id, index)
+
+    def _refresh(self, db: Session, job_id: str, index: JobVectorIndex) -> bool:
+        """
+        Incorpora as entregas gravadas no banco (inclusive por outros workers) desde a
+        última leitura. Retorna False se o índice precisa ser reconstruído.
+        """
+        since = index.watermark - REFRESH_OVERLAP if index.watermark is not None else None
+        rows = self._rows(db, job_id, since)
+        with index.lock:
+            for row in rows:
+                if not index.add(row.id, row.attributes, row.outlier_data):
+                    return False
+                if index.watermark is None or row.received_at > index.watermark:
+                    index.watermark = row.received_at
+        return True
+
+    def similar(self, db: Session, job_id: str, attributes: Optional[dict], k: int, include_outliers: bool, exclude: Set = frozenset()) -> List:
+        index = self.get(db, job_id)
+        if REFRESH_FROM_DB and not self._refresh(db, job_id, index):
+            self._discard(job_id, index)
+            index = self.get(db, job_id)
+        with index.lock:
+            return index.search(attributes, k, include_outliers, exclude)
+
+vector_indexes = VectorIndexRegistry()
@@ -0,0 +1,271 @@
+import os
+import re
+import json
+import select
+import asyncio
+import threading
+from typing import Iterable, List, Optional
+from sqlalchemy import event, text, bindparam, ARRAY, Text
+from sqlalchemy.orm import Session
+from database import engine
+
+# Transmissão dos veredictos (QueryLog) em tempo real para dashboards, via Server-Sent Events.
+# Desativada por padrão: no PostgreSQL, cada gravação emite um pg_notify mesmo sem clientes conectados
+VERDICT_STREAM = os.getenv("MONAI_VERDICT_STREAM", "false").lower() == "true"
+VERDICT_STREAM_BUFFER = int(os.getenv("MONAI_VERDICT_STREAM_BUFFER", 256))  # Eventos pendentes por cliente
+VERDICT_STREAM_MAX_CLIENTS = int(os.getenv("MONAI_VERDICT_STREAM_MAX_CLIENTS", 100))  # Clientes simultâneos por worker
+VERDICT_STREAM_KEEPALIVE = float(os.getenv("MONAI_VERDICT_STREAM_KEEPALIVE", 15))  # Intervalo (s) dos comentários de keepalive
+VERDICT_CHANNEL = os.getenv("MONAI_VERDICT_CHANNEL", "monai_verdicts")  # Canal LISTEN/NOTIFY do PostgreSQL
+
+if not re.fullmatch(r"[a-z_][a-z0-9_]*", VERDICT_CHANNEL):
+    raise ValueError(f"Nome de canal inválido em MONAI_VERDICT_CHANNEL: {VERDICT_CHANNEL}")
+
+# O NOTIFY do PostgreSQL aceita payloads de até 8000 bytes
+NOTIFY_MAX_BYTES = 7900
+EXPLANATION_MAX_CHARS = 1000
+
+def verdict_event(values: dict) -> str:
+    """
+    Serializa um registro do QueryLog como evento do stream, respeitando o limite do NOTIFY.
+    """
+    explanation = values.get("explanation") or ""
+    received_at = values.get("received_at")
+    event = {
+        "id": str(values["id"]),
+        "job_id": values["job_id"],
+        "job_name": values["job_name"],
+        "job_filename": values["job_filename"],
+        "result": values["result"],
+        "explanation": explanation[:EXPLANATION_MAX_CHARS],
+        "received_at": received_at.isoformat() if received_at else None,
+        "attributes": values.get("attributes"),
+    }
+    payload = json.dumps(event, default=str, ensure_ascii=False)
+    if len(payload.encode()) > NOTIFY_MAX_BYTES:
+        # Atributos muito grandes não são transmitidos; o registro completo está no query_log
+        event["attributes"] = None
+        event["attributes_truncated"] = True
+        payload = json.dumps(event, default=str, ensure_ascii=False)
+    return payload
+
+def publish_verdicts(db: Session, rows: Iterable[dict]):
+    """
+    Publica os veredictos gravados, na transação atual (antes do commit).
+
+    No PostgreSQL, os eventos são enviados com pg_notify e entregues a todos os workers
+    somente após o commit. Nos demais bancos (modo embarcado, processo único), os eventos
+    ficam pendentes na sessão e são publicados no hub local após o commit.
+    """
+    if not VERDICT_STREAM:
+        return
+    payloads = [verdict_event(values) for values in rows]
+    if not payloads:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload")
+            .bindparams(bindparam("payloads", type_=ARRAY(Text))),
+            {"channel": VERDICT_CHANNEL, "payloads": payloads}
+        )
+    else:
+        db.info.setdefault("monai_verdicts", []).extend(payloads)
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session):
+    payloads = session.info.pop("monai_verdicts", None)
+    for payload in payloads or ():
+        verdict_hub.publish(payload)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session):
+    session.info.pop("monai_verdicts", None)
+
+class VerdictSubscriber:
+    """
+    Cliente do stream: filtros e buffer limitado. Com o buffer cheio, o evento mais antigo
+    é descartado, de modo que um consumidor lento nunca bloqueia a gravação dos veredictos.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, job_ids: Optional[List[str]], results: Optional[List[str]], buffer_size: int):
+        self.loop = loop
+        self.job_ids = set(job_ids) if job_ids else None
+        self.results = set(results) if results else None
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0  # Descartes ainda não informados ao cliente
+        self.dropped_total = 0
+
+    def matches(self, job_id: str, result: str) -> bool:
+        return (self.job_ids is None or job_id in self.job_ids) and (self.results is None or result in self.results)
+
+    def offer(self, payload: Optional[str]):
+        # Executado no event loop do cliente
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.dropped_total += 1
+        self.queue.put_nowait(payload)
+
+class VerdictHub:
+    """
+    Distribui os veredictos aos clientes conectados a este worker.
+
+    A publicação pode vir de qualquer thread (requisições, gravação adiada do query_log ou
+    o listener do PostgreSQL) e apenas agenda a entrega no event loop de cada cliente.
+    """
+
+    def __init__(self, buffer_size: int, max_clients: int):
+        self.buffer_size = buffer_size
+        self.max_clients = max_clients
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_clients
+
+    def subscribe(self, job_ids: Optional[List[str]] = None, results: Optional[List[str]] = None) -> VerdictSubscriber:
+        subscriber = VerdictSubscriber(asyncio.get_running_loop(), job_ids, results, self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        if engine.dialect.name == "postgresql":
+            verdict_listener.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: VerdictSubscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, payload: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        event = json.loads(payload)
+        self.published += 1
+        for subscriber in subscribers:
+            if not subscriber.matches(event["job_id"], event["result"]):
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, payload)
+                self.delivered += 1
+            except RuntimeError:
+                # Event loop encerrado: cliente desconectado
+                self.unsubscribe(subscriber)
+
+    def close(self):
+        """
+        Encerra os streams abertos (desligamento da aplicação).
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, None)
+            except RuntimeError:
+                pass
+
+    def metrics(self) -> dict:
+        return {
+            "clients": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(subscriber.dropped_total for subscriber in list(self._subscribers)),
+        }
+
+class PostgresVerdictListener:
+    """
+    Thread que escuta o canal de veredictos (LISTEN) em uma conexão dedicada e repassa
+    os eventos de todos os workers ao hub local. Reconecta após falhas.
+    """
+
+    def __init__(self, channel: str, poll_interval: float = 1.0):
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="monai-verdict-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            connection = None
+            try:
+                cargs, cparams = engine.dialect.create_connect_args(engine.url)
+                connection = engine.dialect.connect(*cargs, **cparams)
+                connection.autocommit = True
+                connection.cursor().execute(f"LISTEN {self.channel}")
+                backoff = 1.0
+                if hasattr(connection, "poll"):
+                    self._listen_psycopg2(connection)
+                else:
+                    self._listen_psycopg(connection)
+            except Exception as e:
+                print(f"Erro no listener de veredictos: {str(e)}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _listen_psycopg2(self, connection):
+        while not self._stop.is_set():
+            if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                verdict_hub.publish(connection.notifies.pop(0).payload)
+
+    def _listen_psycopg(self, connection):
+        while not self._stop.is_set():
+            for notify in connection.notifies(timeout=self.poll_interval):
+                verdict_hub.publish(notify.payload)
+
+def format_sse(payload: str) -> str:
+    event = json.loads(payload)
+    return f"id: {event['id']}\nevent: verdict\ndata: {payload}\n\n"
+
+async def verdict_events(request, job_ids: Optional[List[str]], results: Optional[List[str]]):
+    """
+    Gera o stream SSE de um cliente: veredictos filtrados, avisos de descarte e keepalives.
+    """
+    subscriber = verdict_hub.subscribe(job_ids, results)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscriber.queue.get(), VERDICT_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if payload is None:
+                break
+            if subscriber.dropped:
+                # Informa ao cliente os eventos descartados por consumo lento
+                yield f"event: dropped\ndata: {json.dumps({'count': subscriber.dropped})}\n\n"
+                subscriber.dropped = 0
+            yield format_sse(payload)
+    finally:
+        verdict_hub.unsubscribe(subscriber)
+
+verdict_hub = VerdictHub(VERDICT_STREAM_BUFFER, VERDICT_STREAM_MAX_CLIENTS)
+verdict_listener = PostgresVerdictListener(VERDICT_CHANNEL)
@@ -0,0 +1,66 @@
+"""
+Receptor local de webhooks para testar o despacho de notificações do outbox.
+
+Registra cada lote recebido e permite simular falhas nas primeiras requisições para
+validar as retentativas. Os lotes recebidos podem ser consultados em GET /events.
+
+Uso:
+    python webhook_stub.py --port 9000
+    python webhook_stub.py --port 9000 --fail-first 3
+    MONAI_WEBHOOK_URLS=http://localhost:9000/ uvicorn main:app
+"""
+import json
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class WebhookStubHandler(BaseHTTPRequestHandler):
+    batches = []
+    fail_first = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            if WebhookStubHandler.fail_first > 0:
+                WebhookStubHandler.fail_first -= 1
+                self._reply(503, {"detail": "Falha simulada."})
+                return
+            batch = json.loads(body or b"{}")
+            self.batches.append(batch)
+        print(f"Lote recebido com {len(batch.get('events', []))} eventos")
+        self._reply(200, {"received": len(batch.get("events", []))})
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/events":
+            self._reply(404, {"detail": "Não encontrado."})
+            return
+        with self.lock:
+            events = [event for batch in self.batches for event in batch.get("events", [])]
+            self._reply(200, {"batches": len(self.batches), "events": events})
+
+    def _reply(self, status: int, content: dict):
+        body = json.dumps(content, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Receptor local de webhooks do MonAI.")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta.")
+    parser.add_argument("--port", type=int, default=9000, help="Porta de escuta.")
+    parser.add_argument("--fail-first", type=int, default=0, help="Responde 503 às primeiras N requisições.")
+    args = parser.parse_args()
+
+    WebhookStubHandler.fail_first = args.fail_first
+    server = ThreadingHTTPServer((args.host, args.port), WebhookStubHandler)
+    print(f"Receptor de webhooks em http://{args.host}:{args.port}/")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()